@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Множество администраторов, общее для бота и веб-интерфейса
+
+Единственный источник — настройка admin_user_ids, users.is_admin
+Database обновляет вместе с ней. AdminRegistry держит список как
+frozenset и перечитывает его, только когда изменились настройки
+(PRAGMA data_version, поэтому видны и записи другого процесса).
+Проверка `user_id in admins` — один PRAGMA и поиск во frozenset.
+
+AsyncAdminRegistry — вариант для асинхронного кода (веб-API): список
+перечитывается через AsyncDatabase не чаще раза в refresh_interval
+секунд вызовом await refresh(), проверки идут только по frozenset.
+"""
+
+import time
+from typing import Callable, FrozenSet, Iterator, Optional
+
+from async_database import AsyncDatabase
+from database import Database
+
+DEFAULT_REFRESH_INTERVAL = 1.0
+
+
+class AdminRegistry:
+    """
+    Проверка прав администратора
+
+    Registry только читает: изменения вносятся через Database.add_admin_id /
+    remove_admin_id (или AsyncDatabase) и видны при следующей проверке.
+
+    Пример:
+        admins = AdminRegistry(Database("volleybot.db"))
+        if user_id not in admins:
+            ...
+    """
+
+    def __init__(self, database: Database):
+        self.database = database
+        self._generation = None
+        self._admin_ids: FrozenSet[int] = frozenset()
+
+    @property
+    def admin_ids(self) -> FrozenSet[int]:
+        generation = self.database.get_settings_generation()
+        if generation != self._generation:
+            self._admin_ids = frozenset(self.database.get_admin_ids())
+            self._generation = generation
+        return self._admin_ids
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self.admin_ids
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(sorted(self.admin_ids))
+
+    def __len__(self) -> int:
+        return len(self.admin_ids)
+
+    def close(self):
+        self.database.close()
+
+
+class AsyncAdminRegistry:
+    """
+    Проверка прав администратора без обращений к БД в цикле событий
+
+    Пример:
+        admins = AsyncAdminRegistry(PooledAsyncDatabase(pool))
+        await admins.refresh()
+        if user_id not in admins:
+            ...
+        await db.add_admin_id(user_id)
+        admins.invalidate()
+    """
+
+    def __init__(self, adb: AsyncDatabase, refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.adb = adb
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._loaded_at: Optional[float] = None
+        self._admin_ids: FrozenSet[int] = frozenset()
+
+    @property
+    def admin_ids(self) -> FrozenSet[int]:
+        return self._admin_ids
+
+    async def refresh(self):
+        """Перечитывание списка, если с прошлого прошло refresh_interval секунд"""
+        now = self.clock()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+            return
+        self._admin_ids = frozenset(await self.adb.get_admin_ids())
+        self._loaded_at = now
+
+    def invalidate(self):
+        """Следующий refresh перечитает список (после изменения в этом процессе)"""
+        self._loaded_at = None
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._admin_ids
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(sorted(self._admin_ids))
+
+    def __len__(self) -> int:
+        return len(self._admin_ids)
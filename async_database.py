@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Асинхронный фасад для Database
+
+Методы те же, что у Database, но возвращают awaitable и выполняются
+вне event loop, поэтому медленный запрос не останавливает обработку
+обновлений бота и запросов веб-API.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from database import Database
+from db_pool import DatabasePool
+
+logger = logging.getLogger(__name__)
+
+# Методы Database с такими префиксами только читают данные
+READ_METHOD_PREFIXES = ('get_', 'is_', 'explain_')
+
+
+class AsyncDatabase:
+    """
+    Асинхронный фасад Database: все запросы выполняются в отдельном потоке БД
+
+    Пример:
+        adb = AsyncDatabase(Database("volleybot.db"))
+        template = await adb.get_default_template()
+    """
+
+    def __init__(self, database: Database):
+        self.database = database
+        # Один поток — соединение используется последовательно, как и раньше
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='volleybot-db')
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнение метода Database (или функции от Database) в потоке БД"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, self.database, *args, **kwargs)
+        )
+
+    def __getattr__(self, name: str):
+        func = getattr(Database, name, None)
+        if name.startswith('_') or not callable(func):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        @functools.wraps(func)
+        async def method(*args, **kwargs):
+            return await self.run(func, *args, **kwargs)
+
+        # Кэшируем обёртку, следующие обращения не попадают в __getattr__
+        setattr(self, name, method)
+        return method
+
+    def close(self):
+        """Остановка потока БД и закрытие соединения"""
+        self._executor.shutdown(wait=True)
+        self.database.close()
+
+
+class PooledAsyncDatabase(AsyncDatabase):
+    """
+    Асинхронный фасад поверх DatabasePool: читающие методы (get_*, is_*)
+    идут в соединения для чтения, остальные — через соединение для записи
+    """
+
+    def __init__(self, pool: DatabasePool):
+        self.pool = pool
+
+    @property
+    def database(self) -> Database:
+        return self.pool.writer
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if func.__name__.startswith(READ_METHOD_PREFIXES):
+            return await self.pool.run_read(func, *args, **kwargs)
+        return await self.pool.run_write(func, *args, **kwargs)
+
+    def close(self):
+        self.pool.close()
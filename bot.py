@@ -3,12 +3,16 @@
 Volleyball Poll Bot - продвинутый Telegram-бот для управления опросами о посещении волейбольных тренировок
 """
 
+import asyncio
+import importlib.util
 import os
 import logging
 import uuid
 import httpx
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
+from urllib.parse import urlparse
+from zoneinfo import ZoneInfo
 from typing import Dict, List, Optional, Any
 
 # Получаем директорию скрипта для абсолютных путей
@@ -25,22 +29,30 @@ httpx_logger = logging.getLogger('httpx')
 httpx_logger.handlers = []
 httpx_logger.propagate = True
 
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
 
-from telegram import Update, Bot, Poll, Message, Chat, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Bot, Poll, Message, Chat, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
     CommandHandler,
-    ContextTypes,
     CallbackQueryHandler,
     MessageHandler,
+    PollAnswerHandler,
     filters
 )
 
+from admin_registry import AdminRegistry
 from database import Database
-from utils import get_weekday_russian, get_next_occurrence, get_next_sunday, format_date_with_weekday, get_day_of_week_number
-from handlers import start, get_user_id, handle_message, button_handler, creation_states
+from async_database import AsyncDatabase
+from rate_limit import TelegramRateLimiter, fan_out, format_fan_out_summary
+from outbound_queue import OutboundQueue, telegram_error
+from job_store import SQLiteJobStore
+from poll_scheduler import PollScheduler
+from utils import get_weekday_russian, get_next_occurrence, get_next_sunday, format_date_with_weekday, get_day_of_week_number, get_next_training_date
+from poll_answers import PollAnswerBatcher
+from state_store import SQLiteStateStore
+from handlers import start, get_user_id, handle_message, button_handler, poll_answer, get_allowed_updates, use_state_store, router as callback_router
 
 
 logger = logging.getLogger(__name__)
@@ -98,6 +110,38 @@ for handler in logging.root.handlers[:]:
         handler.setFormatter(new_formatter)
 
 
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+# Параметры общего HTTP-клиента для прямых запросов к Bot API
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+HTTP_TIMEOUT = httpx.Timeout(connect=5, read=30, write=10, pool=5)
+
+# Сколько обработчик ждёт выполнения запроса из очереди, дальше он выполнится в фоне
+OUTBOUND_TIMEOUT = 30
+
+# Часовой пояс времени отправки опросов (в интерфейсе бота — MSK)
+SCHEDULER_TIMEZONE = os.getenv('VOLLEYBOT_TIMEZONE', 'Europe/Moscow')
+
+# Как часто проверять изменения расписаний, сделанные через веб-интерфейс
+SCHEDULE_SYNC_INTERVAL = 60
+
+# Как часто удалять брошенные диалоги создания опросов
+STATE_SWEEP_INTERVAL = 10 * 60
+
+# Режим webhook: если задан публичный HTTPS-адрес, обновления принимает
+# локальный ASGI-сервер (обычно за reverse proxy), иначе — getUpdates
+WEBHOOK_URL = os.getenv('VOLLEYBOT_WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('VOLLEYBOT_WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('VOLLEYBOT_WEBHOOK_PORT', '8443'))
+# Без явного секрета создаётся новый при каждом запуске (setWebhook его обновляет)
+WEBHOOK_SECRET = os.getenv('VOLLEYBOT_WEBHOOK_SECRET')
+
+
+def scheduler_now() -> datetime:
+    """Текущее время в часовом поясе планировщика (а не сервера)"""
+    return datetime.now(ZoneInfo(SCHEDULER_TIMEZONE))
+
+
 class VolleyBot:
     """
     Основной класс бота для управления опросами волейбольных тренировок
@@ -121,8 +165,35 @@ class VolleyBot:
             import sys
             sys.exit(1)
 
-        # Получаем список администраторов из БД
-        self.admin_user_ids = self.db.get_admin_ids()
+        # Создаём недостающие таблицы (например, outbound_jobs) и индексы горячих запросов
+        self.db.create_tables()
+
+        # Администраторы: своё соединение, изменения из веба видны сразу
+        self.admins = AdminRegistry(Database(self.db.db_path))
+
+        # После запуска обработчики работают с БД только через отдельный поток
+        self.adb = AsyncDatabase(self.db)
+
+        # Общий HTTP-клиент для Bot API, создаётся при запуске приложения
+        self.http: Optional[httpx.AsyncClient] = None
+
+        # Лимиты Telegram на отправку сообщений
+        self.rate_limiter = TelegramRateLimiter()
+
+        # Исходящие запросы к Bot API идут через очередь с повторами
+        self.outbound = OutboundQueue(self.adb, self._api_call, self.rate_limiter)
+        # Опрос сохраняется, когда выполнится его sendPoll, даже если создатель уже не ждёт
+        self.outbound.add_completion_hook(self._record_sent_poll)
+
+        # Голоса в опросах записывают на тренировки пачками
+        self.poll_answers = PollAnswerBatcher(self.adb)
+
+        # Задачи опросов по расписаниям, создаются при запуске приложения
+        self.bot: Optional[Bot] = None
+        self.poll_scheduler: Optional[PollScheduler] = None
+
+        # Шаги диалогов создания опросов, открывается при запуске приложения
+        self.states: Optional[SQLiteStateStore] = None
 
     def load_bot_token(self, token_file: str) -> str:
         """Загрузка токена бота из отдельного файла"""
@@ -139,39 +210,82 @@ class VolleyBot:
             logger.error(f"Ошибка при чтении токена: {e}")
             raise
 
-    def get_default_template(self) -> Dict[str, Any]:
+    async def start_http_client(self):
+        """Создание общего HTTP-клиента (keep-alive, HTTP/2 если установлен h2)"""
+        if self.http is not None:
+            return
+        http2 = importlib.util.find_spec('h2') is not None
+        self.http = httpx.AsyncClient(
+            base_url=f'{TELEGRAM_API_URL}/bot{self.bot_token}/',
+            http2=http2,
+            limits=HTTP_LIMITS,
+            timeout=HTTP_TIMEOUT,
+        )
+        logger.info(f"HTTP-клиент Bot API создан (HTTP/2: {'да' if http2 else 'нет'})")
+
+    async def close_http_client(self):
+        """Закрытие общего HTTP-клиента"""
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+            logger.info("HTTP-клиент Bot API закрыт")
+
+    async def _api_call(self, method: str, data: Dict[str, Any]) -> Any:
+        """
+        Прямой запрос к Bot API через общий HTTP-клиент
+
+        Returns:
+            Поле result ответа
+
+        Raises:
+            TelegramError: Ответ с ok=false (RetryAfter для 429)
+            httpx.HTTPError: Сетевая ошибка
+        """
+        if self.http is None:
+            await self.start_http_client()
+        response = await self.http.post(method, json=data)
+        try:
+            result = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise
+        if result.get('ok'):
+            return result['result']
+        raise telegram_error(result)
+
+    async def get_default_template(self) -> Dict[str, Any]:
         """Получение дефолтного шаблона опроса"""
-        return self.db.get_default_template()
+        return await self.adb.get_default_template()
 
-    def update_default_template(self, updated_template: Dict[str, Any]):
+    async def update_default_template(self, updated_template: Dict[str, Any]):
         """Обновление дефолтного шаблона опроса"""
-        self.db.set_default_template(updated_template)
+        await self.adb.set_default_template(updated_template)
 
-    def get_poll_template_by_id(self, template_id: str) -> Optional[Dict[str, Any]]:
+    async def get_poll_template_by_id(self, template_id: str) -> Optional[Dict[str, Any]]:
         """Получение шаблона опроса по ID"""
         if template_id == 'default':
-            default_template = self.get_default_template()
+            default_template = await self.get_default_template()
             if default_template:
                 template_copy = default_template.copy()
                 template_copy['id'] = 'default'
                 return template_copy
         elif template_id == 'scheduled':
-            default_template = self.get_default_template()
+            default_template = await self.get_default_template()
             if default_template:
                 template_copy = default_template.copy()
                 template_copy['id'] = 'scheduled'
                 return template_copy
         elif template_id == 'single':
-            default_template = self.get_default_template()
+            default_template = await self.get_default_template()
             if default_template:
                 template_copy = default_template.copy()
                 template_copy['id'] = 'single'
                 return template_copy
         return None
 
-    def get_poll_templates(self) -> List[Dict[str, Any]]:
+    async def get_poll_templates(self) -> List[Dict[str, Any]]:
         """Получение всех шаблонов опросов (для совместимости)"""
-        default_template = self.get_default_template()
+        default_template = await self.get_default_template()
         if default_template:
             template_copy = default_template.copy()
             template_copy['id'] = 'default'
@@ -179,102 +293,97 @@ class VolleyBot:
         return []
 
     async def create_poll(self, bot: Bot, chat_id: str, question: str, options: List[str],
-                         is_anonymous: bool = False, message_thread_id: Optional[int] = None) -> Optional[Message]:
-        """Создание опроса в указанном чате или топике"""
-        try:
-            # Прямой запрос к API через httpx для обхода проблемы сериализации options
-            data = {
-                'chat_id': chat_id,
-                'question': question,
-                'options': json.dumps(options, ensure_ascii=False),  # Сериализуем как JSON строку
-                'is_anonymous': is_anonymous,
-                'allows_multiple_answers': False
-            }
-            if message_thread_id is not None:
-                data['message_thread_id'] = message_thread_id
-            
-            # Получаем токен из бота
-            token = bot._bot.token
-            
-            # Используем httpx напрямую
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f'https://api.telegram.org/bot{token}/sendPoll',
-                    json=data,
-                    timeout=30
-                )
-                response.raise_for_status()
-                result = response.json()
-            
-            # Создаем Message из результата
-            from telegram import Message
-            if result.get('ok'):
-                message = Message.de_json(result['result'], bot)
-                return message
-            else:
-                logger.error(f"Telegram API error: {result}")
-                return None
-        except Exception as e:
-            logger.error(f"Ошибка при создании опроса в чате {chat_id}{' (топик ' + str(message_thread_id) + ')' if message_thread_id else ''}: {e}")
+                         is_anonymous: bool = False, message_thread_id: Optional[int] = None,
+                         pin: bool = False, template_id: Optional[str] = None,
+                         schedule_id: Optional[str] = None,
+                         training_date: Optional[str] = None,
+                         training_time: Optional[str] = None) -> Optional[Message]:
+        """
+        Создание опроса в указанном чате или топике
+
+        При pin=True закрепление ставится в очередь сразу за опросом и
+        выполнится, даже если опрос будет отправлен уже после ожидания.
+        Опрос записывается в active_polls сразу при постановке в очередь,
+        ID опроса и сообщения заполняются, когда выполнится sendPoll (даже
+        после OUTBOUND_TIMEOUT или перезапуска). Голоса в нём записывают на
+        тренировку training_date / training_time. Опрос расписания
+        (schedule_id) должен быть предварительно занят через claim_schedule_poll.
+        """
+        # Прямой запрос к API для обхода проблемы сериализации options
+        data = {
+            'chat_id': chat_id,
+            'question': question,
+            'options': json.dumps(options, ensure_ascii=False),  # Сериализуем как JSON строку
+            'is_anonymous': is_anonymous,
+            'allows_multiple_answers': False
+        }
+        if message_thread_id is not None:
+            data['message_thread_id'] = message_thread_id
+
+        poll_job = await self.outbound.enqueue(chat_id, 'sendPoll', data)
+        if schedule_id is not None:
+            await self.adb.set_schedule_poll_job(schedule_id, training_date, poll_job)
+        else:
+            await self.adb.add_pending_poll(
+                poll_job, chat_id, message_thread_id,
+                template_id=template_id, training_date=training_date, training_time=training_time
+            )
+        if pin:
+            await self.outbound.enqueue(chat_id, 'pinChatMessage', {'chat_id': chat_id}, depends_on=poll_job)
+
+        result = await self.outbound.wait_for(poll_job, timeout=OUTBOUND_TIMEOUT)
+        if result is None:
+            logger.error(f"Опрос в чате {chat_id}{' (топик ' + str(message_thread_id) + ')' if message_thread_id else ''} "
+                         f"не создан (задача {poll_job})")
             return None
 
+        # Задача могла выполниться раньше, чем опрос был записан (повтор ничего не меняет)
+        await self.adb.complete_poll_job(poll_job, result)
+        return Message.de_json(result, bot)
+
+    async def _record_sent_poll(self, job: Dict[str, Any], result: Any):
+        """Обработчик очереди: заполнение опроса, ожидавшего свою задачу sendPoll"""
+        if job['method'] == 'sendPoll':
+            await self.adb.complete_poll_job(job['id'], result)
+
     async def pin_message(self, bot: Bot, chat_id: str, message_id: int) -> bool:
         """Закрепление сообщения в чате"""
-        try:
-            await bot.pin_chat_message(chat_id=chat_id, message_id=message_id)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при закреплении сообщения {message_id} в чате {chat_id}: {e}")
-            return False
+        result = await self.outbound.submit(
+            chat_id, 'pinChatMessage', {'chat_id': chat_id, 'message_id': message_id}, OUTBOUND_TIMEOUT
+        )
+        return result is not None
 
     async def unpin_all_messages(self, bot: Bot, chat_id: str) -> bool:
         """Открепление всех сообщений в чате"""
-        try:
-            await bot.unpin_all_chat_messages(chat_id=chat_id)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при откреплении сообщений в чате {chat_id}: {e}")
-            return False
+        result = await self.outbound.submit(chat_id, 'unpinAllChatMessages', {'chat_id': chat_id}, OUTBOUND_TIMEOUT)
+        return result is not None
 
     async def send_message(self, bot: Bot, chat_id: str, text: str) -> Optional[Message]:
         """Отправка текстового сообщения в чат"""
-        try:
-            message = await bot.send_message(chat_id=chat_id, text=text)
-            return message
-        except Exception as e:
-            logger.error(f"Ошибка при отправке сообщения в чат {chat_id}: {e}")
-            return None
+        result = await self.outbound.submit(chat_id, 'sendMessage', {'chat_id': chat_id, 'text': text}, OUTBOUND_TIMEOUT)
+        return Message.de_json(result, bot) if result is not None else None
 
     async def stop_poll(self, bot: Bot, chat_id: str, message_id: int) -> bool:
         """Остановка опроса"""
-        try:
-            await bot.stop_poll(chat_id=chat_id, message_id=message_id)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при остановке опроса {message_id} в чате {chat_id}: {e}")
-            return False
+        return await self.get_poll_results(bot, chat_id, message_id) is not None
 
     async def delete_message(self, bot: Bot, chat_id: str, message_id: int) -> bool:
         """Удаление сообщения из чата"""
-        try:
-            await bot.delete_message(chat_id=chat_id, message_id=message_id)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при удалении сообщения {message_id} из чата {chat_id}: {e}")
-            return False
+        result = await self.outbound.submit(
+            chat_id, 'deleteMessage', {'chat_id': chat_id, 'message_id': message_id}, OUTBOUND_TIMEOUT
+        )
+        return result is not None
 
     async def get_poll_results(self, bot: Bot, chat_id: str, message_id: int) -> Optional[Poll]:
-        """Получение результатов опроса"""
-        try:
-            poll = await bot.stop_poll(chat_id=chat_id, message_id=message_id)
-            return poll
-        except Exception as e:
-            logger.error(f"Ошибка при получении результатов опроса {message_id} в чате {chat_id}: {e}")
-            return None
+        """Получение результатов опроса (опрос останавливается)"""
+        result = await self.outbound.submit(
+            chat_id, 'stopPoll', {'chat_id': chat_id, 'message_id': message_id}, OUTBOUND_TIMEOUT
+        )
+        return Poll.de_json(result, bot) if result is not None else None
 
     async def create_poll_from_template(self, bot: Bot, chat_id: str, message_thread_id: Optional[int] = None) -> Optional[Message]:
         """Создание опроса из дефолтного шаблона"""
-        template = self.get_default_template()
+        template = await self.get_default_template()
         if not template:
             logger.error("Дефолтный шаблон опроса не найден")
             return None
@@ -282,17 +391,11 @@ class VolleyBot:
         training_day = template['training_day']
         training_time = template['training_time']
 
-        target_day = get_day_of_week_number(training_day)
-        if target_day == -1:
+        next_training_date = get_next_training_date(training_day, scheduler_now())
+        if next_training_date is None:
             logger.error(f"Неверный день недели: {training_day}")
             return None
 
-        now = datetime.now()
-        days_ahead = target_day - now.weekday()
-        if days_ahead <= 0:
-            days_ahead += 7
-
-        next_training_date = now + timedelta(days=days_ahead)
         formatted_date_with_weekday = format_date_with_weekday(next_training_date)
 
         description = template['description'].replace('{date}', formatted_date_with_weekday).replace('{time}', training_time)
@@ -303,59 +406,126 @@ class VolleyBot:
             question=description,
             options=template['options'],
             is_anonymous=False,
-            message_thread_id=message_thread_id
+            message_thread_id=message_thread_id,
+            pin=True,
+            template_id='default',
+            training_date=next_training_date.strftime('%Y-%m-%d'),
+            training_time=training_time
         )
 
         if poll_message:
-            await self.pin_message(bot, chat_id, poll_message.message_id)
             logger.info(f"Опрос создан из дефолтного шаблона в чате {chat_id}{' (топик ' + str(message_thread_id) + ')' if message_thread_id else ''}")
 
         return poll_message
 
-    def add_poll_schedule(self, schedule: Dict[str, Any]):
+    async def add_poll_schedule(self, schedule: Dict[str, Any]):
         """Добавление расписания опроса"""
-        self.db.add_poll_schedule(schedule)
-
-    def get_poll_schedules(self) -> List[Dict[str, Any]]:
+        await self.adb.add_poll_schedule(schedule)
+        await self._sync_schedule_job(schedule['id'])
+
+    async def update_poll_schedule(self, schedule_id: str, updates: Dict[str, Any]):
+        """Обновление расписания опроса"""
+        await self.adb.update_poll_schedule(schedule_id, updates)
+        await self._sync_schedule_job(schedule_id)
+
+    async def _sync_schedule_job(self, schedule_id: str):
+        """Перенос задачи планировщика после изменения расписания"""
+        if self.poll_scheduler is None:
+            return
+        schedule = await self.adb.get_poll_schedule(schedule_id)
+        if schedule is None:
+            self.poll_scheduler.remove_schedule(schedule_id)
+        else:
+            self.poll_scheduler.sync_schedule(schedule)
+
+    async def get_poll_schedules(self) -> List[Dict[str, Any]]:
         """Получение всех расписаний опросов"""
-        return self.db.get_poll_schedules()
+        return await self.adb.get_poll_schedules()
 
-    def remove_poll_schedule(self, schedule_id: str):
+    async def remove_poll_schedule(self, schedule_id: str):
         """Удаление расписания опроса"""
-        self.db.remove_poll_schedule(schedule_id)
-
-    async def create_polls_for_all_enabled_templates(self, bot: Bot):
-        """Создание опросов по всем активным расписаниям"""
-        schedules = self.get_poll_schedules()
-        for schedule in schedules:
-            if schedule.get('enabled', True):
-                poll_day = schedule.get('poll_day', 'sunday')
-                target_day = get_day_of_week_number(poll_day)
-                if target_day is not None and target_day == datetime.now().weekday():
-                    await self.create_poll_from_schedule(bot, schedule)
-
-    async def create_poll_from_schedule(self, bot: Bot, schedule: Dict[str, Any]):
-        """Создание опроса из расписания"""
+        await self.adb.remove_poll_schedule(schedule_id)
+        if self.poll_scheduler is not None:
+            self.poll_scheduler.remove_schedule(schedule_id)
+
+    async def run_schedule(self, schedule_id: str, poll_date: Optional[datetime] = None):
+        """
+        Создание опроса по расписанию (вызывается планировщиком)
+
+        Args:
+            poll_date: Время пропущенного запуска при догоняющей публикации,
+                от него считается дата тренировки
+        """
+        schedule = await self.adb.get_poll_schedule(schedule_id)
+        if schedule is None or not schedule.get('enabled', True):
+            logger.info(f"Расписание {schedule_id} удалено или выключено, опрос не создаётся")
+            return None
+
+        poll_date = poll_date or scheduler_now()
+        training_date = get_next_training_date(schedule['training_day'], poll_date)
+        if training_date is not None and training_date.date() < scheduler_now().date():
+            logger.info(f"Расписание {schedule_id}: тренировка {training_date:%d.%m.%Y} уже прошла, опрос не создаётся")
+            return None
+
+        logger.info(f"Создание опроса по расписанию {schedule_id}")
+        return await self.create_poll_from_schedule(self.bot, schedule, poll_date=poll_date)
+
+    async def create_polls_for_all_enabled_templates(self, bot: Bot) -> List[Dict[str, Any]]:
+        """
+        Создание опросов по всем активным расписаниям на сегодня
+
+        Опросы отправляются параллельно в пределах лимитов Telegram,
+        в конце в лог пишется отчёт по каждому расписанию.
+        """
+        schedules = await self.get_poll_schedules()
+        today = scheduler_now().weekday()
+        due = [
+            schedule for schedule in schedules
+            if schedule.get('enabled', True)
+            and get_day_of_week_number(schedule.get('poll_day', 'sunday')) == today
+        ]
+        if not due:
+            return []
+
+        template = await self.get_default_template()
+        results = await fan_out(
+            due,
+            lambda schedule: self.create_poll_from_schedule(bot, schedule, template),
+            key=lambda schedule: f"{schedule['id']} ({schedule['chat_id']})",
+        )
+        logger.info(format_fan_out_summary(results, "Опросы по расписанию"))
+        return results
+
+    async def create_poll_from_schedule(self, bot: Bot, schedule: Dict[str, Any],
+                                        template: Optional[Dict[str, Any]] = None,
+                                        poll_date: Optional[datetime] = None):
+        """
+        Создание опроса из расписания
+
+        Опрос создаётся не больше одного раза на расписание и дату
+        тренировки (повторный вызов возвращает None), poll_date — день
+        публикации (по умолчанию сегодня).
+        """
         chat_id = schedule['chat_id']
         thread_id = schedule.get('message_thread_id', None)
         training_day = schedule['training_day']
         training_time = schedule['training_time']
         options = schedule.get('options', [])
 
-        target_day = get_day_of_week_number(training_day)
-        if target_day == -1:
+        next_training_date = get_next_training_date(training_day, poll_date or scheduler_now())
+        if next_training_date is None:
             logger.error(f"Неверный день недели: {training_day}")
             return None
 
-        now = datetime.now()
-        days_ahead = target_day - now.weekday()
-        if days_ahead <= 0:
-            days_ahead += 7
+        training_date = next_training_date.strftime('%Y-%m-%d')
+        if not await self.adb.claim_schedule_poll(schedule['id'], training_date, chat_id, thread_id, training_time):
+            logger.info(f"Расписание {schedule['id']}: опрос на {next_training_date:%d.%m.%Y} уже опубликован")
+            return None
 
-        next_training_date = now + timedelta(days=days_ahead)
         formatted_date_with_weekday = format_date_with_weekday(next_training_date)
 
-        template = self.get_default_template()
+        if template is None:
+            template = await self.get_default_template()
         description = template['description'].replace('{date}', formatted_date_with_weekday).replace('{time}', training_time)
 
         poll_options = options if options else template['options']
@@ -366,7 +536,9 @@ class VolleyBot:
             question=description,
             options=poll_options,
             is_anonymous=False,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            schedule_id=schedule['id'],
+            training_date=training_date
         )
 
         if poll_message:
@@ -374,10 +546,6 @@ class VolleyBot:
 
         return poll_message
 
-    def save_config(self):
-        """Сохранение конфигурации (для совместимости)"""
-        pass
-
     def add_poll_template(self, template: Dict[str, Any]):
         """Добавление шаблона опроса (для совместимости)"""
         pass
@@ -391,41 +559,122 @@ TokenMaskingFilter.set_token(volley_bot.bot_token)
 TokenMaskingFormatter.set_token(volley_bot.bot_token)
 
 
-async def schedule_poll_creation(context: ContextTypes.DEFAULT_TYPE):
-    """Функция для автоматического создания опросов по расписанию"""
-    logger.info("Запуск автоматического создания опросов по расписанию")
-    await volley_bot.create_polls_for_all_enabled_templates(context.bot)
+async def post_init(application: Application):
+    """Запуск HTTP-клиента, очереди исходящих запросов и планировщика вместе с приложением"""
+    await volley_bot.start_http_client()
+    # До очистки очереди: её результаты нужны опросам, отправленным перед остановкой
+    reconciled = await volley_bot.adb.reconcile_pending_polls()
+    if reconciled:
+        logger.info(f"Сохранено опросов, отправленных до перезапуска: {reconciled}")
+    await volley_bot.adb.purge_outbound_jobs()
+    volley_bot.outbound.start()
+
+    volley_bot.bot = application.bot
+    # Шаги диалогов хранятся в volleybot.db и переживают перезапуск
+    volley_bot.states = SQLiteStateStore(Database(volley_bot.db.db_path))
+    use_state_store(volley_bot.states)
+    # Задачи расписаний хранятся в volleybot.db и переживают перезапуск
+    scheduler = AsyncIOScheduler(
+        timezone=SCHEDULER_TIMEZONE,
+        jobstores={
+            'default': MemoryJobStore(),
+            'polls': SQLiteJobStore(Database(volley_bot.db.db_path)),
+        },
+    )
+    volley_bot.poll_scheduler = PollScheduler(
+        scheduler, volley_bot.adb, volley_bot.run_schedule, jobstore='polls'
+    )
+    # На паузе, пока публикуются пропущенные опросы и сверяются задачи
+    scheduler.start(paused=True)
+    await volley_bot.poll_scheduler.catch_up()
+
+    # Своя задача на каждое расписание, изменения из веба подхватываются по отметке
+    await volley_bot.poll_scheduler.sync_all()
+    scheduler.add_job(volley_bot.poll_scheduler.check_for_changes, 'interval',
+                      seconds=SCHEDULE_SYNC_INTERVAL, id='poll_schedules_sync',
+                      replace_existing=True)
+    scheduler.add_job(volley_bot.states.sweep, 'interval',
+                      seconds=STATE_SWEEP_INTERVAL, id='conversation_states_sweep',
+                      replace_existing=True)
+    scheduler.resume()
+
+
+async def post_shutdown(application: Application):
+    """Остановка планировщика, приёма голосов, очереди, HTTP-клиента и хранилища диалогов при остановке приложения"""
+    if volley_bot.poll_scheduler is not None:
+        volley_bot.poll_scheduler.scheduler.shutdown(wait=False)
+    await volley_bot.poll_answers.stop()
+    await volley_bot.outbound.stop()
+    await volley_bot.close_http_client()
+    if volley_bot.states is not None:
+        volley_bot.states.close()
+    volley_bot.admins.close()
+
+    for name, stats in sorted(callback_router.stats().items()):
+        logger.info(f"Кнопка {name}: {stats['calls']} нажатий, ошибок {stats['errors']}, "
+                    f"в среднем {stats['avg_ms']} мс, максимум {stats['max_ms']} мс")
+
+
+async def run_webhook(application: Application):
+    """
+    Работа через webhook: обновления принимает локальный uvicorn
+
+    Webhook при остановке не удаляется: Telegram придержит обновления до
+    следующего запуска, а run_polling при переходе обратно удалит его сам.
+    """
+    # FastAPI и uvicorn нужны только в режиме webhook
+    import uvicorn
+    from webhook import DEFAULT_WEBHOOK_PATH, create_webhook_app, generate_secret_token, set_webhook
+
+    secret_token = WEBHOOK_SECRET or generate_secret_token()
+    path = urlparse(WEBHOOK_URL).path or DEFAULT_WEBHOOK_PATH
+    server = uvicorn.Server(uvicorn.Config(
+        create_webhook_app(application, secret_token, path),
+        host=WEBHOOK_LISTEN, port=WEBHOOK_PORT, log_level='warning',
+    ))
+
+    # post_init / post_shutdown вызывает только run_polling, здесь — вручную
+    async with application:
+        await post_init(application)
+        await application.start()
+        try:
+            await set_webhook(volley_bot._api_call, WEBHOOK_URL, secret_token,
+                              allowed_updates=get_allowed_updates(application))
+            logger.info(f"Приём обновлений на {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{path}")
+            await server.serve()
+        finally:
+            await application.stop()
+            await post_shutdown(application)
 
 
 def main():
     """Основная функция запуска бота"""
     # Создаем приложение
-    application = Application.builder().token(volley_bot.bot_token).build()
+    application = (
+        Application.builder()
+        .token(volley_bot.bot_token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Сохраняем экземпляр бота в context.bot_data
     application.bot_data['volley_bot'] = volley_bot
 
-    # Создаем планировщик
-    scheduler = AsyncIOScheduler()
-
-    # Планируем создание опросов каждый день в 12:00 MSK
-    scheduler.add_job(schedule_poll_creation,
-                      CronTrigger(hour=12, minute=0),
-                      args=(application.bot,))
-
-    # Запускаем планировщик
-    scheduler.start()
-
     # Регистрируем обработчики
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("getid", get_user_id))
     application.add_handler(CallbackQueryHandler(button_handler))
+    application.add_handler(PollAnswerHandler(poll_answer))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
     # Запускаем бота
     logger.info("Запуск бота...")
 
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling(allowed_updates=get_allowed_updates(application))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Маршрутизация нажатий на inline-кнопки
+
+Обработчики регистрируются декоратором: на точное значение callback_data
+(router.callback) или на префикс параметризованных кнопок вида
+edit_schedule:<id> (router.prefix). Точные значения ищутся в словаре,
+префиксы — в префиксном дереве по символам callback_data, поэтому время
+поиска не зависит от числа кнопок в меню. Для каждого маршрута
+считаются вызовы, ошибки и время обработки.
+"""
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Обработчик inline-кнопки: (query, context, user_id)
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+
+class CallbackRoute:
+    """Зарегистрированный обработчик и счётчики его вызовов"""
+
+    def __init__(self, name: str, handler: CallbackHandler):
+        self.name = name
+        self.handler = handler
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float, failed: bool = False):
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.total_time * 1000, 3),
+            'avg_ms': round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_time * 1000, 3),
+        }
+
+
+class CallbackRouter:
+    """
+    Таблица обработчиков inline-кнопок
+
+    Пример:
+        router = CallbackRouter()
+
+        @router.callback('settings_menu')
+        async def on_settings_menu(query, context, user_id): ...
+
+        @router.prefix('edit_schedule:')
+        async def on_edit_schedule(query, context, user_id): ...
+
+        await router.dispatch(query.data, query, context, user_id)
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self._exact: Dict[str, CallbackRoute] = {}
+        # Узел дерева: {символ: узел}, маршрут узла хранится под ключом None
+        self._trie: Dict[Optional[str], Any] = {}
+        self.unknown = 0
+
+    def callback(self, data: str) -> Callable[[CallbackHandler], CallbackHandler]:
+        """Декоратор: обработчик кнопки с callback_data == data"""
+        def register(handler: CallbackHandler) -> CallbackHandler:
+            if data in self._exact:
+                raise ValueError(f"Кнопка {data!r} уже зарегистрирована")
+            self._exact[data] = CallbackRoute(data, handler)
+            return handler
+        return register
+
+    def prefix(self, prefix: str) -> Callable[[CallbackHandler], CallbackHandler]:
+        """
+        Декоратор: обработчик кнопок, чей callback_data начинается с prefix
+
+        Если подходят несколько префиксов, выбирается самый длинный.
+        """
+        if not prefix:
+            raise ValueError("Префикс не может быть пустым")
+
+        def register(handler: CallbackHandler) -> CallbackHandler:
+            node = self._trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            if None in node:
+                raise ValueError(f"Префикс {prefix!r} уже зарегистрирован")
+            node[None] = CallbackRoute(prefix, handler)
+            return handler
+        return register
+
+    def resolve(self, data: str) -> Optional[CallbackRoute]:
+        """Маршрут для callback_data или None, если кнопка неизвестна"""
+        route = self._exact.get(data)
+        if route is not None:
+            return route
+
+        # callback_data не длиннее 64 байт, так что обход дерева ограничен
+        node, found = self._trie, None
+        for char in data:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+    async def dispatch(self, data: str, *args, **kwargs) -> bool:
+        """
+        Вызов обработчика кнопки с замером времени
+
+        Returns:
+            False, если для callback_data нет обработчика
+        """
+        route = self.resolve(data)
+        if route is None:
+            self.unknown += 1
+            return False
+
+        started = self.clock()
+        try:
+            await route.handler(*args, **kwargs)
+        except Exception:
+            route.record(self.clock() - started, failed=True)
+            raise
+        route.record(self.clock() - started)
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Счётчики маршрутов, которые вызывались хотя бы раз"""
+        routes = list(self._exact.values()) + list(self._iter_prefix_routes(self._trie))
+        return {route.name: route.stats() for route in routes if route.calls}
+
+    def _iter_prefix_routes(self, node):
+        for char, child in node.items():
+            if char is None:
+                yield child
+            else:
+                yield from self._iter_prefix_routes(child)
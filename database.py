@@ -3,27 +3,160 @@
 Модуль для работы с SQLite базой данных
 """
 
+import copy
 import sqlite3
 import json
 import logging
 import os
 import sys
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from utils import month_bounds
+
 logger = logging.getLogger(__name__)
 
+# Количество мест на тренировке по умолчанию, остальные записи попадают в waitlist.
+# Переопределяется полем capacity шаблона, расписания или разовой тренировки.
+TRAINING_CAPACITY = 12
+
+# Через сколько секунд занятый опрос расписания без задачи sendPoll
+# (бот остановился между claim_schedule_poll и set_schedule_poll_job)
+# можно занять заново
+SCHEDULE_CLAIM_TIMEOUT = 60
+
+# Сколько секунд после обмена refresh-токена его повтор считается
+# параллельным обновлением (две вкладки), а не утечкой
+REFRESH_REUSE_GRACE = 10
+
+# Отметка в кэше настроек: ключа нет в таблице settings
+_MISSING = object()
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Профили подключения: PRAGMA, которые выставляются каждому соединению.
+# WAL позволяет процессу бота и веб-API читать и писать в volleybot.db
+# одновременно: читатели не блокируют писателя и наоборот.
+CONNECTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    'default': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,       # мс ожидания блокировки вместо "database is locked"
+        'cache_size': -16000,       # отрицательное значение — в КБ (16 МБ)
+        'mmap_size': 67108864,      # 64 МБ
+        'temp_store': 'MEMORY',
+    },
+    # WAL с fsync на каждый коммит — для дисков без защиты от потери питания
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'cache_size': -16000,
+        'mmap_size': 67108864,
+        'temp_store': 'MEMORY',
+    },
+    # Поведение до перехода на WAL (rollback journal)
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+}
+
+# Допустимые значения строковых PRAGMA (значения подставляются в SQL)
+_PRAGMA_CHOICES = {
+    'journal_mode': {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'},
+    'synchronous': {'OFF', 'NORMAL', 'FULL', 'EXTRA'},
+    'temp_store': {'DEFAULT', 'FILE', 'MEMORY'},
+}
+
+
+def get_connection_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Получение профиля подключения с учётом переменных окружения
+
+    Профиль выбирается аргументом или VOLLEYBOT_DB_PROFILE (по умолчанию
+    'default'). Отдельные PRAGMA переопределяются переменными
+    VOLLEYBOT_DB_<PRAGMA>, например VOLLEYBOT_DB_BUSY_TIMEOUT=10000.
+
+    Returns:
+        Словарь PRAGMA с ключом 'name' — именем профиля
+    """
+    name = name or os.getenv('VOLLEYBOT_DB_PROFILE', 'default')
+    if name not in CONNECTION_PROFILES:
+        logger.warning(f"Неизвестный профиль подключения {name}, используется default")
+        name = 'default'
+
+    profile = dict(CONNECTION_PROFILES[name])
+    for pragma in list(profile):
+        raw = os.getenv(f'VOLLEYBOT_DB_{pragma.upper()}')
+        if raw is None:
+            continue
+        if pragma in _PRAGMA_CHOICES:
+            value = raw.strip().upper()
+            if value not in _PRAGMA_CHOICES[pragma]:
+                logger.warning(f"Недопустимое значение VOLLEYBOT_DB_{pragma.upper()}={raw}, игнорируется")
+                continue
+            profile[pragma] = value
+        else:
+            try:
+                profile[pragma] = int(raw)
+            except ValueError:
+                logger.warning(f"Недопустимое значение VOLLEYBOT_DB_{pragma.upper()}={raw}, игнорируется")
+
+    profile['name'] = name
+    return profile
+
 
 class Database:
     """
     Класс для работы с SQLite базой данных
     """
 
-    def __init__(self, db_path: str = "volleybot.db"):
+    def __init__(self, db_path: str = "volleybot.db", profile: Optional[str] = None):
         self.db_path = db_path
+        self.profile = get_connection_profile(profile)
         self.conn: Optional[sqlite3.Connection] = None
+        # Транзакции на общем соединении не должны перемежаться между потоками
+        self._write_lock = threading.RLock()
+        # Кэш разобранных значений settings, сбрасывается при записи из другого соединения
+        self._settings_cache: Dict[str, Any] = {}
+        self._settings_data_version: Optional[int] = None
+        # Растёт при каждом изменении настроек (своём или другого соединения)
+        self._settings_generation = 0
         self._connect()
 
+    def _open_connection(self) -> sqlite3.Connection:
+        """Открытие соединения с PRAGMA из профиля подключения"""
+        profile = self.profile
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=profile['busy_timeout'] / 1000,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+
+        journal_mode = conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}").fetchone()[0]
+        conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        conn.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+        conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+        conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+
+        logger.info(
+            f"Профиль подключения {profile['name']}: journal_mode={journal_mode}, "
+            f"synchronous={profile['synchronous']}, busy_timeout={profile['busy_timeout']}, "
+            f"cache_size={profile['cache_size']}, mmap_size={profile['mmap_size']}, "
+            f"temp_store={profile['temp_store']}"
+        )
+        return conn
+
     def _connect(self):
         """Подключение к базе данных"""
         # Не создаём файл если он не существует
@@ -31,59 +164,25 @@ class Database:
             logger.info(f"База данных не существует: {self.db_path}")
             return
         
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        self.conn = self._open_connection()
         logger.info(f"Подключено к базе данных: {self.db_path}")
 
-    def create_tables(self):
-        """Создание таблиц если они не существуют"""
-        # Если БД не существует, создаём её
-        if not self.conn:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row
-            logger.info(f"Создана база данных: {self.db_path}")
-        
-        cursor = self.conn.cursor()
-
-        # Таблица настроек бота
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Таблица расписаний опросов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS poll_schedules (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                chat_id TEXT NOT NULL,
-                message_thread_id INTEGER,
-                training_day TEXT NOT NULL,
-                poll_day TEXT NOT NULL,
-                training_time TEXT NOT NULL,
-                enabled INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Таблица активных опросов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS active_polls (
-                id TEXT PRIMARY KEY,
-                chat_id TEXT NOT NULL,
-                message_id INTEGER NOT NULL,
-                message_thread_id INTEGER,
-                template_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        self.conn.commit()
-        logger.info("Таблицы базы данных созданы/проверены")
+    @contextmanager
+    def _transaction(self):
+        """
+        Транзакция BEGIN IMMEDIATE: блокировка записи берётся сразу,
+        поэтому проверка и запись внутри не пересекаются с другими писателями
+        (в том числе из другого процесса)
+        """
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
 
     def close(self):
         """Закрытие соединения с базой данных"""
@@ -93,31 +192,62 @@ class Database:
 
     # ==================== Методы для работы с настройками ====================
 
+    @staticmethod
+    def _parse_setting(value: str) -> Any:
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+
+    def _check_settings_cache(self):
+        """
+        Сброс кэша настроек, если БД менял другой процесс или соединение
+
+        PRAGMA data_version меняется только после коммитов других соединений,
+        свои записи обновляют кэш в set_setting.
+        """
+        data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._settings_data_version:
+            self._settings_cache.clear()
+            self._settings_data_version = data_version
+            self._settings_generation += 1
+
+    def get_settings_generation(self) -> int:
+        """Номер версии настроек: меняется, если с прошлого вызова настройки могли измениться"""
+        if self.conn:
+            self._check_settings_cache()
+        return self._settings_generation
+
     def get_setting(self, key: str, default: Any = None) -> Any:
-        """Получение настройки по ключу"""
+        """Получение настройки по ключу (из кэша, возвращается копия)"""
         if not self.conn:
             return default
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-        row = cursor.fetchone()
-        if row is None:
+        self._check_settings_cache()
+        if key not in self._settings_cache:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
+            row = cursor.fetchone()
+            self._settings_cache[key] = _MISSING if row is None else self._parse_setting(row['value'])
+        value = self._settings_cache[key]
+        if value is _MISSING:
             return default
-        try:
-            return json.loads(row['value'])
-        except json.JSONDecodeError:
-            return row['value']
+        return copy.deepcopy(value)
 
     def set_setting(self, key: str, value: Any):
-        """Сохранение настройки"""
+        """Сохранение настройки (кэш обновляется сразу)"""
         if not self.conn:
             logger.error(f"Нельзя сохранить настройку {key}: база данных не подключена")
             return
+        stored = json.dumps(value) if not isinstance(value, str) else value
         cursor = self.conn.cursor()
         cursor.execute('''
             INSERT OR REPLACE INTO settings (key, value, updated_at)
             VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (key, json.dumps(value) if not isinstance(value, str) else value))
+        ''', (key, stored))
         self.conn.commit()
+        self._check_settings_cache()
+        self._settings_cache[key] = self._parse_setting(stored)
+        self._settings_generation += 1
 
     def get_admin_ids(self) -> List[int]:
         """Получение списка ID администраторов"""
@@ -125,15 +255,52 @@ class Database:
         return [int(id) for id in admin_ids]
 
     def set_admin_ids(self, admin_ids: List[int]):
-        """Сохранение списка ID администраторов"""
-        self.set_setting('admin_user_ids', [int(id) for id in admin_ids])
+        """Сохранение списка ID администраторов (вместе с users.is_admin)"""
+        self._update_admin_ids(lambda current: [int(id) for id in admin_ids])
 
     def add_admin_id(self, admin_id: int):
         """Добавление ID администратора"""
-        admin_ids = self.get_admin_ids()
-        if admin_id not in admin_ids:
-            admin_ids.append(admin_id)
-            self.set_admin_ids(admin_ids)
+        admin_id = int(admin_id)
+        self._update_admin_ids(lambda current: current if admin_id in current else current + [admin_id])
+
+    def remove_admin_id(self, admin_id: int):
+        """Удаление ID администратора"""
+        admin_id = int(admin_id)
+        self._update_admin_ids(lambda current: [id for id in current if id != admin_id])
+
+    def _update_admin_ids(self, change: Callable[[List[int]], List[int]]) -> List[int]:
+        """
+        Изменение списка администраторов одной транзакцией
+
+        Список читается внутри BEGIN IMMEDIATE, поэтому одновременные
+        изменения из бота и веб-интерфейса не теряются, а users.is_admin
+        всегда совпадает с настройкой admin_user_ids.
+        """
+        if not self.conn:
+            logger.error("Нельзя изменить список администраторов: база данных не подключена")
+            return []
+
+        with self._transaction() as cursor:
+            cursor.execute("SELECT value FROM settings WHERE key = 'admin_user_ids'")
+            row = cursor.fetchone()
+            current = [int(id) for id in (self._parse_setting(row['value']) if row else [])]
+            admin_ids = change(current)
+            stored = json.dumps(admin_ids)
+            cursor.execute('''
+                INSERT OR REPLACE INTO settings (key, value, updated_at)
+                VALUES ('admin_user_ids', ?, CURRENT_TIMESTAMP)
+            ''', (stored,))
+            cursor.execute('''
+                UPDATE users
+                SET is_admin = telegram_id IN (SELECT value FROM json_each(?)),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE is_admin != (telegram_id IN (SELECT value FROM json_each(?)))
+            ''', (stored, stored))
+
+        self._check_settings_cache()
+        self._settings_cache['admin_user_ids'] = admin_ids
+        self._settings_generation += 1
+        return admin_ids
 
     def get_default_template(self) -> Dict[str, Any]:
         """Получение шаблона опроса по умолчанию"""
@@ -146,7 +313,8 @@ class Database:
             'options': ['Буду', 'Не буду', 'Возможно'],
             'enabled': True,
             'default_chat_id': '',
-            'default_topic_id': None
+            'default_topic_id': None,
+            'capacity': TRAINING_CAPACITY
         }
         stored = self.get_setting('default_poll_template', default)
         # Объединяем с дефолтными значениями на случай добавления новых полей
@@ -189,8 +357,9 @@ class Database:
         schedule_id = schedule.get('id', str(datetime.now().timestamp()))
         cursor.execute('''
             INSERT INTO poll_schedules (id, name, chat_id, message_thread_id, 
-                                        training_day, poll_day, training_time, enabled)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                                        training_day, poll_day, training_time, enabled, capacity, poll_time,
+                                        updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now'))
         ''', (
             schedule_id,
             schedule.get('name', 'Расписание'),
@@ -199,7 +368,9 @@ class Database:
             schedule['training_day'],
             schedule['poll_day'],
             schedule['training_time'],
-            1 if schedule.get('enabled', True) else 0
+            1 if schedule.get('enabled', True) else 0,
+            schedule.get('capacity'),
+            schedule.get('poll_time') or '12:00'
         ))
         self.conn.commit()
 
@@ -213,7 +384,7 @@ class Database:
         values = list(updates.values()) + [schedule_id]
         cursor.execute(f'''
             UPDATE poll_schedules 
-            SET {set_clause}, updated_at = CURRENT_TIMESTAMP
+            SET {set_clause}, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
             WHERE id = ?
         ''', values)
         self.conn.commit()
@@ -227,6 +398,19 @@ class Database:
         cursor.execute('DELETE FROM poll_schedules WHERE id = ?', (schedule_id,))
         self.conn.commit()
 
+    def get_poll_schedules_watermark(self) -> tuple:
+        """
+        Отметка состояния расписаний: (количество, последний rowid, последний updated_at)
+
+        Меняется при добавлении, удалении и изменении расписания, по ней
+        планировщик замечает изменения, сделанные через веб-интерфейс.
+        """
+        if not self.conn:
+            return (0, None, None)
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COUNT(*), MAX(rowid), MAX(updated_at) FROM poll_schedules')
+        return tuple(cursor.fetchone())
+
     def get_poll_schedule(self, schedule_id: str) -> Optional[Dict[str, Any]]:
         """Получение расписания по ID"""
         if not self.conn:
@@ -244,16 +428,21 @@ class Database:
 
     def add_active_poll(self, poll_id: str, chat_id: str, message_id: int,
                         message_thread_id: Optional[int] = None,
-                        template_id: Optional[str] = None):
+                        template_id: Optional[str] = None,
+                        schedule_id: Optional[str] = None,
+                        training_date: Optional[str] = None,
+                        training_time: Optional[str] = None):
         """Добавление активного опроса"""
         if not self.conn:
             logger.error("Нельзя добавить активный опрос: база данных не подключена")
             return
         cursor = self.conn.cursor()
         cursor.execute('''
-            INSERT INTO active_polls (id, chat_id, message_id, message_thread_id, template_id)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (poll_id, chat_id, message_id, message_thread_id, template_id))
+            INSERT INTO active_polls (id, chat_id, message_id, message_thread_id, template_id,
+                                      schedule_id, training_date, training_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (poll_id, chat_id, message_id, message_thread_id, template_id, schedule_id,
+              training_date, training_time))
         self.conn.commit()
 
     def get_active_polls(self) -> List[Dict[str, Any]]:
@@ -289,6 +478,154 @@ class Database:
             return dict(row)
         return None
 
+    def get_schedule_poll(self, schedule_id: str, training_date: str) -> Optional[Dict[str, Any]]:
+        """Опрос расписания на дату тренировки (YYYY-MM-DD), в том числе ещё не отправленный"""
+        if not self.conn:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT * FROM active_polls WHERE schedule_id = ? AND training_date = ?',
+            (schedule_id, training_date)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def claim_schedule_poll(self, schedule_id: str, training_date: str, chat_id: str,
+                            message_thread_id: Optional[int] = None,
+                            training_time: Optional[str] = None) -> bool:
+        """
+        Занятие опроса расписания на дату тренировки перед отправкой
+
+        Запись (schedule_id, training_date) уникальна, поэтому повторный
+        запуск задачи, догоняющая публикация или ручное обновление не
+        отправят второй опрос. Запись без message_id занимается заново,
+        если её задача sendPoll завершилась ошибкой или удалена, либо
+        задача так и не была привязана за SCHEDULE_CLAIM_TIMEOUT секунд.
+
+        Returns:
+            True, если опрос нужно отправить
+        """
+        if not self.conn:
+            logger.error("Нельзя занять опрос расписания: база данных не подключена")
+            return False
+
+        with self._transaction() as cursor:
+            cursor.execute('''
+                SELECT ap.message_id, ap.outbound_job_id, oj.status AS job_status,
+                       ap.created_at < datetime('now', ?) AS claim_expired
+                FROM active_polls ap
+                LEFT JOIN outbound_jobs oj ON oj.id = ap.outbound_job_id
+                WHERE ap.schedule_id = ? AND ap.training_date = ?
+            ''', (f'-{SCHEDULE_CLAIM_TIMEOUT} seconds', schedule_id, training_date))
+            row = cursor.fetchone()
+
+            if row is None:
+                cursor.execute('''
+                    INSERT INTO active_polls (id, chat_id, message_thread_id, schedule_id,
+                                              training_date, training_time)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (f"pending:{schedule_id}:{training_date}", chat_id, message_thread_id,
+                      schedule_id, training_date, training_time))
+                return True
+
+            if row['outbound_job_id'] is None:
+                abandoned = bool(row['claim_expired'])
+            else:
+                abandoned = row['job_status'] in (None, 'failed')
+            if row['message_id'] is None and abandoned:
+                cursor.execute('''
+                    UPDATE active_polls
+                    SET chat_id = ?, message_thread_id = ?, training_time = ?, outbound_job_id = NULL,
+                        created_at = CURRENT_TIMESTAMP
+                    WHERE schedule_id = ? AND training_date = ?
+                ''', (chat_id, message_thread_id, training_time, schedule_id, training_date))
+                return True
+
+        return False
+
+    def set_schedule_poll_job(self, schedule_id: str, training_date: str, outbound_job_id: int):
+        """Привязка занятого опроса расписания к задаче sendPoll в очереди"""
+        if not self.conn:
+            return
+        with self._transaction() as cursor:
+            cursor.execute('''
+                UPDATE active_polls SET outbound_job_id = ?
+                WHERE schedule_id = ? AND training_date = ?
+            ''', (outbound_job_id, schedule_id, training_date))
+
+    def add_pending_poll(self, outbound_job_id: int, chat_id: str,
+                         message_thread_id: Optional[int] = None,
+                         template_id: Optional[str] = None,
+                         training_date: Optional[str] = None,
+                         training_time: Optional[str] = None):
+        """
+        Запись опроса (не по расписанию), поставленного в очередь
+
+        ID опроса и сообщения заполняет complete_poll_job, когда задача
+        sendPoll выполнится.
+        """
+        if not self.conn:
+            return
+        with self._transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO active_polls (id, chat_id, message_thread_id, template_id,
+                                          training_date, training_time, outbound_job_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (f"pending:job:{outbound_job_id}", chat_id, message_thread_id, template_id,
+                  training_date, training_time, outbound_job_id))
+
+    def complete_poll_job(self, outbound_job_id: int, result: Any) -> bool:
+        """
+        Сохранение опроса, отправленного задачей sendPoll
+
+        Args:
+            result: Ответ Bot API (Message) на sendPoll
+
+        Returns:
+            True, если ожидавшая задачу запись опроса заполнена
+        """
+        if not self.conn or not isinstance(result, dict) or not isinstance(result.get('poll'), dict):
+            return False
+        with self._transaction() as cursor:
+            cursor.execute('''
+                UPDATE active_polls SET id = ?, message_id = ?
+                WHERE outbound_job_id = ? AND message_id IS NULL
+            ''', (result['poll']['id'], result['message_id'], outbound_job_id))
+            return cursor.rowcount > 0
+
+    def reconcile_pending_polls(self) -> int:
+        """
+        Заполнение опросов, чьи задачи sendPoll выполнились без записи
+        результата (бот остановился сразу после отправки)
+
+        Returns:
+            Сколько опросов заполнено
+        """
+        if not self.conn:
+            return 0
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT ap.outbound_job_id, oj.result
+            FROM active_polls ap
+            JOIN outbound_jobs oj ON oj.id = ap.outbound_job_id
+            WHERE ap.message_id IS NULL AND oj.status = 'done'
+        ''')
+        rows = cursor.fetchall()
+        return sum(
+            self.complete_poll_job(row['outbound_job_id'], json.loads(row['result']))
+            for row in rows if row['result'] is not None
+        )
+
+    def complete_schedule_poll(self, schedule_id: str, training_date: str, poll_id: str, message_id: int):
+        """Сохранение отправленного опроса расписания: ID опроса Telegram и сообщения"""
+        if not self.conn:
+            return
+        with self._transaction() as cursor:
+            cursor.execute('''
+                UPDATE active_polls SET id = ?, message_id = ?
+                WHERE schedule_id = ? AND training_date = ?
+            ''', (poll_id, message_id, schedule_id, training_date))
+
     # ==================== Методы миграции ====================
 
     def migrate_from_json(self, json_path: str = "data.json"):
@@ -349,8 +686,7 @@ class Database:
         """Создание таблиц если они не существуют"""
         # Если БД не существует, создаём её
         if not self.conn:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row
+            self.conn = self._open_connection()
             logger.info(f"Создана база данных: {self.db_path}")
 
         cursor = self.conn.cursor()
@@ -375,6 +711,8 @@ class Database:
                 poll_day TEXT NOT NULL,
                 training_time TEXT NOT NULL,
                 enabled INTEGER DEFAULT 1,
+                capacity INTEGER,
+                poll_time TEXT DEFAULT '12:00',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
@@ -385,10 +723,15 @@ class Database:
             CREATE TABLE IF NOT EXISTS active_polls (
                 id TEXT PRIMARY KEY,
                 chat_id TEXT NOT NULL,
-                message_id INTEGER NOT NULL,
+                message_id INTEGER,
                 message_thread_id INTEGER,
                 template_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                schedule_id TEXT,
+                training_date TEXT,
+                training_time TEXT,
+                outbound_job_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(schedule_id, training_date)
             )
         ''')
 
@@ -408,9 +751,234 @@ class Database:
             )
         ''')
 
+        # Очередь исходящих запросов к Bot API
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS outbound_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id TEXT NOT NULL,
+                method TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                depends_on INTEGER,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                result TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Выданные refresh-токены веб-интерфейса: семейство на каждый вход,
+        # при обмене токен помечается использованным и заменяется новым
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS refresh_tokens (
+                jti TEXT PRIMARY KEY,
+                family_id TEXT NOT NULL,
+                telegram_id INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL,
+                replaced_by TEXT,
+                revoked INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        self._ensure_training_slots(cursor)
+
         self.conn.commit()
         logger.info("Таблицы базы данных созданы/проверены")
 
+    def _ensure_training_slots(self, cursor: sqlite3.Cursor):
+        """
+        Счётчики мест тренировок (то же, что migrate_training_capacity.py):
+        без training_slots и capacity не работает запись на тренировки
+        """
+        if self._table_exists('one_time_trainings') and not self._columns_exist('one_time_trainings', ('capacity',)):
+            cursor.execute('ALTER TABLE one_time_trainings ADD COLUMN capacity INTEGER')
+        if self._table_exists('training_slots'):
+            return
+
+        cursor.execute('''
+            CREATE TABLE training_slots (
+                training_date DATE NOT NULL,
+                training_time TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                registered_count INTEGER NOT NULL DEFAULT 0,
+                waitlist_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (training_date, training_time, chat_id)
+            )
+        ''')
+        if self._table_exists('training_registrations'):
+            cursor.execute('''
+                INSERT INTO training_slots
+                    (training_date, training_time, chat_id, registered_count, waitlist_count)
+                SELECT training_date, training_time, chat_id,
+                       SUM(status = 'registered'), SUM(status = 'waitlist')
+                FROM training_registrations
+                GROUP BY training_date, training_time, chat_id
+            ''')
+        logger.info("Создана таблица training_slots")
+
+        self.ensure_indexes()
+
+    # ==================== Методы для работы с индексами ====================
+
+    # Индексы горячих запросов: (имя, таблица, колонки).
+    # Таблицы тренировок создаются миграциями, поэтому индексы на них
+    # создаются только если таблица уже существует.
+    INDEXES = (
+        # Записи слота, подсчёт по статусу и очередь waitlist по registered_at
+        ('idx_training_registrations_slot', 'training_registrations',
+         ('training_date', 'training_time', 'chat_id', 'status', 'registered_at')),
+        # Записи пользователя (get_user_trainings)
+        ('idx_training_registrations_user', 'training_registrations',
+         ('user_telegram_id', 'training_date')),
+        # JOIN записей с разовыми тренировками
+        ('idx_one_time_trainings_slot', 'one_time_trainings',
+         ('training_date', 'training_time', 'chat_id')),
+        # JOIN записей с расписаниями
+        ('idx_poll_schedules_chat_time', 'poll_schedules',
+         ('chat_id', 'training_time')),
+        # Голова очереди каждого чата в outbound_jobs
+        ('idx_outbound_jobs_pending', 'outbound_jobs',
+         ('status', 'chat_id', 'id')),
+        # Отзыв семейства refresh-токенов
+        ('idx_refresh_tokens_family', 'refresh_tokens', ('family_id', 'revoked')),
+        # Удаление истёкших refresh-токенов
+        ('idx_refresh_tokens_expires', 'refresh_tokens', ('expires_at',)),
+    )
+
+    # Горячие запросы для отчёта EXPLAIN QUERY PLAN: (название, SQL, пример параметров)
+    HOT_QUERIES = (
+        ('get_training_registrations', '''
+            SELECT tr.*, u.first_name, u.last_name, u.username, u.photo_url
+            FROM training_registrations tr
+            LEFT JOIN users u ON tr.user_telegram_id = u.telegram_id
+            WHERE tr.training_date = ? AND tr.training_time = ? AND tr.chat_id = ?
+            ORDER BY tr.registered_at ASC, tr.rowid ASC
+        ''', ('2025-01-05', '18:00', '-100')),
+        ('get_registrations_for_period', '''
+            SELECT tr.*, u.first_name, u.last_name, u.username, u.photo_url
+            FROM training_registrations tr
+            LEFT JOIN users u ON tr.user_telegram_id = u.telegram_id
+            WHERE tr.training_date >= ? AND tr.training_date < ?
+            ORDER BY tr.registered_at ASC, tr.rowid ASC
+        ''', ('2025-01-01', '2025-02-01')),
+        ('training_slot_counts', '''
+            SELECT registered_count, waitlist_count FROM training_slots
+            WHERE training_date = ? AND training_time = ? AND chat_id = ?
+        ''', ('2025-01-05', '18:00', '-100')),
+        ('schedule_capacity', '''
+            SELECT capacity FROM poll_schedules
+            WHERE chat_id = ? AND training_time = ? AND training_day = ? AND typeof(capacity) = 'integer' AND capacity > 0
+            LIMIT 1
+        ''', ('-100', '18:00', 'sunday')),
+        ('waitlist_promotion', '''
+            SELECT id FROM training_registrations
+            WHERE training_date = ? AND training_time = ? AND chat_id = ? AND status = 'waitlist'
+            ORDER BY registered_at ASC, rowid ASC
+            LIMIT 1
+        ''', ('2025-01-05', '18:00', '-100')),
+        ('get_user_trainings', '''
+            SELECT tr.*,
+                   ot.name as training_name,
+                   ps.name as schedule_name
+            FROM training_registrations tr
+            LEFT JOIN one_time_trainings ot
+                ON tr.training_date = ot.training_date
+                AND tr.training_time = ot.training_time
+                AND tr.chat_id = ot.chat_id
+            LEFT JOIN poll_schedules ps
+                ON tr.chat_id = ps.chat_id
+                AND tr.training_time = ps.training_time
+            WHERE tr.user_telegram_id = ?
+            ORDER BY tr.training_date ASC, tr.training_time ASC
+        ''', (123456789,)),
+        ('get_all_trainings', '''
+            SELECT tr.*, u.first_name, u.last_name, u.username,
+                   ot.name as training_name,
+                   ps.name as schedule_name
+            FROM training_registrations tr
+            LEFT JOIN users u ON tr.user_telegram_id = u.telegram_id
+            LEFT JOIN one_time_trainings ot
+                ON tr.training_date = ot.training_date
+                AND tr.training_time = ot.training_time
+                AND tr.chat_id = ot.chat_id
+            LEFT JOIN poll_schedules ps
+                ON tr.chat_id = ps.chat_id
+                AND tr.training_time = ps.training_time
+            WHERE tr.training_date BETWEEN ? AND ?
+            ORDER BY tr.training_date ASC, tr.training_time ASC, tr.registered_at ASC
+        ''', ('2025-01-01', '2025-01-31')),
+        ('get_one_time_trainings_between', '''
+            SELECT * FROM one_time_trainings
+            WHERE training_date >= ? AND training_date < ?
+            ORDER BY training_date ASC
+        ''', ('2025-01-01', '2025-02-01')),
+    )
+
+    def _table_exists(self, table: str) -> bool:
+        """Проверка существования таблицы"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+
+    def _columns_exist(self, table: str, columns) -> bool:
+        """Проверка, что в таблице есть все колонки"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row['name'] for row in cursor.fetchall()}
+        return set(columns) <= existing
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        Создание индексов из INDEXES для существующих таблиц
+
+        Returns:
+            Список имён индексов, которые есть в базе после вызова
+        """
+        if not self.conn:
+            return []
+
+        cursor = self.conn.cursor()
+        ensured = []
+        for name, table, columns in self.INDEXES:
+            if not self._table_exists(table):
+                logger.debug(f"Индекс {name} пропущен: таблица {table} не существует")
+                continue
+            if not self._columns_exist(table, columns):
+                logger.warning(f"Индекс {name} пропущен: в таблице {table} нет колонок, нужна миграция")
+                continue
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+            ensured.append(name)
+
+        self.conn.commit()
+        logger.info(f"Индексы базы данных созданы/проверены: {len(ensured)}")
+        return ensured
+
+    def explain_hot_queries(self) -> Dict[str, List[str]]:
+        """
+        Отчёт EXPLAIN QUERY PLAN для горячих запросов
+
+        Returns:
+            Словарь {название запроса: строки плана}. Запросы к
+            несуществующим таблицам пропускаются.
+        """
+        if not self.conn:
+            return {}
+
+        cursor = self.conn.cursor()
+        report = {}
+        for name, sql, params in self.HOT_QUERIES:
+            try:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            except sqlite3.OperationalError as e:
+                logger.debug(f"План запроса {name} недоступен: {e}")
+                continue
+            report[name] = [row['detail'] for row in cursor.fetchall()]
+        return report
+
     def add_user(
         self,
         telegram_id: int,
@@ -425,6 +993,12 @@ class Database:
             logger.error("Нельзя добавить пользователя: база данных не подключена")
             return None
 
+        # users.is_admin повторяет настройку admin_user_ids
+        admin_ids = self.get_admin_ids()
+        if is_admin and telegram_id not in admin_ids:
+            self.add_admin_id(telegram_id)
+        is_admin = is_admin or telegram_id in admin_ids
+
         cursor = self.conn.cursor()
         try:
             cursor.execute('''
@@ -508,18 +1082,15 @@ class Database:
         return self.get_user_by_telegram_id(telegram_id)
 
     def set_user_admin(self, telegram_id: int, is_admin: bool) -> Dict[str, Any]:
-        """Установка/снятие статуса администратора пользователя"""
+        """Установка/снятие статуса администратора пользователя (и в admin_user_ids)"""
         if not self.conn:
             return {"success": False, "error": "DB not connected"}
 
-        cursor = self.conn.cursor()
-
         try:
-            cursor.execute(
-                'UPDATE users SET is_admin = ?, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = ?',
-                (1 if is_admin else 0, telegram_id)
-            )
-            self.conn.commit()
+            if is_admin:
+                self.add_admin_id(telegram_id)
+            else:
+                self.remove_admin_id(telegram_id)
 
             return {"success": True, "message": f"Статус администратора {'установлен' if is_admin else 'снят'}"}
         except Exception as e:
@@ -566,136 +1137,221 @@ class Database:
             FROM training_registrations tr
             LEFT JOIN users u ON tr.user_telegram_id = u.telegram_id
             WHERE tr.training_date = ? AND tr.training_time = ? AND tr.chat_id = ?
-            ORDER BY tr.registered_at ASC
+            ORDER BY tr.registered_at ASC, tr.rowid ASC
         ''', (training_date, training_time, chat_id))
         
         return [dict(row) for row in cursor.fetchall()]
 
-    def register_for_training(self, training_id: str, training_date: str, training_time: str,
-                              chat_id: str, topic_id: Optional[int], user_telegram_id: int) -> Dict[str, Any]:
-        """Запись на тренировку с проверкой лимита (12 человек)"""
+    def get_registrations_for_period(self, start_date: str, end_date: str) -> Dict[tuple, List[Dict[str, Any]]]:
+        """
+        Получение всех записей на тренировки за период [start_date, end_date) одним запросом
+
+        Returns:
+            Словарь {(training_date, training_time, chat_id): [записи по registered_at]}
+        """
         if not self.conn:
-            return {"success": False, "error": "DB not connected"}
+            return {}
 
         cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT tr.*, u.first_name, u.last_name, u.username, u.photo_url
+            FROM training_registrations tr
+            LEFT JOIN users u ON tr.user_telegram_id = u.telegram_id
+            WHERE tr.training_date >= ? AND tr.training_date < ?
+            ORDER BY tr.registered_at ASC, tr.rowid ASC
+        ''', (start_date, end_date))
 
-        # Считаем сколько уже записано со статусом 'registered'
+        # Группируем за один проход, порядок registered_at внутри слота сохраняется
+        registrations: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in cursor.fetchall():
+            registration = dict(row)
+            key = (registration['training_date'], registration['training_time'], registration['chat_id'])
+            registrations.setdefault(key, []).append(registration)
+
+        return registrations
+
+    def _get_training_capacity(self, cursor: sqlite3.Cursor, training_date: str,
+                               training_time: str, chat_id: str) -> int:
+        """
+        Вместимость тренировки: разовая тренировка, затем расписание
+        на этот день недели, затем шаблон опроса (некорректные значения
+        пропускаются)
+        """
         cursor.execute('''
-            SELECT COUNT(*) as count FROM training_registrations
-            WHERE training_date = ? AND training_time = ? AND chat_id = ? AND status = 'registered'
+            SELECT capacity FROM one_time_trainings
+            WHERE training_date = ? AND training_time = ? AND chat_id = ? AND typeof(capacity) = 'integer' AND capacity > 0
+            LIMIT 1
         ''', (training_date, training_time, chat_id))
+        row = cursor.fetchone()
+        if row:
+            return row['capacity']
 
-        result = cursor.fetchone()
-        registered_count = result['count'] if result else 0
+        training_day = WEEKDAYS[datetime.strptime(training_date, '%Y-%m-%d').weekday()]
+        cursor.execute('''
+            SELECT capacity FROM poll_schedules
+            WHERE chat_id = ? AND training_time = ? AND training_day = ? AND typeof(capacity) = 'integer' AND capacity > 0
+            LIMIT 1
+        ''', (chat_id, training_time, training_day))
+        row = cursor.fetchone()
+        if row:
+            return row['capacity']
 
-        # Определяем статус
-        if registered_count < 12:
-            status = 'registered'
-        else:
-            status = 'waitlist'
+        capacity = self.get_default_template().get('capacity')
+        return capacity if isinstance(capacity, int) and capacity > 0 else TRAINING_CAPACITY
 
-        try:
-            # Проверяем, есть ли уже запись этого пользователя
-            cursor.execute('''
-                SELECT id, status FROM training_registrations
-                WHERE training_date = ? AND training_time = ? AND chat_id = ? AND user_telegram_id = ?
-            ''', (training_date, training_time, chat_id, user_telegram_id))
-
-            existing = cursor.fetchone()
+    def _update_slot_counts(self, cursor: sqlite3.Cursor, training_date: str, training_time: str,
+                            chat_id: str, registered_delta: int = 0, waitlist_delta: int = 0):
+        """Изменение счётчиков training_slots (вызывается внутри транзакции записи)"""
+        cursor.execute('''
+            INSERT INTO training_slots (training_date, training_time, chat_id, registered_count, waitlist_count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (training_date, training_time, chat_id) DO UPDATE SET
+                registered_count = registered_count + excluded.registered_count,
+                waitlist_count = waitlist_count + excluded.waitlist_count
+        ''', (training_date, training_time, chat_id, registered_delta, waitlist_delta))
+
+    def get_training_slot(self, training_date: str, training_time: str, chat_id: str) -> Dict[str, Any]:
+        """Вместимость и счётчики записей тренировки"""
+        slot = {"capacity": TRAINING_CAPACITY, "registered_count": 0, "waitlist_count": 0}
+        if not self.conn:
+            return slot
 
-            if existing:
-                # Обновляем существующую запись
-                cursor.execute('''
-                    UPDATE training_registrations
-                    SET status = ?, topic_id = ?, registered_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (status, topic_id, existing['id']))
-            else:
-                # Создаём новую запись
-                cursor.execute('''
-                    INSERT INTO training_registrations
-                    (id, training_date, training_time, chat_id, topic_id, user_telegram_id, status, registered_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (training_id, training_date, training_time, chat_id, topic_id, user_telegram_id, status))
+        cursor = self.conn.cursor()
+        slot["capacity"] = self._get_training_capacity(cursor, training_date, training_time, chat_id)
+        cursor.execute('''
+            SELECT registered_count, waitlist_count FROM training_slots
+            WHERE training_date = ? AND training_time = ? AND chat_id = ?
+        ''', (training_date, training_time, chat_id))
+        row = cursor.fetchone()
+        if row:
+            slot.update(dict(row))
+        return slot
 
-            self.conn.commit()
+    def register_for_training(self, training_id: str, training_date: str, training_time: str,
+                              chat_id: str, topic_id: Optional[int], user_telegram_id: int) -> Dict[str, Any]:
+        """
+        Запись на тренировку с проверкой вместимости
+
+        Проверка мест по счётчику training_slots и запись выполняются в одной
+        транзакции, поэтому при одновременных записях в 'registered' не
+        попадёт больше вместимости тренировки.
+        Повторная запись не меняет статус и место в очереди.
+        """
+        if not self.conn:
+            return {"success": False, "error": "DB not connected"}
 
+        try:
+            with self._transaction() as cursor:
+                status = self._register(cursor, training_id, training_date, training_time,
+                                        chat_id, topic_id, user_telegram_id)
             return {"success": True, "status": status}
         except Exception as e:
             logger.error(f"Ошибка записи на тренировку: {e}")
             return {"success": False, "error": str(e)}
 
-    def unregister_from_training(self, training_date: str, training_time: str, 
-                                 chat_id: str, user_telegram_id: int) -> Dict[str, Any]:
-        """Отписка от тренировки с автоматическим зачислением из waitlist"""
+    def _register(self, cursor: sqlite3.Cursor, training_id: str, training_date: str, training_time: str,
+                  chat_id: str, topic_id: Optional[int], user_telegram_id: int) -> str:
+        """Запись на тренировку внутри транзакции, возвращает статус записи"""
+        # Проверяем, есть ли уже запись этого пользователя
+        cursor.execute('''
+            SELECT id, status FROM training_registrations
+            WHERE training_date = ? AND training_time = ? AND chat_id = ? AND user_telegram_id = ?
+        ''', (training_date, training_time, chat_id, user_telegram_id))
+
+        existing = cursor.fetchone()
+
+        if existing:
+            cursor.execute('''
+                UPDATE training_registrations SET topic_id = ? WHERE id = ?
+            ''', (topic_id, existing['id']))
+            return existing['status']
+
+        capacity = self._get_training_capacity(cursor, training_date, training_time, chat_id)
+        cursor.execute('''
+            SELECT registered_count FROM training_slots
+            WHERE training_date = ? AND training_time = ? AND chat_id = ?
+        ''', (training_date, training_time, chat_id))
+
+        slot = cursor.fetchone()
+        registered_count = slot['registered_count'] if slot else 0
+        status = 'registered' if registered_count < capacity else 'waitlist'
+
+        cursor.execute('''
+            INSERT INTO training_registrations
+            (id, training_date, training_time, chat_id, topic_id, user_telegram_id, status, registered_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (training_id, training_date, training_time, chat_id, topic_id, user_telegram_id, status))
+
+        if status == 'registered':
+            self._update_slot_counts(cursor, training_date, training_time, chat_id, registered_delta=1)
+        else:
+            self._update_slot_counts(cursor, training_date, training_time, chat_id, waitlist_delta=1)
+        return status
+
+    def remove_and_promote(self, training_date: str, training_time: str,
+                           chat_id: str, user_telegram_id: int) -> Dict[str, Any]:
+        """
+        Удаление записи и зачисление первого из waitlist в одной транзакции
+
+        Из waitlist зачисляется только если после удаления есть свободное место.
+
+        Returns:
+            {"success": True, "removed_status": статус удалённой записи или None,
+             "promoted_user_telegram_id": кого зачислили или None}
+        """
         if not self.conn:
             return {"success": False, "error": "DB not connected"}
 
-        cursor = self.conn.cursor()
-        
         try:
-            # Удаляем запись
-            cursor.execute('''
-                DELETE FROM training_registrations
-                WHERE training_date = ? AND training_time = ? AND chat_id = ? AND user_telegram_id = ?
-            ''', (training_date, training_time, chat_id, user_telegram_id))
-            
-            self.conn.commit()
-            
-            # Находим первого в waitlist и переводим в registered
-            cursor.execute('''
-                SELECT id FROM training_registrations
-                WHERE training_date = ? AND training_time = ? AND chat_id = ? AND status = 'waitlist'
-                ORDER BY registered_at ASC
-                LIMIT 1
-            ''', (training_date, training_time, chat_id))
-            
-            waitlist_user = cursor.fetchone()
-            if waitlist_user:
-                cursor.execute('''
-                    UPDATE training_registrations
-                    SET status = 'registered'
-                    WHERE id = ?
-                ''', (waitlist_user['id'],))
-                self.conn.commit()
-            
-            return {"success": True}
+            with self._transaction() as cursor:
+                removed_status, promoted_user_telegram_id = self._remove_and_promote(
+                    cursor, training_date, training_time, chat_id, user_telegram_id
+                )
+            return {
+                "success": True,
+                "removed_status": removed_status,
+                "promoted_user_telegram_id": promoted_user_telegram_id,
+            }
         except Exception as e:
-            logger.error(f"Ошибка отписки от тренировки: {e}")
+            logger.error(f"Ошибка удаления записи на тренировку: {e}")
             return {"success": False, "error": str(e)}
 
-    def admin_remove_user_from_training(self, training_date: str, training_time: str,
-                                        chat_id: str, user_telegram_id: int) -> Dict[str, Any]:
-        """Удаление участника из тренировки администратором с автоматическим зачислением из waitlist"""
-        if not self.conn:
-            return {"success": False, "error": "DB not connected"}
-
-        cursor = self.conn.cursor()
+    def _remove_and_promote(self, cursor: sqlite3.Cursor, training_date: str, training_time: str,
+                            chat_id: str, user_telegram_id: int) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Удаление записи и зачисление из waitlist внутри транзакции
 
-        try:
-            # Проверяем существование записи
-            cursor.execute('''
-                SELECT id, status FROM training_registrations
-                WHERE training_date = ? AND training_time = ? AND chat_id = ? AND user_telegram_id = ?
-            ''', (training_date, training_time, chat_id, user_telegram_id))
+        Returns:
+            (статус удалённой записи или None, кого зачислили или None)
+        """
+        cursor.execute('''
+            SELECT id, status FROM training_registrations
+            WHERE training_date = ? AND training_time = ? AND chat_id = ? AND user_telegram_id = ?
+        ''', (training_date, training_time, chat_id, user_telegram_id))
 
-            existing = cursor.fetchone()
-            if not existing:
-                return {"success": False, "error": "Запись не найдена"}
+        existing = cursor.fetchone()
+        if not existing:
+            return None, None
 
-            # Удаляем запись
-            cursor.execute('''
-                DELETE FROM training_registrations
-                WHERE training_date = ? AND training_time = ? AND chat_id = ? AND user_telegram_id = ?
-            ''', (training_date, training_time, chat_id, user_telegram_id))
+        cursor.execute('DELETE FROM training_registrations WHERE id = ?', (existing['id'],))
+        if existing['status'] == 'registered':
+            self._update_slot_counts(cursor, training_date, training_time, chat_id, registered_delta=-1)
+        else:
+            self._update_slot_counts(cursor, training_date, training_time, chat_id, waitlist_delta=-1)
 
-            self.conn.commit()
+        cursor.execute('''
+            SELECT registered_count FROM training_slots
+            WHERE training_date = ? AND training_time = ? AND chat_id = ?
+        ''', (training_date, training_time, chat_id))
+        registered_count = cursor.fetchone()['registered_count']
 
+        promoted_user_telegram_id = None
+        if registered_count < self._get_training_capacity(cursor, training_date, training_time, chat_id):
             # Находим первого в waitlist и переводим в registered
             cursor.execute('''
-                SELECT id FROM training_registrations
+                SELECT id, user_telegram_id FROM training_registrations
                 WHERE training_date = ? AND training_time = ? AND chat_id = ? AND status = 'waitlist'
-                ORDER BY registered_at ASC
+                ORDER BY registered_at ASC, rowid ASC
                 LIMIT 1
             ''', (training_date, training_time, chat_id))
 
@@ -706,13 +1362,115 @@ class Database:
                     SET status = 'registered'
                     WHERE id = ?
                 ''', (waitlist_user['id'],))
-                self.conn.commit()
+                self._update_slot_counts(cursor, training_date, training_time, chat_id,
+                                         registered_delta=1, waitlist_delta=-1)
+                promoted_user_telegram_id = waitlist_user['user_telegram_id']
+
+        return existing['status'], promoted_user_telegram_id
+
+    def apply_poll_answers(self, answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Применение голосов в опросах к записям на тренировки одной транзакцией
+
+        Опрос находится в active_polls по poll_id, слот тренировки — по его
+        training_date, training_time и chat_id. Вместимость и waitlist
+        учитываются так же, как при записи через веб-интерфейс. Каждый голос
+        применяется в своей точке сохранения: ошибка откатывает только его.
+        Проголосовавший с first_name добавляется в users (новый — неактивным,
+        доступ к веб-интерфейсу по-прежнему выдаёт администратор) или
+        обновляет там имя.
+
+        Args:
+            answers: [{"poll_id", "user_telegram_id", "register": True — записать,
+                       False — отписать, "first_name", "last_name", "username" — необязательно}]
+                     в порядке поступления
+
+        Returns:
+            {"success": True, "results": [{"poll_id", "user_telegram_id", "action":
+             'register' | 'unregister' | None (опрос не привязан к тренировке),
+             "status", "promoted_user_telegram_id", "error"}]}
+        """
+        if not self.conn:
+            return {"success": False, "error": "DB not connected"}
 
-            return {"success": True, "removed_status": existing['status']}
+        results = []
+        polls: Dict[str, Optional[sqlite3.Row]] = {}
+        admin_ids = set(self.get_admin_ids())
+        try:
+            with self._transaction() as cursor:
+                for answer in answers:
+                    poll_id = answer['poll_id']
+                    user_telegram_id = answer['user_telegram_id']
+                    result = {"poll_id": poll_id, "user_telegram_id": user_telegram_id, "action": None,
+                              "status": None, "promoted_user_telegram_id": None, "error": None}
+                    results.append(result)
+
+                    cursor.execute('SAVEPOINT poll_answer')
+                    try:
+                        self._apply_poll_answer(cursor, answer, result, polls, admin_ids)
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO poll_answer')
+                        result.update(action=None, status=None, promoted_user_telegram_id=None, error=str(e))
+                        logger.error(f"Голос {user_telegram_id} в опросе {poll_id} не применён: {e}")
+                    cursor.execute('RELEASE poll_answer')
+            return {"success": True, "results": results}
         except Exception as e:
-            logger.error(f"Ошибка удаления участника из тренировки: {e}")
+            logger.error(f"Ошибка применения голосов в опросах: {e}")
             return {"success": False, "error": str(e)}
 
+    def _apply_poll_answer(self, cursor: sqlite3.Cursor, answer: Dict[str, Any], result: Dict[str, Any],
+                           polls: Dict[str, Optional[sqlite3.Row]], admin_ids: set):
+        """Применение одного голоса внутри транзакции apply_poll_answers"""
+        poll_id = answer['poll_id']
+        user_telegram_id = answer['user_telegram_id']
+        if answer.get('first_name'):
+            cursor.execute('''
+                INSERT INTO users (telegram_id, first_name, last_name, username, is_admin, is_active)
+                VALUES (?, ?, ?, ?, ?, 0)
+                ON CONFLICT (telegram_id) DO UPDATE SET
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name,
+                    username = excluded.username,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (user_telegram_id, answer['first_name'], answer.get('last_name'), answer.get('username'),
+                  1 if user_telegram_id in admin_ids else 0))
+
+        if poll_id not in polls:
+            cursor.execute('''
+                SELECT chat_id, message_thread_id, training_date, training_time
+                FROM active_polls WHERE id = ?
+            ''', (poll_id,))
+            polls[poll_id] = cursor.fetchone()
+        poll = polls[poll_id]
+        if poll is None or not poll['training_date'] or not poll['training_time']:
+            return
+
+        slot = (poll['training_date'], poll['training_time'], poll['chat_id'])
+        if answer['register']:
+            # ID записи тот же, что при записи через веб-интерфейс
+            training_id = f"{slot[0]}_{slot[1]}_{slot[2]}_{user_telegram_id}"
+            result['action'] = 'register'
+            result['status'] = self._register(cursor, training_id, *slot,
+                                              poll['message_thread_id'], user_telegram_id)
+        else:
+            result['action'] = 'unregister'
+            result['status'], result['promoted_user_telegram_id'] = self._remove_and_promote(
+                cursor, *slot, user_telegram_id
+            )
+
+    def unregister_from_training(self, training_date: str, training_time: str,
+                                 chat_id: str, user_telegram_id: int) -> Dict[str, Any]:
+        """Отписка от тренировки с автоматическим зачислением из waitlist"""
+        return self.remove_and_promote(training_date, training_time, chat_id, user_telegram_id)
+
+    def admin_remove_user_from_training(self, training_date: str, training_time: str,
+                                        chat_id: str, user_telegram_id: int) -> Dict[str, Any]:
+        """Удаление участника из тренировки администратором с автоматическим зачислением из waitlist"""
+        result = self.remove_and_promote(training_date, training_time, chat_id, user_telegram_id)
+        if result.get('success') and result['removed_status'] is None:
+            return {"success": False, "error": "Запись не найдена"}
+        return result
+
     def get_user_trainings(self, user_telegram_id: int) -> List[Dict[str, Any]]:
         """Получение всех записей пользователя"""
         if not self.conn:
@@ -738,8 +1496,9 @@ class Database:
         return [dict(row) for row in cursor.fetchall()]
 
     def add_one_time_training(self, training_id: str, training_date: str, training_time: str,
-                              chat_id: str, topic_id: Optional[int], name: str) -> Dict[str, Any]:
-        """Добавление разовой тренировки"""
+                              chat_id: str, topic_id: Optional[int], name: str,
+                              capacity: Optional[int] = None) -> Dict[str, Any]:
+        """Добавление разовой тренировки (capacity=None — вместимость из шаблона)"""
         if not self.conn:
             return {"success": False, "error": "DB not connected"}
 
@@ -747,9 +1506,10 @@ class Database:
         
         try:
             cursor.execute('''
-                INSERT INTO one_time_trainings (id, training_date, training_time, chat_id, topic_id, name, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (training_id, training_date, training_time, chat_id, topic_id, name))
+                INSERT INTO one_time_trainings (id, training_date, training_time, chat_id, topic_id, name,
+                                                capacity, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (training_id, training_date, training_time, chat_id, topic_id, name, capacity))
             
             self.conn.commit()
             return {"success": True}
@@ -762,8 +1522,6 @@ class Database:
         if not self.conn:
             return {"success": False, "error": "DB not connected"}
 
-        cursor = self.conn.cursor()
-
         try:
             # Разбираем training_id: date_time_chat_id
             parts = training_id.split('_')
@@ -771,16 +1529,20 @@ class Database:
             training_time = parts[1] if len(parts) > 1 else ''
             chat_id = parts[2] if len(parts) > 2 else ''
 
-            # Сначала удаляем все записи на эту тренировку
-            cursor.execute('''
-                DELETE FROM training_registrations
-                WHERE training_date = ? AND training_time = ? AND chat_id = ?
-            ''', (training_date, training_time, chat_id))
+            with self._transaction() as cursor:
+                # Сначала удаляем все записи на эту тренировку и её счётчики
+                cursor.execute('''
+                    DELETE FROM training_registrations
+                    WHERE training_date = ? AND training_time = ? AND chat_id = ?
+                ''', (training_date, training_time, chat_id))
+                cursor.execute('''
+                    DELETE FROM training_slots
+                    WHERE training_date = ? AND training_time = ? AND chat_id = ?
+                ''', (training_date, training_time, chat_id))
 
-            # Удаляем саму тренировку
-            cursor.execute('DELETE FROM one_time_trainings WHERE id = ?', (training_id,))
+                # Удаляем саму тренировку
+                cursor.execute('DELETE FROM one_time_trainings WHERE id = ?', (training_id,))
 
-            self.conn.commit()
             return {"success": True}
         except Exception as e:
             logger.error(f"Ошибка удаления разовой тренировки: {e}")
@@ -788,16 +1550,25 @@ class Database:
 
     def get_one_time_trainings(self, year: int, month: int) -> List[Dict[str, Any]]:
         """Получение всех разовых тренировок за месяц"""
+        return self.get_one_time_trainings_between(*month_bounds(year, month))
+
+    def get_one_time_trainings_between(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """
+        Получение разовых тренировок за период [start_date, end_date)
+
+        Даты в формате YYYY-MM-DD. Диапазон по training_date использует
+        индекс idx_one_time_trainings_slot.
+        """
         if not self.conn:
             return []
 
         cursor = self.conn.cursor()
         cursor.execute('''
             SELECT * FROM one_time_trainings
-            WHERE strftime('%Y', training_date) = ? AND strftime('%m', training_date) = ?
+            WHERE training_date >= ? AND training_date < ?
             ORDER BY training_date ASC
-        ''', (str(year), str(month).zfill(2)))
-        
+        ''', (start_date, end_date))
+
         return [dict(row) for row in cursor.fetchall()]
 
     def get_all_trainings(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
@@ -820,7 +1591,7 @@ class Database:
                 ON tr.chat_id = ps.chat_id
                 AND tr.training_time = ps.training_time
             WHERE tr.training_date BETWEEN ? AND ?
-            ORDER BY tr.training_date ASC, tr.training_time ASC, tr.registered_at ASC
+            ORDER BY tr.training_date ASC, tr.training_time ASC, tr.registered_at ASC, tr.rowid ASC
         ''', (start_date, end_date))
 
         return [dict(row) for row in cursor.fetchall()]
@@ -880,8 +1651,8 @@ class Database:
         try:
             cursor.execute('''
                 INSERT INTO users (telegram_id, first_name, last_name, username, is_admin, is_active, created_at)
-                VALUES (?, ?, ?, ?, 0, 1, CURRENT_TIMESTAMP)
-            ''', (telegram_id, f'User{telegram_id}', '', ''))
+                VALUES (?, ?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
+            ''', (telegram_id, f'User{telegram_id}', '', '', 1 if telegram_id in self.get_admin_ids() else 0))
             
             self.conn.commit()
             
@@ -1030,20 +1801,19 @@ class Database:
             return False
 
     def update_user_admin_status(self, telegram_id: int, is_admin: bool) -> bool:
-        """Обновление статуса администратора пользователя"""
+        """Обновление статуса администратора пользователя (и в admin_user_ids)"""
         if not self.conn:
             return False
 
-        cursor = self.conn.cursor()
-
         try:
-            cursor.execute('''
-                UPDATE users SET is_admin = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE telegram_id = ?
-            ''', (1 if is_admin else 0, telegram_id))
-            self.conn.commit()
+            if is_admin:
+                self.add_admin_id(telegram_id)
+            else:
+                self.remove_admin_id(telegram_id)
 
-            return cursor.rowcount > 0
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT 1 FROM users WHERE telegram_id = ?', (telegram_id,))
+            return cursor.fetchone() is not None
         except Exception as e:
             logger.error(f"Ошибка обновления статуса администратора: {e}")
             return False
@@ -1066,3 +1836,246 @@ class Database:
         except Exception as e:
             logger.error(f"Ошибка переключения статуса: {e}")
             return {"success": False, "error": str(e)}
+
+    # ==================== Методы для очереди исходящих запросов ====================
+
+    @staticmethod
+    def _outbound_job_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def add_outbound_job(self, chat_id: str, method: str, payload: Dict[str, Any],
+                         depends_on: Optional[int] = None,
+                         next_attempt_at: Optional[float] = None) -> Optional[int]:
+        """
+        Добавление запроса к Bot API в очередь
+
+        Args:
+            depends_on: ID задачи, результат которой нужен этой (например, sendPoll для pinChatMessage)
+            next_attempt_at: Время первой попытки (unix time), по умолчанию сразу
+
+        Returns:
+            ID задачи или None, если база данных не подключена
+        """
+        if not self.conn:
+            logger.error("Нельзя добавить задачу в очередь: база данных не подключена")
+            return None
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT INTO outbound_jobs (chat_id, method, payload, depends_on, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (str(chat_id), method, json.dumps(payload, ensure_ascii=False), depends_on,
+                  next_attempt_at if next_attempt_at is not None else datetime.now().timestamp()))
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def get_outbound_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Получение задачи очереди по ID"""
+        if not self.conn:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM outbound_jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        return self._outbound_job_from_row(row) if row else None
+
+    def get_due_outbound_jobs(self, now: float, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Задачи, готовые к выполнению
+
+        Возвращается только первая незавершённая задача каждого чата,
+        поэтому запросы в один чат выполняются строго по порядку.
+        """
+        if not self.conn:
+            return []
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT * FROM outbound_jobs j
+            WHERE j.status = 'pending' AND j.next_attempt_at <= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM outbound_jobs e
+                  WHERE e.status = 'pending' AND e.chat_id = j.chat_id AND e.id < j.id
+              )
+            ORDER BY j.id
+            LIMIT ?
+        ''', (now, limit))
+        return [self._outbound_job_from_row(row) for row in cursor.fetchall()]
+
+    def get_next_outbound_attempt(self) -> Optional[float]:
+        """Время ближайшей попытки среди незавершённых задач"""
+        if not self.conn:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT MIN(next_attempt_at) FROM outbound_jobs WHERE status = 'pending'")
+        return cursor.fetchone()[0]
+
+    def complete_outbound_job(self, job_id: int, result: Any):
+        """Отметка задачи выполненной с результатом ответа Bot API"""
+        if not self.conn:
+            return
+        with self._write_lock:
+            self.conn.execute('''
+                UPDATE outbound_jobs
+                SET status = 'done', attempts = attempts + 1, result = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (json.dumps(result, ensure_ascii=False), job_id))
+            self.conn.commit()
+
+    def retry_outbound_job(self, job_id: int, next_attempt_at: float, error: str):
+        """Перенос задачи на следующую попытку"""
+        if not self.conn:
+            return
+        with self._write_lock:
+            self.conn.execute('''
+                UPDATE outbound_jobs
+                SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (next_attempt_at, error, job_id))
+            self.conn.commit()
+
+    def fail_outbound_job(self, job_id: int, error: str) -> List[int]:
+        """
+        Отметка задачи неудачной вместе с зависящими от неё задачами
+
+        Returns:
+            ID всех задач, отмеченных неудачными
+        """
+        if not self.conn:
+            return []
+        failed = []
+        with self._transaction() as cursor:
+            cursor.execute('''
+                UPDATE outbound_jobs
+                SET status = 'failed', attempts = attempts + 1, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'pending'
+            ''', (error, job_id))
+            pending = [job_id] if cursor.rowcount else []
+            failed.extend(pending)
+            while pending:
+                cursor.execute('''
+                    SELECT id FROM outbound_jobs WHERE depends_on = ? AND status = 'pending'
+                ''', (pending.pop(),))
+                dependents = [row['id'] for row in cursor.fetchall()]
+                cursor.executemany('''
+                    UPDATE outbound_jobs
+                    SET status = 'failed', last_error = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', [(f"Зависимость {job_id} не выполнена: {error}", dependent) for dependent in dependents])
+                failed.extend(dependents)
+                pending.extend(dependents)
+        return failed
+
+    def purge_outbound_jobs(self, older_than_days: int = 7) -> int:
+        """Удаление завершённых задач старше older_than_days дней"""
+        if not self.conn:
+            return 0
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                DELETE FROM outbound_jobs
+                WHERE status IN ('done', 'failed') AND updated_at < datetime('now', ?)
+            ''', (f'-{older_than_days} days',))
+            self.conn.commit()
+            return cursor.rowcount
+
+    # ==================== Методы для работы с refresh-токенами ====================
+
+    def add_refresh_token(self, jti: str, family_id: str, telegram_id: int, expires_at: float) -> bool:
+        """Сохранение выданного refresh-токена (первого в семействе или после ротации)"""
+        if not self.conn:
+            return False
+        try:
+            with self._transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO refresh_tokens (jti, family_id, telegram_id, expires_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (jti, family_id, telegram_id, expires_at))
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения refresh-токена: {e}")
+            return False
+
+    def rotate_refresh_token(self, jti: str, new_jti: str, expires_at: float,
+                             now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Обмен refresh-токена на новый того же семейства
+
+        Токен можно использовать один раз. Повторное предъявление в
+        течение REFRESH_REUSE_GRACE секунд — параллельное обновление: если
+        преемник ещё не использован, выдаётся он же (jti в ответе), иначе
+        ошибка "conflict" без отзыва. Более поздний повтор означает, что
+        токен утёк: всё семейство отзывается.
+
+        Returns:
+            {"success": True, "jti", "family_id", "telegram_id"} — jti токена, который нужно выдать,
+            или {"success": False, "error": "unknown" | "expired" | "revoked" | "reused" | "conflict", "family_id"}
+        """
+        if not self.conn:
+            return {"success": False, "error": "DB not connected"}
+        now = time.time() if now is None else now
+
+        try:
+            with self._transaction() as cursor:
+                cursor.execute('SELECT * FROM refresh_tokens WHERE jti = ?', (jti,))
+                row = cursor.fetchone()
+                if row is None:
+                    return {"success": False, "error": "unknown", "family_id": None}
+
+                family_id = row['family_id']
+                if row['revoked']:
+                    return {"success": False, "error": "revoked", "family_id": family_id}
+                if row['used_at'] is not None and now - row['used_at'] <= REFRESH_REUSE_GRACE:
+                    cursor.execute('SELECT used_at, revoked FROM refresh_tokens WHERE jti = ?',
+                                   (row['replaced_by'],))
+                    successor = cursor.fetchone()
+                    if successor is not None and successor['used_at'] is None and not successor['revoked']:
+                        return {"success": True, "jti": row['replaced_by'], "family_id": family_id,
+                                "telegram_id": row['telegram_id']}
+                    return {"success": False, "error": "conflict", "family_id": family_id}
+                if row['used_at'] is not None:
+                    cursor.execute('UPDATE refresh_tokens SET revoked = 1 WHERE family_id = ?', (family_id,))
+                    logger.warning(f"Повторное использование refresh-токена {jti}, "
+                                   f"семейство {family_id} отозвано")
+                    return {"success": False, "error": "reused", "family_id": family_id}
+                if row['expires_at'] <= now:
+                    return {"success": False, "error": "expired", "family_id": family_id}
+
+                cursor.execute('UPDATE refresh_tokens SET used_at = ?, replaced_by = ? WHERE jti = ?',
+                               (now, new_jti, jti))
+                cursor.execute('''
+                    INSERT INTO refresh_tokens (jti, family_id, telegram_id, expires_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (new_jti, family_id, row['telegram_id'], expires_at))
+            return {"success": True, "jti": new_jti, "family_id": family_id, "telegram_id": row['telegram_id']}
+        except Exception as e:
+            logger.error(f"Ошибка ротации refresh-токена: {e}")
+            return {"success": False, "error": str(e), "family_id": None}
+
+    def revoke_refresh_family(self, family_id: str) -> int:
+        """Отзыв всех токенов семейства (выход, утечка токена)"""
+        if not self.conn:
+            return 0
+        with self._transaction() as cursor:
+            cursor.execute('UPDATE refresh_tokens SET revoked = 1 WHERE family_id = ? AND revoked = 0',
+                           (family_id,))
+            return cursor.rowcount
+
+    def is_refresh_family_revoked(self, family_id: str) -> bool:
+        """Отозвано ли семейство (неизвестное семейство считается отозванным)"""
+        if not self.conn:
+            return True
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT MIN(revoked) FROM refresh_tokens WHERE family_id = ?', (family_id,))
+        revoked = cursor.fetchone()[0]
+        return revoked is None or bool(revoked)
+
+    def purge_expired_refresh_tokens(self, now: Optional[float] = None) -> int:
+        """Удаление истёкших refresh-токенов"""
+        if not self.conn:
+            return 0
+        now = time.time() if now is None else now
+        with self._transaction() as cursor:
+            cursor.execute('DELETE FROM refresh_tokens WHERE expires_at <= ?', (now,))
+            return cursor.rowcount
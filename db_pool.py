@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Пул соединений SQLite для веб-API VolleyBot
+"""
+
+import asyncio
+import functools
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class DatabasePool:
+    """
+    Пул соединений: соединение для чтения на каждый поток пула
+    и одно соединение для записи, через которое записи идут по очереди.
+
+    Запросы выполняются в потоках пула, поэтому медленный запрос
+    не блокирует event loop.
+    """
+
+    def __init__(self, db_path: str, max_readers: int = 4, profile: Optional[str] = None):
+        self.db_path = db_path
+        self.profile = profile
+        self.max_readers = max_readers
+
+        self._local = threading.local()
+        self._readers: List[Database] = []
+        self._readers_lock = threading.Lock()
+
+        self.writer = Database(db_path, profile)
+        self._write_lock = threading.Lock()
+
+        self._read_executor = ThreadPoolExecutor(max_workers=max_readers, thread_name_prefix='volleybot-db-read')
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='volleybot-db-write')
+
+    def reader(self) -> Database:
+        """
+        Соединение для чтения текущего потока (создаётся при первом обращении)
+
+        Raises:
+            sqlite3.OperationalError: если базу данных не удалось открыть
+        """
+        database = getattr(self._local, 'database', None)
+        if database is not None and database.conn is not None:
+            return database
+
+        new_database = Database(self.db_path, self.profile)
+        if new_database.conn is None:
+            raise sqlite3.OperationalError(f"Не удалось открыть базу данных {self.db_path} для чтения")
+        with self._readers_lock:
+            if database in self._readers:
+                self._readers.remove(database)
+            self._readers.append(new_database)
+        self._local.database = new_database
+        return new_database
+
+    def _call_read(self, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        return func(self.reader(), *args, **kwargs)
+
+    def _call_write(self, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        with self._write_lock:
+            return func(self.writer, *args, **kwargs)
+
+    async def run_read(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнение читающего метода Database в потоке пула
+
+        Args:
+            func: Метод Database, например Database.get_poll_schedules
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._read_executor, functools.partial(self._call_read, func, args, kwargs)
+        )
+
+    async def run_write(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнение пишущего метода Database через единственное соединение для записи
+
+        Args:
+            func: Метод Database, например Database.add_poll_schedule
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._write_executor, functools.partial(self._call_write, func, args, kwargs)
+        )
+
+    def close(self):
+        """Остановка потоков и закрытие всех соединений"""
+        self._read_executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
+        with self._readers_lock:
+            for database in self._readers:
+                database.close()
+            self._readers.clear()
+        self.writer.close()
+        logger.info("Пул соединений закрыт")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Отчёт EXPLAIN QUERY PLAN для горячих запросов VolleyBot
+
+Показывает, какие запросы используют индексы, а какие сканируют таблицу целиком
+"""
+
+import sys
+from pathlib import Path
+
+from database import Database
+
+DB_PATH = Path(__file__).parent / "volleybot.db"
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(DB_PATH)
+    db = Database(db_path)
+    if not db.conn:
+        print(f"❌ База данных не найдена: {db_path}")
+        sys.exit(1)
+
+    indexes = db.ensure_indexes()
+    print(f"✓ Индексы: {', '.join(indexes) if indexes else 'нет'}")
+    print()
+
+    full_scans = 0
+    for name, plan in db.explain_hot_queries().items():
+        print(f"{name}:")
+        for detail in plan:
+            # SCAN — полный проход по таблице или по всему индексу, SEARCH — поиск по ключу
+            is_full_scan = detail.startswith('SCAN')
+            if is_full_scan:
+                full_scans += 1
+            print(f"  {'⚠️ ' if is_full_scan else '✓ '} {detail}")
+        print()
+
+    db.close()
+
+    if full_scans:
+        print(f"⚠️  Полных сканирований таблиц: {full_scans}")
+    else:
+        print("✅ Все горячие запросы используют индексы")
+
+
+if __name__ == "__main__":
+    main()
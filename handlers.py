@@ -6,13 +6,23 @@
 import logging
 import uuid
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import List
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram.ext import (
+    Application,
+    CallbackQueryHandler,
+    CommandHandler,
+    ContextTypes,
+    MessageHandler,
+    PollAnswerHandler,
+)
 
+from callback_router import CallbackRouter
 from database import Database
+from state_store import MemoryStateStore, StateStore
 from utils import get_weekday_russian, get_day_of_week_number
+from poll_scheduler import parse_poll_time
 from keyboards import (
     get_main_menu,
     get_back_keyboard,
@@ -31,8 +41,47 @@ from keyboards import (
 
 logger = logging.getLogger(__name__)
 
-# Глобальное состояние для создания опросов/расписаний
-creation_states: Dict[int, Dict[str, Any]] = {}
+# Состояние диалогов создания опросов/расписаний, в боте заменяется на SQLiteStateStore
+creation_states: StateStore = MemoryStateStore()
+
+
+def use_state_store(store: StateStore):
+    """Замена хранилища состояний диалогов"""
+    global creation_states
+    creation_states = store
+
+# Обработчики inline-кнопок, регистрируются декораторами ниже
+router = CallbackRouter()
+
+# Типы обновлений, которые нужны каждому виду обработчиков
+HANDLER_UPDATE_TYPES = (
+    (CommandHandler, (Update.MESSAGE,)),
+    (MessageHandler, (Update.MESSAGE,)),
+    (CallbackQueryHandler, (Update.CALLBACK_QUERY,)),
+    (PollAnswerHandler, (Update.POLL_ANSWER,)),
+)
+
+
+def get_allowed_updates(application: Application) -> List[str]:
+    """
+    Минимальный allowed_updates для зарегистрированных обработчиков
+
+    Telegram не присылает остальные обновления (правки сообщений, изменения
+    участников чата, реакции), которые боту всё равно нечем обработать.
+    Для обработчика неизвестного вида возвращается Update.ALL_TYPES.
+    """
+    allowed = set()
+    for group in application.handlers.values():
+        for handler in group:
+            update_types = next(
+                (types for handler_type, types in HANDLER_UPDATE_TYPES if isinstance(handler, handler_type)),
+                None
+            )
+            if update_types is None:
+                logger.warning(f"Неизвестный вид обработчика {type(handler).__name__}, получаем все обновления")
+                return list(Update.ALL_TYPES)
+            allowed.update(update_types)
+    return sorted(allowed)
 
 
 async def create_once_poll(update, context, state):
@@ -56,7 +105,7 @@ async def create_once_poll(update, context, state):
         formatted_date_with_weekday = f"{formatted_date} ({weekday})"
 
         # Получаем описание из шаблона и подставляем дату и время
-        template = context.bot_data['volley_bot'].get_default_template()
+        template = await context.bot_data['volley_bot'].get_default_template()
         description = template['description'].replace('{date}', formatted_date_with_weekday).replace('{time}', state['training_time'])
 
         poll_message = await context.bot_data['volley_bot'].create_poll(
@@ -65,11 +114,13 @@ async def create_once_poll(update, context, state):
             description,
             template['options'],
             is_anonymous=False,
-            message_thread_id=state.get('thread_id')
+            message_thread_id=state.get('thread_id'),
+            pin=True,
+            training_date=next_training_date.strftime('%Y-%m-%d'),
+            training_time=state['training_time']
         )
 
         if poll_message:
-            await context.bot_data['volley_bot'].pin_message(context.bot, state['chat_id'], poll_message.message_id)
 
             thread_info = f" (топик {state.get('thread_id')})" if state.get('thread_id') else ''
             await update.message.reply_text(
@@ -96,7 +147,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     volley_bot = context.bot_data['volley_bot']
     
     user_id = update.effective_user.id
-    if user_id not in volley_bot.admin_user_ids:
+    if user_id not in volley_bot.admins:
         await update.message.reply_text('❌ У вас нет прав для управления этим ботом.')
         return
 
@@ -121,12 +172,24 @@ async def get_user_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(user_info)
 
 
+async def poll_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Голос в опросе тренировки: запись или отписка (применяется пачкой)"""
+    answer = update.poll_answer
+    # Голос от имени канала (voter_chat) не привязан к пользователю
+    if answer.user is None:
+        return
+    await context.bot_data['volley_bot'].poll_answers.submit(
+        answer.poll_id, answer.user.id, answer.option_ids,
+        answer.user.first_name, answer.user.last_name, answer.user.username
+    )
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка текстовых сообщений для создания шаблонов"""
     volley_bot = context.bot_data['volley_bot']
     user_id = update.effective_user.id
 
-    if user_id not in volley_bot.admin_user_ids:
+    if user_id not in volley_bot.admins:
         return
 
     if user_id not in creation_states:
@@ -136,25 +199,25 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message_text = update.message.text.strip()
 
     if state['step'] == 'changing_name':
-        template = volley_bot.get_default_template()
+        template = await volley_bot.get_default_template()
         template['name'] = message_text
-        volley_bot.update_default_template(template)
+        await volley_bot.update_default_template(template)
 
         await update.message.reply_text(f"Название шаблона изменено на: {message_text}")
         del creation_states[user_id]
 
     elif state['step'] == 'changing_description':
-        template = volley_bot.get_default_template()
+        template = await volley_bot.get_default_template()
         template['description'] = message_text
-        volley_bot.update_default_template(template)
+        await volley_bot.update_default_template(template)
 
         await update.message.reply_text(f"Описание шаблона изменено на: {message_text}")
         del creation_states[user_id]
 
     elif state['step'] == 'changing_training_time':
-        template = volley_bot.get_default_template()
+        template = await volley_bot.get_default_template()
         template['training_time'] = message_text
-        volley_bot.update_default_template(template)
+        await volley_bot.update_default_template(template)
 
         await update.message.reply_text(f"Время тренировки изменено на: {message_text}")
         del creation_states[user_id]
@@ -165,9 +228,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Пожалуйста, введите хотя бы 2 варианта ответа, каждый на новой строке.")
             return
 
-        template = volley_bot.get_default_template()
+        template = await volley_bot.get_default_template()
         template['options'] = options
-        volley_bot.update_default_template(template)
+        await volley_bot.update_default_template(template)
 
         await update.message.reply_text(f"Варианты ответа изменены. Теперь их {len(options)}.")
         del creation_states[user_id]
@@ -175,11 +238,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif state['step'] == 'waiting_admin_id':
         try:
             new_admin_id = int(message_text)
-            volley_bot.db.add_admin_id(new_admin_id)
-            volley_bot.admin_user_ids = volley_bot.db.get_admin_ids()
+            await volley_bot.adb.add_admin_id(new_admin_id)
             await update.message.reply_text(
                 f"✅ Пользователь с ID {new_admin_id} успешно добавлен в администраторы!\n\n"
-                f"Всего администраторов: {len(volley_bot.admin_user_ids)}"
+                f"Всего администраторов: {len(volley_bot.admins)}"
             )
             logger.info(f"Администратор {new_admin_id} добавлен пользователем {user_id}")
         except ValueError:
@@ -216,7 +278,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 'enabled': True
             }
 
-            volley_bot.add_poll_schedule(schedule)
+            await volley_bot.add_poll_schedule(schedule)
 
             thread_info = f" (топик {state['thread_id']})" if state['thread_id'] else ""
             await update.message.reply_text(
@@ -237,12 +299,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         schedule_id = state['schedule_id']
         new_time = message_text
 
-        schedules = volley_bot.get_poll_schedules()
-        for schedule in schedules:
-            if schedule['id'] == schedule_id:
-                schedule['training_time'] = new_time
-                volley_bot.save_config()
-                break
+        await volley_bot.update_poll_schedule(schedule_id, {'training_time': new_time})
 
         await update.message.reply_text(
             f"✅ Время тренировки изменено на {new_time}",
@@ -255,12 +312,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         schedule_id = state['schedule_id']
         new_time = message_text
 
-        schedules = volley_bot.get_poll_schedules()
-        for schedule in schedules:
-            if schedule['id'] == schedule_id:
-                schedule['poll_time'] = new_time
-                volley_bot.save_config()
-                break
+        if parse_poll_time(new_time) is None:
+            await update.message.reply_text("❌ Неверный формат времени. Введите время в формате ЧЧ:ММ (например, 12:00):")
+            return
+
+        await volley_bot.update_poll_schedule(schedule_id, {'poll_time': new_time.strip()})
 
         await update.message.reply_text(
             f"✅ Время отправки опроса изменено на {new_time} (MSK)",
@@ -277,6 +333,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         state['options'] = options
         state['step'] = 'confirm_creation'
+        creation_states[user_id] = state
 
         summary = (
             f"Новый шаблон опроса:\n\n"
@@ -294,608 +351,732 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(summary, reply_markup=get_template_confirmation_keyboard())
 
 
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка нажатий на inline-кнопки"""
-    query = update.callback_query
-    await query.answer()
-
+@router.callback('create_poll_menu')
+async def _on_create_poll_menu(query, context, user_id):
+    """Меню создания опроса со значениями по умолчанию"""
     volley_bot = context.bot_data['volley_bot']
-    user_id = update.effective_user.id
-    
-    if user_id not in volley_bot.admin_user_ids:
-        await query.answer(text='❌ У вас нет прав для управления этим ботом.', show_alert=True)
+    template = await volley_bot.get_default_template()
+    default_chat_id = template.get('default_chat_id', '')
+
+    if not default_chat_id:
+        await query.edit_message_text(
+            text="❌ Не задан чат по умолчанию в шаблоне.\n\n"
+                 "Настройте шаблон опроса в разделе '✏️ Редактировать шаблон'",
+            reply_markup=get_back_keyboard()
+        )
         return
 
-    if query.data == 'create_poll_menu':
-        template = volley_bot.get_default_template()
-        default_chat_id = template.get('default_chat_id', '')
+    info_text = f"📍 Чат: {default_chat_id}\n"
+    default_topic_id = template.get('default_topic_id', None)
+    if default_topic_id:
+        info_text += f"📍 Топик: {default_topic_id}\n"
 
-        if not default_chat_id:
-            await query.edit_message_text(
-                text="❌ Не задан чат по умолчанию в шаблоне.\n\n"
-                     "Настройте шаблон опроса в разделе '✏️ Редактировать шаблон'",
-                reply_markup=get_back_keyboard()
-            )
-            return
+    await query.edit_message_text(
+        text=f"Значения по умолчанию:\n{info_text}\n\nНажмите кнопку ниже для создания опроса:",
+        reply_markup=get_create_with_defaults_keyboard()
+    )
 
-        info_text = f"📍 Чат: {default_chat_id}\n"
-        default_topic_id = template.get('default_topic_id', None)
-        if default_topic_id:
-            info_text += f"📍 Топик: {default_topic_id}\n"
 
+@router.callback('create_with_defaults')
+async def _on_create_with_defaults(query, context, user_id):
+    """Начало создания опроса в чате по умолчанию"""
+    volley_bot = context.bot_data['volley_bot']
+    template = await volley_bot.get_default_template()
+    default_chat_id = template.get('default_chat_id', '')
+
+    if not default_chat_id:
         await query.edit_message_text(
-            text=f"Значения по умолчанию:\n{info_text}\n\nНажмите кнопку ниже для создания опроса:",
-            reply_markup=get_create_with_defaults_keyboard()
+            text="❌ Не задан чат по умолчанию в шаблоне.",
+            reply_markup=get_back_keyboard('create_poll_menu')
         )
+        return
 
-    elif query.data == 'create_with_defaults':
-        template = volley_bot.get_default_template()
-        default_chat_id = template.get('default_chat_id', '')
+    default_topic_id = template.get('default_topic_id', None)
+    creation_states[user_id] = {
+        'step': 'waiting_training_day',
+        'chat_id': default_chat_id,
+        'thread_id': default_topic_id
+    }
 
-        if not default_chat_id:
-            await query.edit_message_text(
-                text="❌ Не задан чат по умолчанию в шаблоне.",
-                reply_markup=get_back_keyboard('create_poll_menu')
-            )
-            return
+    await query.edit_message_text(
+        text="Выберите день недели, в который будет тренировка:",
+        reply_markup=get_training_day_selection_keyboard()
+    )
 
-        default_topic_id = template.get('default_topic_id', None)
-        creation_states[user_id] = {
-            'step': 'waiting_training_day',
-            'chat_id': default_chat_id,
-            'thread_id': default_topic_id
-        }
 
+@router.prefix('create_poll:')
+async def _on_create_poll(query, context, user_id):
+    """Создание опроса: create_poll:<chat_id> или create_poll:<template_id>:<chat_id>"""
+    volley_bot = context.bot_data['volley_bot']
+    parts = query.data.split(':')
+    if len(parts) >= 3:
+        await _create_poll_from_template_id(query, context, parts[1], parts[2])
+        return
+    if len(parts) >= 2:
+        target_chat_id = parts[1]
+    else:
         await query.edit_message_text(
-            text="Выберите день недели, в который будет тренировка:",
-            reply_markup=get_training_day_selection_keyboard()
+            text="❌ Неверный формат данных.",
+            reply_markup=get_back_keyboard('create_poll_menu')
         )
+        return
 
-    elif query.data.startswith('create_poll:'):
-        parts = query.data.split(':')
-        if len(parts) >= 2:
-            target_chat_id = parts[1]
-        else:
-            await query.edit_message_text(
-                text="❌ Неверный формат данных.",
-                reply_markup=get_back_keyboard('create_poll_menu')
-            )
-            return
+    poll_message = await volley_bot.create_poll_from_template(context.bot, target_chat_id)
 
-        poll_message = await volley_bot.create_poll_from_template(context.bot, target_chat_id)
+    if poll_message:
+        await query.edit_message_text(text=f"✅ Опрос успешно создан и закреплен в чате {target_chat_id}!")
+    else:
+        await query.edit_message_text(text=f"❌ Ошибка при создании опроса в чате {target_chat_id}.")
 
-        if poll_message:
-            await query.edit_message_text(text=f"✅ Опрос успешно создан и закреплен в чате {target_chat_id}!")
-        else:
-            await query.edit_message_text(text=f"❌ Ошибка при создании опроса в чате {target_chat_id}.")
+    await query.edit_message_reply_markup(reply_markup=get_back_keyboard('create_poll_menu'))
 
-        await query.edit_message_reply_markup(reply_markup=get_back_keyboard('create_poll_menu'))
 
-    elif query.data == 'polls_list_menu':
-        schedules = volley_bot.get_poll_schedules()
+async def _create_poll_from_template_id(query, context, template_id, target_chat_id):
+    """Создание опроса по шаблону template_id в чате target_chat_id"""
+    volley_bot = context.bot_data['volley_bot']
+    template = await volley_bot.get_poll_template_by_id(template_id)
+    if not template:
+        await query.edit_message_text(
+            text="❌ Шаблон не найден!",
+            reply_markup=get_back_keyboard('create_poll_menu')
+        )
+        return
 
-        if not schedules:
-            await query.edit_message_text(
-                text="❌ Нет активных расписаний опросов.\n\n"
-                     "Нажмите '📊 Создать опрос', чтобы добавить новое расписание.",
-                reply_markup=get_back_keyboard()
-            )
-            return
+    temp_template = template.copy()
+    temp_template['chat_id'] = target_chat_id
+
+    training_day = temp_template['training_day']
+    training_time = temp_template['training_time']
 
+    days_map = {
+        'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+        'friday': 4, 'saturday': 5, 'sunday': 6
+    }
+
+    target_day = days_map.get(training_day.lower())
+    if target_day is None:
         await query.edit_message_text(
-            text="📋 Список расписаний опросов:\n\n"
-                 "Выберите опрос для редактирования настроек:",
-            reply_markup=get_polls_list_keyboard(schedules)
+            text=f"❌ Неверный день недели: {training_day}",
+            reply_markup=get_back_keyboard('create_poll_menu')
         )
+        return
 
-    elif query.data.startswith('edit_schedule:'):
-        schedule_id = query.data.split(':')[1]
-        schedules = volley_bot.get_poll_schedules()
-        schedule = None
-        for s in schedules:
-            if s['id'] == schedule_id:
-                schedule = s
-                break
+    now = datetime.now()
+    days_ahead = target_day - now.weekday()
+    if days_ahead <= 0:
+        days_ahead += 7
+
+    next_training_date = now + timedelta(days=days_ahead)
+    formatted_date = next_training_date.strftime('%d.%m.%Y')
+    weekday = get_weekday_russian(next_training_date)
+    formatted_date_with_weekday = f"{formatted_date} ({weekday})"
+
+    description = temp_template['description'].replace('{date}', formatted_date_with_weekday).replace('{time}', training_time)
+
+    poll_message = await volley_bot.create_poll(
+        context.bot,
+        temp_template['chat_id'],
+        description,
+        temp_template['options'],
+        is_anonymous=False,
+        pin=True,
+        template_id=template_id,
+        training_date=next_training_date.strftime('%Y-%m-%d'),
+        training_time=training_time
+    )
 
-        if not schedule:
-            await query.edit_message_text(
-                text="❌ Расписание не найдено!",
-                reply_markup=get_back_keyboard('polls_list_menu')
-            )
-            return
+    if poll_message:
+        await query.edit_message_text(text=f"✅ Опрос '{temp_template['name']}' успешно создан и закреплен в чате {target_chat_id}!")
+    else:
+        await query.edit_message_text(text=f"❌ Ошибка при создании опроса '{temp_template['name']}' в чате {target_chat_id}.")
 
-        status = "✅ Включено" if schedule.get('enabled', True) else "❌ Отключено"
-        template = volley_bot.get_default_template()
-        options_text = '\n'.join([f"  • {opt}" for opt in template.get('options', [])]) if template else "Не заданы"
-        poll_time = schedule.get('poll_time', '12:00')
+    await query.edit_message_reply_markup(reply_markup=get_back_keyboard('create_poll_menu'))
 
-        info = (
-            f"📋 **{schedule['name']}**\n\n"
-            f"Статус: {status}\n"
-            f"День тренировки: {schedule['training_day']}\n"
-            f"Время тренировки: {schedule['training_time']}\n"
-            f"День отправки опроса: {schedule['poll_day']}\n"
-            f"Время отправки опроса: {poll_time} (MSK)\n"
-            f"Чат: {schedule['chat_id']}\n"
-            f"Топик: {schedule.get('message_thread_id', 'Нет')}\n\n"
-            f"Варианты ответа:\n{options_text}"
-        )
 
-        await query.edit_message_text(text=info, reply_markup=get_edit_schedule_keyboard(schedule_id))
+@router.callback('polls_list_menu')
+async def _on_polls_list_menu(query, context, user_id):
+    """Список расписаний опросов"""
+    volley_bot = context.bot_data['volley_bot']
+    schedules = await volley_bot.get_poll_schedules()
 
-    elif query.data.startswith('schedule_edit_training_day:'):
-        schedule_id = query.data.split(':')[1]
+    if not schedules:
         await query.edit_message_text(
-            text="Выберите новый день тренировки:",
-            reply_markup=get_schedule_edit_training_day_keyboard(schedule_id)
+            text="❌ Нет активных расписаний опросов.\n\n"
+                 "Нажмите '📊 Создать опрос', чтобы добавить новое расписание.",
+            reply_markup=get_back_keyboard()
         )
+        return
 
-    elif query.data.startswith('schedule_set_training_day:'):
-        parts = query.data.split(':')
-        schedule_id = parts[1]
-        new_day = parts[2]
+    await query.edit_message_text(
+        text="📋 Список расписаний опросов:\n\n"
+             "Выберите опрос для редактирования настроек:",
+        reply_markup=get_polls_list_keyboard(schedules)
+    )
 
-        schedules = volley_bot.get_poll_schedules()
-        for schedule in schedules:
-            if schedule['id'] == schedule_id:
-                schedule['training_day'] = new_day
-                schedule['name'] = f"Расписание {new_day}->{schedule['poll_day']}"
-                volley_bot.save_config()
-                break
 
+@router.prefix('edit_schedule:')
+async def _on_edit_schedule(query, context, user_id):
+    """Карточка расписания"""
+    volley_bot = context.bot_data['volley_bot']
+    schedule_id = query.data.split(':')[1]
+    schedules = await volley_bot.get_poll_schedules()
+    schedule = None
+    for s in schedules:
+        if s['id'] == schedule_id:
+            schedule = s
+            break
+
+    if not schedule:
         await query.edit_message_text(
-            text=f"✅ День тренировки изменен на {new_day}",
-            reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
+            text="❌ Расписание не найдено!",
+            reply_markup=get_back_keyboard('polls_list_menu')
         )
+        return
 
-    elif query.data.startswith('schedule_edit_training_time:'):
-        schedule_id = query.data.split(':')[1]
-        creation_states[user_id] = {
-            'step': 'schedule_changing_time',
-            'schedule_id': schedule_id
-        }
+    status = "✅ Включено" if schedule.get('enabled', True) else "❌ Отключено"
+    template = await volley_bot.get_default_template()
+    options_text = '\n'.join([f"  • {opt}" for opt in template.get('options', [])]) if template else "Не заданы"
+    poll_time = schedule.get('poll_time', '12:00')
+
+    info = (
+        f"📋 **{schedule['name']}**\n\n"
+        f"Статус: {status}\n"
+        f"День тренировки: {schedule['training_day']}\n"
+        f"Время тренировки: {schedule['training_time']}\n"
+        f"День отправки опроса: {schedule['poll_day']}\n"
+        f"Время отправки опроса: {poll_time} (MSK)\n"
+        f"Чат: {schedule['chat_id']}\n"
+        f"Топик: {schedule.get('message_thread_id', 'Нет')}\n\n"
+        f"Варианты ответа:\n{options_text}"
+    )
 
-        await query.edit_message_text(
-            text="Введите новое время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
-            reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
-        )
+    await query.edit_message_text(text=info, reply_markup=get_edit_schedule_keyboard(schedule_id))
 
-    elif query.data.startswith('schedule_edit_poll_day:'):
-        schedule_id = query.data.split(':')[1]
-        await query.edit_message_text(
-            text="Выберите новый день отправки опроса:",
-            reply_markup=get_schedule_edit_poll_day_keyboard(schedule_id)
-        )
 
-    elif query.data.startswith('schedule_set_poll_day:'):
-        parts = query.data.split(':')
-        schedule_id = parts[1]
-        new_day = parts[2]
+@router.prefix('schedule_edit_training_day:')
+async def _on_schedule_edit_training_day(query, context, user_id):
+    """Выбор нового дня тренировки расписания"""
+    schedule_id = query.data.split(':')[1]
+    await query.edit_message_text(
+        text="Выберите новый день тренировки:",
+        reply_markup=get_schedule_edit_training_day_keyboard(schedule_id)
+    )
 
-        schedules = volley_bot.get_poll_schedules()
-        for schedule in schedules:
-            if schedule['id'] == schedule_id:
-                schedule['poll_day'] = new_day
-                schedule['name'] = f"Расписание {schedule['training_day']}->{new_day}"
-                volley_bot.save_config()
-                break
 
-        await query.edit_message_text(
-            text=f"✅ День отправки опроса изменен на {new_day}",
-            reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
-        )
+@router.prefix('schedule_set_training_day:')
+async def _on_schedule_set_training_day(query, context, user_id):
+    """Сохранение дня тренировки расписания"""
+    volley_bot = context.bot_data['volley_bot']
+    parts = query.data.split(':')
+    schedule_id = parts[1]
+    new_day = parts[2]
+
+    schedule = await volley_bot.adb.get_poll_schedule(schedule_id)
+    if schedule:
+        await volley_bot.update_poll_schedule(schedule_id, {
+            'training_day': new_day,
+            'name': f"Расписание {new_day}->{schedule['poll_day']}"
+        })
+
+    await query.edit_message_text(
+        text=f"✅ День тренировки изменен на {new_day}",
+        reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
+    )
 
-    elif query.data.startswith('schedule_edit_poll_time:'):
-        schedule_id = query.data.split(':')[1]
-        creation_states[user_id] = {
-            'step': 'schedule_changing_poll_time',
-            'schedule_id': schedule_id
-        }
 
+@router.prefix('schedule_edit_training_time:')
+async def _on_schedule_edit_training_time(query, context, user_id):
+    """Запрос нового времени тренировки расписания"""
+    schedule_id = query.data.split(':')[1]
+    creation_states[user_id] = {
+        'step': 'schedule_changing_time',
+        'schedule_id': schedule_id
+    }
+
+    await query.edit_message_text(
+        text="Введите новое время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
+        reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
+    )
+
+
+@router.prefix('schedule_edit_poll_day:')
+async def _on_schedule_edit_poll_day(query, context, user_id):
+    """Выбор нового дня отправки опроса"""
+    schedule_id = query.data.split(':')[1]
+    await query.edit_message_text(
+        text="Выберите новый день отправки опроса:",
+        reply_markup=get_schedule_edit_poll_day_keyboard(schedule_id)
+    )
+
+
+@router.prefix('schedule_set_poll_day:')
+async def _on_schedule_set_poll_day(query, context, user_id):
+    """Сохранение дня отправки опроса"""
+    volley_bot = context.bot_data['volley_bot']
+    parts = query.data.split(':')
+    schedule_id = parts[1]
+    new_day = parts[2]
+
+    schedule = await volley_bot.adb.get_poll_schedule(schedule_id)
+    if schedule:
+        await volley_bot.update_poll_schedule(schedule_id, {
+            'poll_day': new_day,
+            'name': f"Расписание {schedule['training_day']}->{new_day}"
+        })
+
+    await query.edit_message_text(
+        text=f"✅ День отправки опроса изменен на {new_day}",
+        reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
+    )
+
+
+@router.prefix('schedule_edit_poll_time:')
+async def _on_schedule_edit_poll_time(query, context, user_id):
+    """Запрос нового времени отправки опроса"""
+    schedule_id = query.data.split(':')[1]
+    creation_states[user_id] = {
+        'step': 'schedule_changing_poll_time',
+        'schedule_id': schedule_id
+    }
+
+    await query.edit_message_text(
+        text="Введите новое время отправки опроса в формате ЧЧ:ММ (например, 12:00):",
+        reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
+    )
+
+
+@router.prefix('schedule_toggle_enabled:')
+async def _on_schedule_toggle_enabled(query, context, user_id):
+    """Включение и выключение расписания"""
+    volley_bot = context.bot_data['volley_bot']
+    schedule_id = query.data.split(':')[1]
+
+    schedule = await volley_bot.adb.get_poll_schedule(schedule_id)
+    if schedule:
+        enabled = not schedule.get('enabled', True)
+        await volley_bot.update_poll_schedule(schedule_id, {'enabled': 1 if enabled else 0})
+        status = "включено" if enabled else "выключено"
         await query.edit_message_text(
-            text="Введите новое время отправки опроса в формате ЧЧ:ММ (например, 12:00):",
+            text=f"✅ Расписание {status}",
             reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
         )
 
-    elif query.data.startswith('schedule_toggle_enabled:'):
-        schedule_id = query.data.split(':')[1]
-
-        schedules = volley_bot.get_poll_schedules()
-        for schedule in schedules:
-            if schedule['id'] == schedule_id:
-                schedule['enabled'] = not schedule.get('enabled', True)
-                volley_bot.save_config()
-                status = "включено" if schedule['enabled'] else "выключено"
-                await query.edit_message_text(
-                    text=f"✅ Расписание {status}",
-                    reply_markup=get_back_keyboard(f"edit_schedule:{schedule_id}")
-                )
-                break
-
-    elif query.data.startswith('schedule_delete:'):
-        schedule_id = query.data.split(':')[1]
-        volley_bot.remove_poll_schedule(schedule_id)
 
-        await query.edit_message_text(
-            text="✅ Расписание успешно удалено!",
-            reply_markup=get_back_keyboard('polls_list_menu')
+@router.prefix('schedule_delete:')
+async def _on_schedule_delete(query, context, user_id):
+    """Удаление расписания"""
+    volley_bot = context.bot_data['volley_bot']
+    schedule_id = query.data.split(':')[1]
+    await volley_bot.remove_poll_schedule(schedule_id)
+
+    await query.edit_message_text(
+        text="✅ Расписание успешно удалено!",
+        reply_markup=get_back_keyboard('polls_list_menu')
+    )
+
+
+@router.callback('edit_poll_menu')
+async def _on_edit_poll_menu(query, context, user_id):
+    """Просмотр шаблона по умолчанию"""
+    volley_bot = context.bot_data['volley_bot']
+    template = await volley_bot.get_default_template()
+
+    if template:
+        info = (
+            f"Текущий шаблон:\n"
+            f"Название: {template['name']}\n"
+            f"Описание: {template['description']}\n"
+            f"День тренировки: {template['training_day']}\n"
+            f"День опроса: {template['poll_day']}\n"
+            f"Время тренировки: {template['training_time']}\n"
+            f"Включено: {'Да' if template['enabled'] else 'Нет'}\n\n"
+            f"Варианты ответа:\n"
         )
+        for i, option in enumerate(template['options'], 1):
+            info += f"{i}. {option}\n"
+    else:
+        info = "Шаблон не найден!"
 
-    elif query.data == 'edit_poll_menu':
-        template = volley_bot.get_default_template()
-
-        if template:
-            info = (
-                f"Текущий шаблон:\n"
-                f"Название: {template['name']}\n"
-                f"Описание: {template['description']}\n"
-                f"День тренировки: {template['training_day']}\n"
-                f"День опроса: {template['poll_day']}\n"
-                f"Время тренировки: {template['training_time']}\n"
-                f"Включено: {'Да' if template['enabled'] else 'Нет'}\n\n"
-                f"Варианты ответа:\n"
-            )
-            for i, option in enumerate(template['options'], 1):
-                info += f"{i}. {option}\n"
-        else:
-            info = "Шаблон не найден!"
+    keyboard = [[InlineKeyboardButton("✏️ Редактировать шаблон", callback_data="edit_default_template")]]
+    keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data='back_to_main')])
+    
+    await query.edit_message_text(
+        text=info,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
 
-        keyboard = [[InlineKeyboardButton("✏️ Редактировать шаблон", callback_data="edit_default_template")]]
-        keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data='back_to_main')])
-        
-        await query.edit_message_text(
-            text=info,
-            reply_markup=InlineKeyboardMarkup(keyboard)
+
+@router.callback('edit_default_template')
+async def _on_edit_default_template(query, context, user_id):
+    """Меню редактирования шаблона по умолчанию"""
+    volley_bot = context.bot_data['volley_bot']
+    template = await volley_bot.get_default_template()
+
+    if template:
+        info = (
+            f"Редактирование шаблона:\n"
+            f"Название: {template['name']}\n"
+            f"Описание: {template['description']}\n"
+            f"День тренировки: {template['training_day']}\n"
+            f"День опроса: {template['poll_day']}\n"
+            f"Время тренировки: {template['training_time']}\n"
+            f"Включено: {'Да' if template['enabled'] else 'Нет'}\n\n"
+            f"Варианты ответа:\n"
         )
+        for i, option in enumerate(template['options'], 1):
+            info += f"{i}. {option}\n"
+    else:
+        info = "Шаблон не найден!"
+
+    await query.edit_message_text(text=info, reply_markup=get_edit_template_keyboard())
+
+
+@router.callback('change_name')
+async def _on_change_name(query, context, user_id):
+    """Запрос нового названия шаблона"""
+    creation_states[user_id] = {'step': 'changing_name'}
+    await query.edit_message_text(
+        text="Введите новое название шаблона:",
+        reply_markup=get_back_keyboard('edit_default_template')
+    )
+
+
+@router.callback('change_description')
+async def _on_change_description(query, context, user_id):
+    """Запрос нового описания шаблона"""
+    creation_states[user_id] = {'step': 'changing_description'}
+    await query.edit_message_text(
+        text="Введите новое описание шаблона (используйте {date} и {time}):",
+        reply_markup=get_back_keyboard('edit_default_template')
+    )
+
+
+@router.callback('change_training_day')
+async def _on_change_training_day(query, context, user_id):
+    """Выбор дня тренировки шаблона"""
+    creation_states[user_id] = {'step': 'changing_training_day'}
+    await query.edit_message_text(
+        text="Выберите день недели, в который будет тренировка:",
+        reply_markup=get_training_day_selection_keyboard()
+    )
+
+
+@router.callback('change_poll_day')
+async def _on_change_poll_day(query, context, user_id):
+    """Выбор дня опроса шаблона"""
+    creation_states[user_id] = {'step': 'changing_poll_day'}
+    await query.edit_message_text(
+        text="Выберите день недели, в который бот должен создавать опрос:",
+        reply_markup=get_poll_day_selection_keyboard()
+    )
+
+
+@router.callback('change_training_time')
+async def _on_change_training_time(query, context, user_id):
+    """Запрос времени тренировки шаблона"""
+    creation_states[user_id] = {'step': 'changing_training_time'}
+    await query.edit_message_text(
+        text="Введите время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
+        reply_markup=get_back_keyboard('edit_default_template')
+    )
 
-    elif query.data == 'edit_default_template':
-        template = volley_bot.get_default_template()
-
-        if template:
-            info = (
-                f"Редактирование шаблона:\n"
-                f"Название: {template['name']}\n"
-                f"Описание: {template['description']}\n"
-                f"День тренировки: {template['training_day']}\n"
-                f"День опроса: {template['poll_day']}\n"
-                f"Время тренировки: {template['training_time']}\n"
-                f"Включено: {'Да' if template['enabled'] else 'Нет'}\n\n"
-                f"Варианты ответа:\n"
+
+@router.callback('change_options')
+async def _on_change_options(query, context, user_id):
+    """Запрос вариантов ответа шаблона"""
+    creation_states[user_id] = {'step': 'changing_options'}
+    await query.edit_message_text(
+        text="Введите варианты ответов, каждый на новой строке:\n\n"
+             "Пример:\n"
+             "Буду\n"
+             "Не буду\n"
+             "Возможно",
+        reply_markup=get_back_keyboard('edit_default_template')
+    )
+
+
+@router.prefix('selected_day:')
+async def _on_selected_day(query, context, user_id):
+    """Выбран день тренировки: шаг создания опроса или правка шаблона"""
+    volley_bot = context.bot_data['volley_bot']
+    selected_day = query.data.split(':')[1]
+
+    if user_id in creation_states:
+        state = creation_states[user_id]
+        if state['step'] == 'waiting_training_day':
+            creation_states[user_id] = {
+                'step': 'waiting_creation_type',
+                'chat_id': state['chat_id'],
+                'thread_id': state['thread_id'],
+                'training_day': selected_day
+            }
+
+            await query.edit_message_text(
+                text=f"День тренировки: {selected_day}\n\n"
+                     "Как создать опрос?",
+                reply_markup=get_creation_type_keyboard()
             )
-            for i, option in enumerate(template['options'], 1):
-                info += f"{i}. {option}\n"
         else:
-            info = "Шаблон не найден!"
-
-        await query.edit_message_text(text=info, reply_markup=get_edit_template_keyboard())
+            await query.answer(text="Ошибка: неверное состояние", show_alert=True)
+    else:
+        template = await volley_bot.get_default_template()
+        template['training_day'] = selected_day
+        await volley_bot.update_default_template(template)
 
-    elif query.data == 'change_name':
-        creation_states[user_id] = {'step': 'changing_name'}
         await query.edit_message_text(
-            text="Введите новое название шаблона:",
+            text=f"День тренировки изменен на {selected_day}",
             reply_markup=get_back_keyboard('edit_default_template')
         )
 
-    elif query.data == 'change_description':
-        creation_states[user_id] = {'step': 'changing_description'}
-        await query.edit_message_text(
-            text="Введите новое описание шаблона (используйте {date} и {time}):",
-            reply_markup=get_back_keyboard('edit_default_template')
-        )
 
-    elif query.data == 'change_training_day':
-        creation_states[user_id] = {'step': 'changing_training_day'}
-        await query.edit_message_text(
-            text="Выберите день недели, в который будет тренировка:",
-            reply_markup=get_training_day_selection_keyboard()
-        )
+@router.prefix('creation_type:')
+async def _on_creation_type(query, context, user_id):
+    """Выбран тип опроса: по расписанию или одноразовый"""
+    creation_type = query.data.split(':')[1]
 
-    elif query.data == 'change_poll_day':
-        creation_states[user_id] = {'step': 'changing_poll_day'}
-        await query.edit_message_text(
-            text="Выберите день недели, в который бот должен создавать опрос:",
-            reply_markup=get_poll_day_selection_keyboard()
-        )
+    if user_id not in creation_states:
+        await query.answer(text="Ошибка: состояние не найдено", show_alert=True)
+        return
 
-    elif query.data == 'change_training_time':
-        creation_states[user_id] = {'step': 'changing_training_time'}
-        await query.edit_message_text(
-            text="Введите время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
-            reply_markup=get_back_keyboard('edit_default_template')
-        )
+    state = creation_states[user_id]
+    if state['step'] != 'waiting_creation_type':
+        await query.answer(text="Ошибка: неверное состояние", show_alert=True)
+        return
+
+    if creation_type == 'schedule':
+        creation_states[user_id] = {**state, 'step': 'waiting_poll_day'}
+
+        keyboard = [
+            [InlineKeyboardButton("Понедельник", callback_data="poll_day_selection:monday")],
+            [InlineKeyboardButton("Вторник", callback_data="poll_day_selection:tuesday")],
+            [InlineKeyboardButton("Среда", callback_data="poll_day_selection:wednesday")],
+            [InlineKeyboardButton("Четверг", callback_data="poll_day_selection:thursday")],
+            [InlineKeyboardButton("Пятница", callback_data="poll_day_selection:friday")],
+            [InlineKeyboardButton("Суббота", callback_data="poll_day_selection:saturday")],
+            [InlineKeyboardButton("Воскресенье", callback_data="poll_day_selection:sunday")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
 
-    elif query.data == 'change_options':
-        creation_states[user_id] = {'step': 'changing_options'}
         await query.edit_message_text(
-            text="Введите варианты ответов, каждый на новой строке:\n\n"
-                 "Пример:\n"
-                 "Буду\n"
-                 "Не буду\n"
-                 "Возможно",
-            reply_markup=get_back_keyboard('edit_default_template')
+            text="Выберите день недели, в который бот должен создать опрос:",
+            reply_markup=reply_markup
         )
 
-    elif query.data.startswith('selected_day:'):
-        selected_day = query.data.split(':')[1]
-
-        if user_id in creation_states:
-            state = creation_states[user_id]
-            if state['step'] == 'waiting_training_day':
-                creation_states[user_id] = {
-                    'step': 'waiting_creation_type',
-                    'chat_id': state['chat_id'],
-                    'thread_id': state['thread_id'],
-                    'training_day': selected_day
-                }
-
-                await query.edit_message_text(
-                    text=f"День тренировки: {selected_day}\n\n"
-                         "Как создать опрос?",
-                    reply_markup=get_creation_type_keyboard()
-                )
-            else:
-                await query.answer(text="Ошибка: неверное состояние", show_alert=True)
-        else:
-            template = volley_bot.get_default_template()
-            template['training_day'] = selected_day
-            volley_bot.update_default_template(template)
+    elif creation_type == 'once':
+        creation_states[user_id] = {**state, 'step': 'waiting_training_time_input', 'creation_type': 'once'}
 
-            await query.edit_message_text(
-                text=f"День тренировки изменен на {selected_day}",
-                reply_markup=get_back_keyboard('edit_default_template')
-            )
+        await query.edit_message_text(
+            text="Введите время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
+            reply_markup=get_back_keyboard('create_poll_menu')
+        )
 
-    elif query.data.startswith('creation_type:'):
-        creation_type = query.data.split(':')[1]
 
-        if user_id not in creation_states:
-            await query.answer(text="Ошибка: состояние не найдено", show_alert=True)
-            return
+@router.prefix('selected_poll_day:')
+async def _on_selected_poll_day(query, context, user_id):
+    """Выбран день опроса шаблона"""
+    volley_bot = context.bot_data['volley_bot']
+    selected_day = query.data.split(':')[1]
 
-        state = creation_states[user_id]
-        if state['step'] != 'waiting_creation_type':
-            await query.answer(text="Ошибка: неверное состояние", show_alert=True)
-            return
+    template = await volley_bot.get_default_template()
+    template['poll_day'] = selected_day
+    await volley_bot.update_default_template(template)
 
-        if creation_type == 'schedule':
-            creation_states[user_id]['step'] = 'waiting_poll_day'
+    await query.edit_message_text(
+        text=f"День опроса изменен на {selected_day}",
+        reply_markup=get_back_keyboard('edit_default_template')
+    )
 
-            keyboard = [
-                [InlineKeyboardButton("Понедельник", callback_data="poll_day_selection:monday")],
-                [InlineKeyboardButton("Вторник", callback_data="poll_day_selection:tuesday")],
-                [InlineKeyboardButton("Среда", callback_data="poll_day_selection:wednesday")],
-                [InlineKeyboardButton("Четверг", callback_data="poll_day_selection:thursday")],
-                [InlineKeyboardButton("Пятница", callback_data="poll_day_selection:friday")],
-                [InlineKeyboardButton("Суббота", callback_data="poll_day_selection:saturday")],
-                [InlineKeyboardButton("Воскресенье", callback_data="poll_day_selection:sunday")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
 
-            await query.edit_message_text(
-                text="Выберите день недели, в который бот должен создать опрос:",
-                reply_markup=reply_markup
-            )
+@router.prefix('poll_day_selection:')
+async def _on_poll_day_selection(query, context, user_id):
+    """Выбран день опроса: шаг создания расписания или правка шаблона"""
+    volley_bot = context.bot_data['volley_bot']
+    selected_day = query.data.split(':')[1]
 
-        elif creation_type == 'once':
-            creation_states[user_id]['step'] = 'waiting_training_time_input'
-            creation_states[user_id]['creation_type'] = 'once'
+    if user_id in creation_states:
+        state = creation_states[user_id]
+        if state['step'] == 'waiting_poll_day':
+            creation_states[user_id] = {
+                'step': 'waiting_training_time_input',
+                'chat_id': state['chat_id'],
+                'thread_id': state['thread_id'],
+                'training_day': state['training_day'],
+                'poll_day': selected_day,
+                'creation_type': 'schedule'
+            }
 
             await query.edit_message_text(
                 text="Введите время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
                 reply_markup=get_back_keyboard('create_poll_menu')
             )
-
-    elif query.data.startswith('selected_poll_day:'):
-        selected_day = query.data.split(':')[1]
-
-        template = volley_bot.get_default_template()
+        else:
+            await query.answer(text="Ошибка: неверное состояние", show_alert=True)
+    else:
+        template = await volley_bot.get_default_template()
         template['poll_day'] = selected_day
-        volley_bot.update_default_template(template)
+        await volley_bot.update_default_template(template)
 
         await query.edit_message_text(
             text=f"День опроса изменен на {selected_day}",
             reply_markup=get_back_keyboard('edit_default_template')
         )
 
-    elif query.data.startswith('poll_day_selection:'):
-        selected_day = query.data.split(':')[1]
-
-        if user_id in creation_states:
-            state = creation_states[user_id]
-            if state['step'] == 'waiting_poll_day':
-                creation_states[user_id] = {
-                    'step': 'waiting_training_time_input',
-                    'chat_id': state['chat_id'],
-                    'thread_id': state['thread_id'],
-                    'training_day': state['training_day'],
-                    'poll_day': selected_day,
-                    'creation_type': 'schedule'
-                }
-
-                await query.edit_message_text(
-                    text="Введите время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
-                    reply_markup=get_back_keyboard('create_poll_menu')
-                )
-            else:
-                await query.answer(text="Ошибка: неверное состояние", show_alert=True)
-        else:
-            template = volley_bot.get_default_template()
-            template['poll_day'] = selected_day
-            volley_bot.update_default_template(template)
 
-            await query.edit_message_text(
-                text=f"День опроса изменен на {selected_day}",
-                reply_markup=get_back_keyboard('edit_default_template')
-            )
+@router.callback('create_schedule_yes')
+async def _on_create_schedule_yes(query, context, user_id):
+    """Подсказка к созданию расписания"""
+    await query.answer(text="Выберите день тренировки и введите время", show_alert=True)
 
-    elif query.data == 'create_schedule_yes':
-        await query.answer(text="Выберите день тренировки и введите время", show_alert=True)
 
-    elif query.data == 'create_schedule_no':
-        await query.answer(text="Выберите день тренировки и введите время", show_alert=True)
+@router.callback('create_schedule_no')
+async def _on_create_schedule_no(query, context, user_id):
+    """Подсказка к созданию расписания"""
+    await query.answer(text="Выберите день тренировки и введите время", show_alert=True)
 
-    elif query.data.startswith('poll_day:'):
-        selected_day = query.data.split(':')[1]
 
-        if user_id in creation_states:
-            state = creation_states[user_id]
-            if state['step'] == 'waiting_poll_day':
-                creation_states[user_id]['poll_day'] = selected_day
-                creation_states[user_id]['step'] = 'waiting_training_time_input'
+@router.prefix('poll_day:')
+async def _on_poll_day(query, context, user_id):
+    """Выбран день опроса (старая клавиатура)"""
+    volley_bot = context.bot_data['volley_bot']
+    selected_day = query.data.split(':')[1]
 
-                await query.edit_message_text(
-                    text="Введите время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
-                    reply_markup=get_back_keyboard('create_poll_menu')
-                )
-            else:
-                await query.answer(text="Ошибка: неверное состояние", show_alert=True)
-        else:
-            template = volley_bot.get_default_template()
-            template['poll_day'] = selected_day
-            volley_bot.update_default_template(template)
+    if user_id in creation_states:
+        state = creation_states[user_id]
+        if state['step'] == 'waiting_poll_day':
+            creation_states[user_id] = {**state, 'poll_day': selected_day, 'step': 'waiting_training_time_input'}
 
             await query.edit_message_text(
-                text=f"День опроса изменен на {selected_day}",
-                reply_markup=get_back_keyboard('edit_default_template')
+                text="Введите время тренировки в формате чч:мм - чч:мм (например, 18:00 - 20:00):",
+                reply_markup=get_back_keyboard('create_poll_menu')
             )
+        else:
+            await query.answer(text="Ошибка: неверное состояние", show_alert=True)
+    else:
+        template = await volley_bot.get_default_template()
+        template['poll_day'] = selected_day
+        await volley_bot.update_default_template(template)
 
-    elif query.data == 'confirm_create_template':
-        if user_id in creation_states:
-            state = creation_states[user_id]
-
-            template_id = str(uuid.uuid4())
+        await query.edit_message_text(
+            text=f"День опроса изменен на {selected_day}",
+            reply_markup=get_back_keyboard('edit_default_template')
+        )
 
-            new_template = {
-                'id': template_id,
-                'name': state['name'],
-                'description': state['description'],
-                'chat_id': state['chat_id'],
-                'training_day': state['training_day'],
-                'poll_day': state['poll_day'],
-                'training_time': state['training_time'],
-                'options': state['options'],
-                'enabled': True
-            }
 
-            volley_bot.add_poll_template(new_template)
+@router.callback('confirm_create_template')
+async def _on_confirm_create_template(query, context, user_id):
+    """Сохранение нового шаблона"""
+    volley_bot = context.bot_data['volley_bot']
+    if user_id in creation_states:
+        state = creation_states[user_id]
 
-            del creation_states[user_id]
+        template_id = str(uuid.uuid4())
+
+        new_template = {
+            'id': template_id,
+            'name': state['name'],
+            'description': state['description'],
+            'chat_id': state['chat_id'],
+            'training_day': state['training_day'],
+            'poll_day': state['poll_day'],
+            'training_time': state['training_time'],
+            'options': state['options'],
+            'enabled': True
+        }
 
-            await query.edit_message_text(
-                text=f"✅ Шаблон '{state['name']}' успешно создан!",
-                reply_markup=get_back_keyboard('edit_poll_menu')
-            )
-        else:
-            await query.answer(text="Ошибка: состояние не найдено", show_alert=True)
+        volley_bot.add_poll_template(new_template)
 
-    elif query.data == 'cancel_create_template':
-        if user_id in creation_states:
-            del creation_states[user_id]
+        del creation_states[user_id]
 
         await query.edit_message_text(
-            text="❌ Создание шаблона отменено.",
+            text=f"✅ Шаблон '{state['name']}' успешно создан!",
             reply_markup=get_back_keyboard('edit_poll_menu')
         )
+    else:
+        await query.answer(text="Ошибка: состояние не найдено", show_alert=True)
 
-    elif query.data == 'create_template_start':
-        creation_states[user_id] = {'step': 'waiting_name'}
 
-        await query.edit_message_text(
-            text="Введите название для нового шаблона опроса:",
-            reply_markup=get_back_keyboard('edit_poll_menu')
-        )
+@router.callback('cancel_create_template')
+async def _on_cancel_create_template(query, context, user_id):
+    """Отмена создания шаблона"""
+    if user_id in creation_states:
+        del creation_states[user_id]
 
-    elif query.data.startswith('create_poll:'):
-        parts = query.data.split(':')
-        template_id = parts[1]
-        target_chat_id = parts[2]
+    await query.edit_message_text(
+        text="❌ Создание шаблона отменено.",
+        reply_markup=get_back_keyboard('edit_poll_menu')
+    )
 
-        template = volley_bot.get_poll_template_by_id(template_id)
-        if not template:
-            await query.edit_message_text(
-                text="❌ Шаблон не найден!",
-                reply_markup=get_back_keyboard('create_poll_menu')
-            )
-            return
 
-        temp_template = template.copy()
-        temp_template['chat_id'] = target_chat_id
+@router.callback('create_template_start')
+async def _on_create_template_start(query, context, user_id):
+    """Начало создания шаблона"""
+    creation_states[user_id] = {'step': 'waiting_name'}
 
-        training_day = temp_template['training_day']
-        training_time = temp_template['training_time']
+    await query.edit_message_text(
+        text="Введите название для нового шаблона опроса:",
+        reply_markup=get_back_keyboard('edit_poll_menu')
+    )
 
-        days_map = {
-            'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-            'friday': 4, 'saturday': 5, 'sunday': 6
-        }
 
-        target_day = days_map.get(training_day.lower())
-        if target_day is None:
-            await query.edit_message_text(
-                text=f"❌ Неверный день недели: {training_day}",
-                reply_markup=get_back_keyboard('create_poll_menu')
-            )
-            return
+@router.callback('settings_menu')
+async def _on_settings_menu(query, context, user_id):
+    """Меню настроек"""
+    await query.edit_message_text(
+        text="Меню настроек:",
+        reply_markup=get_settings_menu_keyboard()
+    )
 
-        now = datetime.now()
-        days_ahead = target_day - now.weekday()
-        if days_ahead <= 0:
-            days_ahead += 7
 
-        next_training_date = now + timedelta(days=days_ahead)
-        formatted_date = next_training_date.strftime('%d.%m.%Y')
-        weekday = get_weekday_russian(next_training_date)
-        formatted_date_with_weekday = f"{formatted_date} ({weekday})"
+@router.callback('refresh_all_polls')
+async def _on_refresh_all_polls(query, context, user_id):
+    """Создание опросов по всем включённым шаблонам"""
+    volley_bot = context.bot_data['volley_bot']
+    await volley_bot.create_polls_for_all_enabled_templates(context.bot)
+    await query.edit_message_text(
+        text="✅ Все включенные опросы обновлены!",
+        reply_markup=get_back_keyboard('settings_menu')
+    )
 
-        description = temp_template['description'].replace('{date}', formatted_date_with_weekday).replace('{time}', training_time)
 
-        poll_message = await volley_bot.create_poll(
-            context.bot,
-            temp_template['chat_id'],
-            description,
-            temp_template['options'],
-            is_anonymous=False
-        )
+@router.callback('add_admin_menu')
+async def _on_add_admin_menu(query, context, user_id):
+    """Инструкция и запрос ID нового администратора"""
+    await query.edit_message_text(
+        text="Для добавления нового администратора:\n\n"
+             "1. Добавьте будущего администратора в этот чат или начните с ним личный чат\n"
+             "2. Попросите его отправить команду /getid в этот чат\n"
+             "3. Скопируйте полученный ID и вернитесь сюда\n\n"
+             "Введите ID пользователя, которого хотите назначить администратором:",
+        reply_markup=get_back_keyboard('settings_menu')
+    )
 
-        if poll_message:
-            await volley_bot.pin_message(context.bot, temp_template['chat_id'], poll_message.message_id)
-            await query.edit_message_text(text=f"✅ Опрос '{temp_template['name']}' успешно создан и закреплен в чате {target_chat_id}!")
-        else:
-            await query.edit_message_text(text=f"❌ Ошибка при создании опроса '{temp_template['name']}' в чате {target_chat_id}.")
+    creation_states[user_id] = {'step': 'waiting_admin_id'}
 
-        await query.edit_message_reply_markup(reply_markup=get_back_keyboard('create_poll_menu'))
 
-    elif query.data == 'settings_menu':
-        await query.edit_message_text(
-            text="Меню настроек:",
-            reply_markup=get_settings_menu_keyboard()
-        )
+@router.callback('back_to_main')
+async def _on_back_to_main(query, context, user_id):
+    """Возврат в главное меню"""
+    if user_id in creation_states:
+        del creation_states[user_id]
 
-    elif query.data == 'refresh_all_polls':
-        await volley_bot.create_polls_for_all_enabled_templates(context.bot)
-        await query.edit_message_text(
-            text="✅ Все включенные опросы обновлены!",
-            reply_markup=get_back_keyboard('settings_menu')
-        )
+    await query.edit_message_text(
+        text='🏐 Привет! Это бот для управления опросами о волейбольных тренировках.\n\n'
+             'Выберите действие:',
+        reply_markup=get_main_menu()
+    )
 
-    elif query.data == 'add_admin_menu':
-        await query.edit_message_text(
-            text="Для добавления нового администратора:\n\n"
-                 "1. Добавьте будущего администратора в этот чат или начните с ним личный чат\n"
-                 "2. Попросите его отправить команду /getid в этот чат\n"
-                 "3. Скопируйте полученный ID и вернитесь сюда\n\n"
-                 "Введите ID пользователя, которого хотите назначить администратором:",
-            reply_markup=get_back_keyboard('settings_menu')
-        )
 
-        creation_states[user_id] = {'step': 'waiting_admin_id'}
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка нажатий на inline-кнопки"""
+    query = update.callback_query
+    await query.answer()
 
-    elif query.data == 'back_to_main':
-        if user_id in creation_states:
-            del creation_states[user_id]
+    volley_bot = context.bot_data['volley_bot']
+    user_id = update.effective_user.id
+    
+    if user_id not in volley_bot.admins:
+        await query.answer(text='❌ У вас нет прав для управления этим ботом.', show_alert=True)
+        return
 
-        await query.edit_message_text(
-            text='🏐 Привет! Это бот для управления опросами о волейбольных тренировках.\n\n'
-                 'Выберите действие:',
-            reply_markup=get_main_menu()
-        )
+    if not await router.dispatch(query.data or '', query, context, user_id):
+        logger.warning(f"Неизвестная кнопка {query.data!r} от пользователя {user_id}")
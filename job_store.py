@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Хранилище задач APScheduler в SQLite
+
+Задачи (триггер и время следующего запуска) хранятся в таблице
+apscheduler_jobs той же volleybot.db, поэтому переживают перезапуск
+бота: пропущенный запуск выполняется после старта, если не прошло
+misfire_grace_time. Устроено как SQLAlchemyJobStore из APScheduler,
+но без зависимости от SQLAlchemy.
+"""
+
+import pickle
+import sqlite3
+from typing import List, Optional
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from database import Database
+
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    Хранилище задач APScheduler в таблице SQLite
+
+    Функция задачи должна быть доступна по ссылке module:function
+    (не лямбда и не метод объекта), аргументы — сериализуемы pickle.
+
+    Пример:
+        scheduler = AsyncIOScheduler(jobstores={'polls': SQLiteJobStore(Database("volleybot.db"))})
+    """
+
+    def __init__(self, database: Database, tablename: str = 'apscheduler_jobs',
+                 pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.database = database
+        self.tablename = tablename
+        self.pickle_protocol = pickle_protocol
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self.database.conn
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        with self.conn:
+            self.conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.tablename} (
+                    id TEXT PRIMARY KEY,
+                    next_run_time REAL,
+                    job_state BLOB NOT NULL
+                )
+            ''')
+            self.conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_{self.tablename}_next_run_time '
+                f'ON {self.tablename} (next_run_time)'
+            )
+
+    def lookup_job(self, job_id: str) -> Optional[Job]:
+        row = self.conn.execute(
+            f'SELECT job_state FROM {self.tablename} WHERE id = ?', (job_id,)
+        ).fetchone()
+        return self._reconstitute_job(row['job_state']) if row else None
+
+    def get_due_jobs(self, now) -> List[Job]:
+        return self._get_jobs('WHERE next_run_time <= ?', (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        row = self.conn.execute(
+            f'SELECT MIN(next_run_time) AS next_run_time FROM {self.tablename}'
+        ).fetchone()
+        return utc_timestamp_to_datetime(row['next_run_time'])
+
+    def get_all_jobs(self) -> List[Job]:
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job: Job):
+        try:
+            with self.conn:
+                self.conn.execute(
+                    f'INSERT INTO {self.tablename} (id, next_run_time, job_state) VALUES (?, ?, ?)',
+                    (job.id, datetime_to_utc_timestamp(job.next_run_time), self._serialize(job))
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job: Job):
+        with self.conn:
+            cursor = self.conn.execute(
+                f'UPDATE {self.tablename} SET next_run_time = ?, job_state = ? WHERE id = ?',
+                (datetime_to_utc_timestamp(job.next_run_time), self._serialize(job), job.id)
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id: str):
+        with self.conn:
+            cursor = self.conn.execute(f'DELETE FROM {self.tablename} WHERE id = ?', (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with self.conn:
+            self.conn.execute(f'DELETE FROM {self.tablename}')
+
+    def shutdown(self):
+        self.database.close()
+
+    def _serialize(self, job: Job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state: bytes) -> Job:
+        state = pickle.loads(job_state)
+        state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, condition: str = '', params: tuple = ()) -> List[Job]:
+        # NULL (приостановленные задачи) в SQLite сортируются первыми, как и в SQLAlchemyJobStore
+        rows = self.conn.execute(
+            f'SELECT id, job_state FROM {self.tablename} {condition} ORDER BY next_run_time', params
+        ).fetchall()
+
+        jobs, failed_job_ids = [], []
+        for row in rows:
+            try:
+                jobs.append(self._reconstitute_job(row['job_state']))
+            except BaseException:
+                self._logger.exception(f'Не удалось восстановить задачу "{row["id"]}", она удаляется')
+                failed_job_ids.append(row['id'])
+
+        if failed_job_ids:
+            with self.conn:
+                self.conn.executemany(
+                    f'DELETE FROM {self.tablename} WHERE id = ?', [(job_id,) for job_id in failed_job_ids]
+                )
+        return jobs
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} (path={self.database.db_path})>'
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Миграция БД: привязка активных опросов к расписанию и дате тренировки
+
+schedule_id и training_date в active_polls: по ним находится опрос
+расписания на дату, и повторный опрос не публикуется. training_date и
+training_time — слот тренировки, на который записывают голоса в опросе
+(уникальность пары добавляет migrate_active_polls_unique.py)
+"""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "volleybot.db"
+
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    for column in ('schedule_id TEXT', 'training_date TEXT', 'training_time TEXT'):
+        name = column.split()[0]
+        try:
+            cursor.execute(f"ALTER TABLE active_polls ADD COLUMN {column}")
+            print(f"✓ Добавлено поле {name} в active_polls")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" in str(e).lower():
+                print(f"✓ Поле {name} уже существует")
+            else:
+                raise
+
+    conn.commit()
+    conn.close()
+
+    print("\n✅ Миграция завершена успешно!")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Миграция БД: один опрос расписания на дату тренировки
+
+Было: active_polls без ограничения, message_id NOT NULL
+Стало: UNIQUE(schedule_id, training_date), message_id заполняется после
+отправки, outbound_job_id — задача sendPoll в очереди исходящих запросов
+
+Запись расписания на дату занимается до отправки опроса, поэтому
+повторный запуск задачи или догоняющая публикация не создают дубль.
+Запускать после migrate_active_polls.py.
+"""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "volleybot.db"
+
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'active_polls'")
+    if 'outbound_job_id' in cursor.fetchone()[0]:
+        print("✓ Таблица active_polls уже обновлена")
+        conn.close()
+        return
+
+    # SQLite не позволяет изменить ограничения напрямую, пересоздаём таблицу
+    cursor.execute("ALTER TABLE active_polls RENAME TO active_polls_old")
+    print("✓ Старая таблица переименована в active_polls_old")
+
+    cursor.execute("""
+        CREATE TABLE active_polls (
+            id TEXT PRIMARY KEY,
+            chat_id TEXT NOT NULL,
+            message_id INTEGER,
+            message_thread_id INTEGER,
+            template_id TEXT,
+            schedule_id TEXT,
+            training_date TEXT,
+            training_time TEXT,
+            outbound_job_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(schedule_id, training_date)
+        )
+    """)
+    print("✓ Создана новая таблица active_polls с UNIQUE(schedule_id, training_date)")
+
+    # Дубли по расписанию и дате (если были) не копируются, остаётся первый опрос
+    cursor.execute("""
+        INSERT OR IGNORE INTO active_polls
+        (id, chat_id, message_id, message_thread_id, template_id, schedule_id, training_date,
+         training_time, created_at)
+        SELECT id, chat_id, message_id, message_thread_id, template_id, schedule_id, training_date,
+               training_time, created_at
+        FROM active_polls_old
+        ORDER BY created_at, rowid
+    """)
+    print(f"✓ Скопировано {cursor.rowcount} записей")
+
+    cursor.execute("DROP TABLE active_polls_old")
+    cursor.execute("DROP INDEX IF EXISTS idx_active_polls_schedule")
+    print("✓ Старая таблица удалена")
+
+    conn.commit()
+    conn.close()
+
+    print("\n✅ Миграция завершена успешно!")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Миграция БД: время отправки опроса для каждого расписания
+
+poll_time в poll_schedules (ЧЧ:ММ, по умолчанию 12:00 как раньше)
+"""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "volleybot.db"
+
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("ALTER TABLE poll_schedules ADD COLUMN poll_time TEXT DEFAULT '12:00'")
+        print("✓ Добавлено поле poll_time в poll_schedules")
+    except sqlite3.OperationalError as e:
+        if "duplicate column" in str(e).lower():
+            print("✓ Поле poll_time уже существует")
+        else:
+            raise
+
+    conn.commit()
+    conn.close()
+
+    print("\n✅ Миграция завершена успешно!")
+
+
+if __name__ == "__main__":
+    migrate()
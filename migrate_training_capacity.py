@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Миграция БД: вместимость тренировок и счётчики мест
+
+- capacity в poll_schedules и one_time_trainings (NULL — берётся из шаблона)
+- таблица training_slots со счётчиками registered/waitlist по каждой
+  тренировке, заполняется по существующим записям
+"""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "volleybot.db"
+
+
+def add_capacity_column(cursor, table: str):
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN capacity INTEGER")
+        print(f"✓ Добавлено поле capacity в {table}")
+    except sqlite3.OperationalError as e:
+        if "duplicate column" in str(e).lower():
+            print(f"✓ Поле capacity в {table} уже существует")
+        else:
+            raise
+
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    add_capacity_column(cursor, "poll_schedules")
+    add_capacity_column(cursor, "one_time_trainings")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS training_slots (
+            training_date DATE NOT NULL,
+            training_time TEXT NOT NULL,
+            chat_id TEXT NOT NULL,
+            registered_count INTEGER NOT NULL DEFAULT 0,
+            waitlist_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (training_date, training_time, chat_id)
+        )
+    """)
+    print("✓ Создана таблица training_slots")
+
+    # Пересчитываем счётчики по существующим записям
+    cursor.execute("""
+        INSERT OR REPLACE INTO training_slots
+            (training_date, training_time, chat_id, registered_count, waitlist_count)
+        SELECT tr.training_date, tr.training_time, tr.chat_id,
+               SUM(tr.status = 'registered'),
+               SUM(tr.status = 'waitlist')
+        FROM training_registrations tr
+        GROUP BY tr.training_date, tr.training_time, tr.chat_id
+    """)
+    print(f"✓ Заполнены счётчики для {cursor.rowcount} тренировок")
+
+    conn.commit()
+    conn.close()
+
+    print("\n✅ Миграция завершена успешно!")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Очередь исходящих запросов к Bot API
+
+Задачи хранятся в таблице outbound_jobs, поэтому переживают перезапуск
+бота. Запросы в один чат выполняются по порядку (опрос, затем его
+закрепление), при 429 выдерживается retry_after, при сетевых ошибках —
+экспоненциальная задержка со случайным разбросом.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from telegram.error import (
+    BadRequest, ChatMigrated, Forbidden, InvalidToken, NetworkError, RetryAfter, TelegramError,
+)
+
+from async_database import AsyncDatabase
+from rate_limit import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, которые не исправятся повтором запроса
+PERMANENT_ERRORS = (BadRequest, Forbidden, InvalidToken, ChatMigrated)
+
+
+def telegram_error(response: Dict[str, Any]) -> TelegramError:
+    """Исключение python-telegram-bot для ответа Bot API с ok=false"""
+    code = response.get('error_code')
+    description = response.get('description', 'Unknown error')
+    parameters = response.get('parameters') or {}
+
+    if code == 429:
+        return RetryAfter(parameters.get('retry_after', 1))
+    if 'migrate_to_chat_id' in parameters:
+        return ChatMigrated(parameters['migrate_to_chat_id'])
+    if code == 400:
+        return BadRequest(description)
+    if code == 403:
+        return Forbidden(description)
+    if code in (401, 404):
+        return InvalidToken(description)
+    return NetworkError(description)
+
+
+class OutboundQueue:
+    """
+    Очередь исходящих запросов с повторами
+
+    Пример:
+        queue = OutboundQueue(adb, volley_bot._api_call, volley_bot.rate_limiter)
+        queue.start()
+        poll_job = await queue.enqueue(chat_id, 'sendPoll', data)
+        await queue.enqueue(chat_id, 'pinChatMessage', {'chat_id': chat_id}, depends_on=poll_job)
+        message = await queue.wait_for(poll_job, timeout=30)
+
+    Обработчики add_completion_hook вызываются после каждой выполненной
+    задачи, в том числе если её результата уже никто не ждёт.
+    """
+
+    def __init__(self, adb: AsyncDatabase,
+                 api_call: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+                 rate_limiter: Optional[TelegramRateLimiter] = None,
+                 max_attempts: int = 8, base_delay: float = 1.0, max_delay: float = 300.0,
+                 idle_interval: float = 1.0, clock: Callable[[], float] = time.time):
+        self.adb = adb
+        self.api_call = api_call
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.idle_interval = idle_interval
+        self.clock = clock
+
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._jobs: Set[asyncio.Task] = set()
+        self._busy_chats: Set[str] = set()
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+        self._completion_hooks: List[Callable[[Dict[str, Any], Any], Awaitable[Any]]] = []
+        self._wakeup = asyncio.Event()
+
+    # ==================== Постановка задач ====================
+
+    async def enqueue(self, chat_id: str, method: str, payload: Dict[str, Any],
+                      depends_on: Optional[int] = None) -> int:
+        """
+        Добавление запроса в очередь
+
+        Если у задачи есть depends_on и в payload нет message_id, он берётся
+        из результата зависимости (так закрепляется только что созданный опрос).
+        """
+        job_id = await self.adb.add_outbound_job(chat_id, method, payload, depends_on, self.clock())
+        self._wakeup.set()
+        return job_id
+
+    async def wait_for(self, job_id: int, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Ожидание результата задачи
+
+        Returns:
+            Результат Bot API, либо None если задача не выполнена или не
+            успела выполниться за timeout (тогда она остаётся в очереди)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(future)
+        try:
+            job = await self.adb.get_outbound_job(job_id)
+            if job is None or job['status'] != 'pending':
+                return job['result'] if job else None
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Задача {job_id} не выполнена за {timeout} с, остаётся в очереди")
+            return None
+        finally:
+            waiters = self._waiters.get(job_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(job_id, None)
+
+    async def submit(self, chat_id: str, method: str, payload: Dict[str, Any],
+                     timeout: Optional[float] = 30.0) -> Optional[Any]:
+        """Добавление запроса в очередь и ожидание результата"""
+        job_id = await self.enqueue(chat_id, method, payload)
+        return await self.wait_for(job_id, timeout)
+
+    def add_completion_hook(self, hook: Callable[[Dict[str, Any], Any], Awaitable[Any]]):
+        """
+        Обработчик выполненных задач: hook(job, result)
+
+        Вызывается до того, как результат получат ожидающие wait_for.
+        """
+        self._completion_hooks.append(hook)
+
+    # ==================== Повторы ====================
+
+    def retry_delay(self, error: Exception, attempts: int) -> Optional[float]:
+        """
+        Задержка перед следующей попыткой
+
+        Args:
+            attempts: Сколько попыток уже сделано, включая неудачную
+
+        Returns:
+            Секунды до повтора или None, если повторять не нужно
+        """
+        # 429 тоже расходует попытки: иначе чат под постоянным flood-лимитом
+        # навсегда задерживает свою очередь
+        if isinstance(error, PERMANENT_ERRORS) or attempts >= self.max_attempts:
+            return None
+        if isinstance(error, RetryAfter):
+            retry_after = error.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            return float(retry_after)
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return random.uniform(backoff / 2, backoff)
+
+    # ==================== Обработка ====================
+
+    def start(self):
+        """Запуск обработки очереди (вместе с незавершёнными задачами прошлого запуска)"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            logger.info("Очередь исходящих запросов запущена")
+
+    async def stop(self, timeout: float = 10.0):
+        """Остановка обработки: текущим запросам даётся timeout секунд на завершение"""
+        if self._task is None:
+            return
+        # Флаг вместо cancel: wait_for в Python < 3.12 может проглотить отмену
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+        if self._jobs:
+            done, pending = await asyncio.wait(self._jobs, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        logger.info("Очередь исходящих запросов остановлена")
+
+    async def _run(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                for job in await self.adb.get_due_outbound_jobs(self.clock()):
+                    if self._stopping or job['chat_id'] in self._busy_chats:
+                        continue
+                    self._busy_chats.add(job['chat_id'])
+                    task = asyncio.create_task(self._execute(job))
+                    self._jobs.add(task)
+                    task.add_done_callback(self._jobs.discard)
+
+                next_attempt_at = await self.adb.get_next_outbound_attempt()
+            except Exception as e:
+                logger.error(f"Ошибка чтения очереди исходящих запросов: {e}")
+                next_attempt_at = None
+
+            timeout = self.idle_interval
+            if next_attempt_at is not None and next_attempt_at > self.clock():
+                timeout = min(timeout, next_attempt_at - self.clock())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _resolve_payload(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        payload = dict(job['payload'])
+        if job['depends_on'] is not None and 'message_id' not in payload:
+            dependency = await self.adb.get_outbound_job(job['depends_on'])
+            result = dependency['result'] if dependency else None
+            if not isinstance(result, dict) or 'message_id' not in result:
+                raise BadRequest(f"Зависимость {job['depends_on']} не вернула message_id")
+            payload['message_id'] = result['message_id']
+        return payload
+
+    async def _execute(self, job: Dict[str, Any]):
+        job_id = job['id']
+        try:
+            payload = await self._resolve_payload(job)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(job['chat_id'])
+            result = await self.api_call(job['method'], payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempts = job['attempts'] + 1
+            delay = self.retry_delay(e, attempts)
+            if delay is None:
+                logger.error(f"Задача {job_id} ({job['method']} в чат {job['chat_id']}) "
+                             f"не выполнена после {attempts} попыток: {e}")
+                for failed_id in await self.adb.fail_outbound_job(job_id, str(e)):
+                    self._resolve(failed_id, None)
+            else:
+                logger.warning(f"Задача {job_id} ({job['method']} в чат {job['chat_id']}): {e}, "
+                               f"повтор через {delay:.1f} с")
+                await self.adb.retry_outbound_job(job_id, self.clock() + delay, str(e))
+        else:
+            await self.adb.complete_outbound_job(job_id, result)
+            for hook in self._completion_hooks:
+                try:
+                    await hook(job, result)
+                except Exception as e:
+                    logger.error(f"Ошибка обработчика выполненной задачи {job_id}: {e}")
+            self._resolve(job_id, result)
+        finally:
+            self._busy_chats.discard(job['chat_id'])
+            self._wakeup.set()
+
+    def _resolve(self, job_id: int, result: Any):
+        for future in self._waiters.pop(job_id, []):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Приём голосов в опросах тренировок
+
+Голоса из PollAnswer копятся в буфере и применяются к training_registrations
+пачками, одной транзакцией Database.apply_poll_answers: сотни голосов
+в первую минуту после публикации опроса не ждут каждый свою транзакцию.
+Ошибка в одном голосе не откатывает остальные, а если пачка не применилась
+целиком (например, БД занята), голоса возвращаются в буфер для повтора.
+Первый вариант ответа («Буду») записывает на тренировку, любой другой
+вариант или отзыв голоса — отписывает.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from async_database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+# Номер варианта ответа, который означает запись на тренировку
+REGISTER_OPTION_ID = 0
+
+
+class PollAnswerBatcher:
+    """
+    Буфер голосов в опросах с применением пачками
+
+    Пачка применяется через flush_interval секунд после первого голоса
+    или сразу, когда набралось max_batch голосов. Если пользователь успел
+    переголосовать, применяется только последний голос.
+
+    Пример:
+        batcher = PollAnswerBatcher(adb)
+        await batcher.submit(answer.poll_id, answer.user.id, answer.option_ids,
+                             answer.user.first_name, answer.user.last_name, answer.user.username)
+        ...
+        await batcher.stop()
+    """
+
+    def __init__(self, adb: AsyncDatabase, flush_interval: float = 0.5, max_batch: int = 200):
+        self.adb = adb
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        # Последний голос каждого пользователя в каждом опросе, в порядке поступления
+        self._pending: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def submit(self, poll_id: str, user_telegram_id: int, option_ids: Sequence[int],
+                     first_name: Optional[str] = None, last_name: Optional[str] = None,
+                     username: Optional[str] = None):
+        """Добавление голоса в буфер (имя нужно, чтобы записать голосующего в users)"""
+        key = (poll_id, user_telegram_id)
+        # Переголосование переносит голос в конец очереди
+        self._pending.pop(key, None)
+        self._pending[key] = {
+            'poll_id': poll_id,
+            'user_telegram_id': user_telegram_id,
+            'register': REGISTER_OPTION_ID in option_ids,
+            'first_name': first_name,
+            'last_name': last_name,
+            'username': username,
+        }
+
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> List[Dict[str, Any]]:
+        """
+        Применение накопленных голосов одной транзакцией
+
+        Returns:
+            Результаты apply_poll_answers по каждому голосу
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return []
+            answers = list(self._pending.values())
+            self._pending = {}
+
+            result = await self.adb.apply_poll_answers(answers)
+            if not result.get('success'):
+                logger.error(f"Голоса в опросах не применены ({len(answers)} шт.), "
+                             f"повтор через {self.flush_interval} с: {result.get('error')}")
+                self._requeue(answers)
+                return []
+
+            results = result['results']
+            applied = [r for r in results if r['action'] is not None]
+            registered = sum(1 for r in applied if r['action'] == 'register')
+            promoted = [r['promoted_user_telegram_id'] for r in applied if r['promoted_user_telegram_id']]
+            logger.info(f"Голоса в опросах: применено {len(applied)} из {len(results)} "
+                        f"(записей {registered}, отписок {len(applied) - registered})"
+                        f"{', из waitlist зачислены ' + ', '.join(map(str, promoted)) if promoted else ''}")
+            return results
+
+    def _requeue(self, answers: List[Dict[str, Any]]):
+        """Возврат неприменённых голосов в буфер (более новые голоса тех же пользователей важнее)"""
+        pending = {(answer['poll_id'], answer['user_telegram_id']): answer for answer in answers}
+        pending.update(self._pending)
+        self._pending = pending
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def stop(self):
+        """Применение оставшихся голосов при остановке бота"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        # Повтор после остановки не выполнится: оставшиеся голоса теряются
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            logger.error(f"При остановке не применено голосов: {len(self._pending)}")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Планирование опросов: отдельная задача APScheduler на каждое расписание
+
+Задача срабатывает в день poll_day в poll_time. Изменения расписаний
+через бота применяются сразу (sync_schedule / remove_schedule), изменения
+через веб-интерфейс замечаются по отметке get_poll_schedules_watermark.
+
+Задачи можно хранить в SQLiteJobStore: запуск, пропущенный во время
+перезапуска, APScheduler выполнит сам в пределах misfire_grace_time,
+более старые пропуски публикует catch_up.
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from apscheduler.schedulers.base import BaseScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from async_database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_TIME = '12:00'
+JOB_ID_PREFIX = 'poll_schedule:'
+
+# Дни недели в формате CronTrigger
+CRON_DAYS = {
+    'monday': 'mon', 'tuesday': 'tue', 'wednesday': 'wed', 'thursday': 'thu',
+    'friday': 'fri', 'saturday': 'sat', 'sunday': 'sun'
+}
+
+# Сколько секунд после назначенного времени опрос ещё публикуется планировщиком
+MISFIRE_GRACE_TIME = 10 * 60
+
+_POLL_TIME_RE = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+# Обработчик запусков последнего созданного PollScheduler
+_run_schedule: Optional[Callable[..., Awaitable[Any]]] = None
+
+
+def parse_poll_time(poll_time: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Разбор времени ЧЧ:ММ в (часы, минуты), None если формат неверный"""
+    match = _POLL_TIME_RE.match((poll_time or '').strip())
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def schedule_job_id(schedule_id: str) -> str:
+    return f"{JOB_ID_PREFIX}{schedule_id}"
+
+
+async def run_scheduled_poll(schedule_id: str):
+    """
+    Функция задачи расписания
+
+    Задача ссылается на функцию модуля, а не на метод бота, поэтому её
+    можно сохранить в SQLiteJobStore и восстановить после перезапуска.
+    """
+    if _run_schedule is None:
+        logger.error(f"Расписание {schedule_id}: планировщик опросов не создан")
+        return None
+    return await _run_schedule(schedule_id)
+
+
+class PollScheduler:
+    """
+    Задачи APScheduler для расписаний опросов
+
+    Пример:
+        scheduler = AsyncIOScheduler(jobstores={'polls': SQLiteJobStore(Database("volleybot.db"))})
+        scheduler.start(paused=True)
+        poll_scheduler = PollScheduler(scheduler, adb, run_schedule, jobstore='polls')
+        await poll_scheduler.catch_up()
+        await poll_scheduler.sync_all()
+        scheduler.resume()
+        scheduler.add_job(poll_scheduler.check_for_changes, 'interval', seconds=60)
+    """
+
+    def __init__(self, scheduler: BaseScheduler, adb: AsyncDatabase,
+                 run_schedule: Callable[..., Awaitable[Any]],
+                 jobstore: str = 'default', misfire_grace_time: int = MISFIRE_GRACE_TIME):
+        """
+        Args:
+            run_schedule: Корутина run_schedule(schedule_id, poll_date=None),
+                poll_date передаётся при публикации пропущенного опроса
+            jobstore: Хранилище задач расписаний в scheduler
+        """
+        global _run_schedule
+        self.scheduler = scheduler
+        self.adb = adb
+        self.run_schedule = run_schedule
+        self.jobstore = jobstore
+        self.misfire_grace_time = misfire_grace_time
+        self._watermark: Optional[tuple] = None
+        _run_schedule = run_schedule
+
+    def build_trigger(self, schedule: Dict[str, Any]) -> Optional[CronTrigger]:
+        """CronTrigger расписания или None, если день или время заданы неверно"""
+        day = CRON_DAYS.get(str(schedule.get('poll_day', '')).lower())
+        poll_time = parse_poll_time(schedule.get('poll_time') or DEFAULT_POLL_TIME)
+        if day is None or poll_time is None:
+            logger.error(f"Расписание {schedule.get('id')}: неверный день {schedule.get('poll_day')!r} "
+                         f"или время {schedule.get('poll_time')!r}")
+            return None
+        hour, minute = poll_time
+        return CronTrigger(day_of_week=day, hour=hour, minute=minute, timezone=self.scheduler.timezone)
+
+    def sync_schedule(self, schedule: Dict[str, Any]):
+        """Добавление, перенос или удаление задачи одного расписания"""
+        job_id = schedule_job_id(schedule['id'])
+        trigger = self.build_trigger(schedule) if schedule.get('enabled', True) else None
+        if trigger is None:
+            self.remove_schedule(schedule['id'])
+            return
+
+        job = self.scheduler.get_job(job_id)
+        if job is not None and str(job.trigger) == str(trigger):
+            return
+        self.scheduler.add_job(
+            run_scheduled_poll, trigger, args=(schedule['id'],), id=job_id,
+            name=schedule.get('name', job_id), jobstore=self.jobstore, replace_existing=True,
+            coalesce=True, misfire_grace_time=self.misfire_grace_time,
+        )
+        logger.info(f"Расписание {schedule['id']}: опрос по {trigger}")
+
+    def remove_schedule(self, schedule_id: str):
+        """Удаление задачи расписания (если есть)"""
+        job_id = schedule_job_id(schedule_id)
+        if self.scheduler.get_job(job_id) is not None:
+            self.scheduler.remove_job(job_id)
+            logger.info(f"Расписание {schedule_id}: задача удалена")
+
+    async def sync_all(self):
+        """Сверка всех задач с таблицей poll_schedules"""
+        self._watermark = await self.adb.get_poll_schedules_watermark()
+        schedules = await self.adb.get_poll_schedules()
+        for schedule in schedules:
+            self.sync_schedule(schedule)
+
+        known = {schedule_job_id(schedule['id']) for schedule in schedules}
+        for job in self.scheduler.get_jobs():
+            if job.id.startswith(JOB_ID_PREFIX) and job.id not in known:
+                self.scheduler.remove_job(job.id)
+                logger.info(f"Задача {job.id} удалена: расписания больше нет")
+
+    async def check_for_changes(self):
+        """Сверка задач, если расписания менялись в обход бота (например, через веб)"""
+        watermark = await self.adb.get_poll_schedules_watermark()
+        if watermark != self._watermark:
+            logger.info("Расписания изменились, обновляем задачи")
+            await self.sync_all()
+
+    def missed_runs(self, now: datetime) -> List[Tuple[str, datetime]]:
+        """
+        Последние запуски расписаний, пропущенные дольше misfire_grace_time
+
+        Вызывается после scheduler.start(paused=True) и до sync_all, пока в
+        хранилище лежит время запуска, сохранённое до остановки бота.
+
+        Returns:
+            Список (schedule_id, время последнего пропущенного запуска)
+        """
+        missed = []
+        for job in self.scheduler.get_jobs(jobstore=self.jobstore):
+            if not job.id.startswith(JOB_ID_PREFIX) or job.next_run_time is None:
+                continue
+            last_run, next_run = None, job.next_run_time
+            while next_run is not None and next_run <= now:
+                last_run, next_run = next_run, job.trigger.get_next_fire_time(next_run, now)
+            # Недавний запуск выполнит сам APScheduler (coalesce + misfire_grace_time)
+            if last_run is not None and (now - last_run).total_seconds() > self.misfire_grace_time:
+                missed.append((job.args[0], last_run))
+        return missed
+
+    async def catch_up(self, now: Optional[datetime] = None) -> List[Any]:
+        """Публикация опросов, пропущенных пока бот не работал"""
+        now = now or datetime.now(self.scheduler.timezone)
+        results = []
+        for schedule_id, run_time in self.missed_runs(now):
+            logger.warning(f"Расписание {schedule_id}: пропущен запуск {run_time:%d.%m.%Y %H:%M}, "
+                           f"публикуем опрос")
+            results.append(await self.run_schedule(schedule_id, run_time))
+        return results
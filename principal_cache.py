@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Кэш проверенных токенов и пользователей веб-API
+
+Каждый запрос с access token декодирует JWT и читает пользователя из БД.
+PrincipalCache на короткое время запоминает разобранный токен (по строке
+токена, но не дольше его exp) и запись пользователя (по telegram_id).
+Изменения пользователя в веб-API сбрасывают запись сразу через
+invalidate, изменения в обход веб-API видны не позже чем через ttl.
+
+Так же кэшируется состояние семейств refresh-токенов: проверка отзыва
+на каждом запросе обычно не доходит до БД, а отзыв в этом процессе
+(выход, повторное использование токена) виден сразу.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_SIZE = 1024
+
+
+class _TTLCache:
+    """LRU на max_size записей, у каждой записи своё время истечения"""
+
+    def __init__(self, max_size: int, clock: Callable[[], float]):
+        self.max_size = max_size
+        self.clock = clock
+        self._entries: 'OrderedDict[Any, tuple]' = OrderedDict()
+
+    def get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Any):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PrincipalCache:
+    """
+    Кэш токен → payload и telegram_id → пользователь
+
+    Пример:
+        principals = PrincipalCache(ttl=30)
+        user = principals.get_user(telegram_id)
+        if user is None:
+            user = await db.get_user_by_telegram_id(telegram_id)
+            principals.put_user(telegram_id, user)
+        ...
+        await db.toggle_user_active_status(telegram_id, False)
+        principals.invalidate(telegram_id)
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_size: int = DEFAULT_MAX_SIZE,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            clock: Часы в секундах Unix-времени, с ними сравнивается exp токена
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._tokens = _TTLCache(max_size, clock)
+        self._users = _TTLCache(max_size, clock)
+        self._families = _TTLCache(max_size, clock)
+
+    def get_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """Payload ранее проверенного токена или None"""
+        return self._tokens.get(token)
+
+    def put_token(self, token: str, payload: Dict[str, Any]):
+        """Запоминание проверенного токена (не дольше его exp)"""
+        expires_at = self.clock() + self.ttl
+        if payload.get('exp') is not None:
+            expires_at = min(expires_at, float(payload['exp']))
+        self._tokens.put(token, payload, expires_at)
+
+    def get_user(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Копия закэшированного пользователя или None"""
+        user = self._users.get(telegram_id)
+        return dict(user) if user is not None else None
+
+    def put_user(self, telegram_id: int, user: Dict[str, Any]):
+        self._users.put(telegram_id, dict(user), self.clock() + self.ttl)
+
+    def invalidate(self, telegram_id: int):
+        """Сброс пользователя после изменения (активность, права, удаление)"""
+        self._users.pop(telegram_id)
+
+    def is_family_revoked(self, family_id: str) -> Optional[bool]:
+        """Отозвано ли семейство refresh-токенов или None, если не известно"""
+        return self._families.get(family_id)
+
+    def put_family(self, family_id: str, revoked: bool):
+        self._families.put(family_id, revoked, self.clock() + self.ttl)
+
+    def revoke_family(self, family_id: str):
+        """Отметка об отзыве семейства, сделанном в этом процессе"""
+        self.put_family(family_id, True)
+
+    def clear(self):
+        self._tokens.clear()
+        self._users.clear()
+        self._families.clear()
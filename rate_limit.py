@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Ограничение частоты отправки сообщений в Telegram и параллельная рассылка
+
+Лимиты Bot API: около 30 сообщений в секунду всего, не больше
+1 сообщения в секунду в один чат и 20 сообщений в минуту в группу.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30            # сообщений в секунду на бота
+CHAT_RATE = 1               # сообщений в секунду в один чат
+GROUP_RATE = 20 / 60        # сообщений в секунду в группу (20 в минуту)
+GROUP_BURST = 20            # сообщений в группу подряд в пределах минутного лимита
+SWEEP_INTERVAL = 60         # секунд между удалениями простаивающих лимитов чатов
+
+
+class TokenBucket:
+    """
+    Token bucket: rate токенов в секунду, не больше capacity в запасе
+
+    Токены резервируются сразу (запас может уйти в минус), поэтому
+    ожидающие получают слоты по очереди вызова без блокировок.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def reserve(self) -> float:
+        """Резервирование токена, возвращает сколько секунд ждать до него"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """Запас восстановлен полностью: такой bucket не отличается от нового"""
+        return self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+class TelegramRateLimiter:
+    """
+    Ограничитель отправки: общий лимит бота и лимиты каждого чата
+
+    Личный чат — 1 сообщение в секунду. Группа — 20 в минуту, их можно
+    отправить подряд (опрос и его закрепление не ждут друг друга).
+
+    Лимиты чатов, чей запас полностью восстановился, раз в sweep_interval
+    удаляются: при следующей отправке вместо них создаются такие же новые.
+
+    Пример:
+        limiter = TelegramRateLimiter()
+        await limiter.acquire(chat_id)
+        await bot.send_message(chat_id, ...)
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE,
+                 group_rate: float = GROUP_RATE, group_burst: float = GROUP_BURST,
+                 sweep_interval: float = SWEEP_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate, clock=clock)
+        self._chat_buckets: Dict[str, List[TokenBucket]] = {}
+        self._swept_at = clock()
+
+    @staticmethod
+    def is_group(chat_id: Union[str, int]) -> bool:
+        """Группы и супергруппы в Telegram имеют отрицательный ID"""
+        return str(chat_id).startswith('-')
+
+    def sweep(self) -> int:
+        """Удаление простаивающих лимитов чатов, возвращает сколько удалено"""
+        now = self.clock()
+        self._swept_at = now
+        idle = [key for key, buckets in self._chat_buckets.items()
+                if all(bucket.is_full(now) for bucket in buckets)]
+        for key in idle:
+            del self._chat_buckets[key]
+        return len(idle)
+
+    def _buckets_for(self, chat_id: Union[str, int]) -> List[TokenBucket]:
+        if self.clock() - self._swept_at >= self.sweep_interval:
+            self.sweep()
+        key = str(chat_id)
+        buckets = self._chat_buckets.get(key)
+        if buckets is None:
+            if self.is_group(key):
+                buckets = [TokenBucket(self.group_rate, self.group_burst, clock=self.clock)]
+            else:
+                buckets = [TokenBucket(self.chat_rate, clock=self.clock)]
+            self._chat_buckets[key] = buckets
+        return buckets
+
+    async def acquire(self, chat_id: Union[str, int]):
+        """Ожидание, пока в чат можно отправить следующее сообщение"""
+        # Сначала лимит чата, чтобы не занимать общий слот во время ожидания
+        wait = max(bucket.reserve() for bucket in self._buckets_for(chat_id))
+        if wait > 0:
+            await self.sleep(wait)
+        wait = self.global_bucket.reserve()
+        if wait > 0:
+            await self.sleep(wait)
+
+
+async def fan_out(items: Iterable[Any], worker: Callable[[Any], Awaitable[Any]],
+                  key: Callable[[Any], str], max_concurrency: int = 10) -> List[Dict[str, Any]]:
+    """
+    Параллельный запуск worker для каждого элемента
+
+    Результат worker, равный None или False, считается неудачей,
+    исключение записывается в error.
+
+    Returns:
+        [{"key", "success", "latency", "error"}] в порядке items
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(item) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.monotonic()
+            error: Optional[str] = None
+            try:
+                success = bool(await worker(item))
+            except Exception as e:
+                success = False
+                error = str(e)
+                logger.error(f"Ошибка при обработке {key(item)}: {e}")
+            return {
+                "key": key(item),
+                "success": success,
+                "latency": time.monotonic() - started,
+                "error": error,
+            }
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+def format_fan_out_summary(results: List[Dict[str, Any]], title: str) -> str:
+    """Текстовый отчёт по результатам fan_out"""
+    succeeded = sum(1 for result in results if result["success"])
+    lines = [f"{title}: {succeeded}/{len(results)} успешно"]
+    for result in results:
+        mark = "✓" if result["success"] else "✗"
+        line = f"  {mark} {result['key']}: {result['latency'] * 1000:.0f} мс"
+        if result["error"]:
+            line += f" ({result['error']})"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Хранилища состояния пошаговых диалогов бота
+
+Состояние диалога (шаг мастера создания опроса, редактируемое
+расписание и т.п.) хранится по ID пользователя. У каждой записи есть
+срок жизни: брошенный на полпути диалог удаляется при обращении или
+периодической очистке sweep. MemoryStateStore держит не больше max_size
+записей (LRU), SQLiteStateStore дополнительно сохраняет состояние
+в volleybot.db, поэтому диалог можно продолжить после перезапуска бота.
+
+Состояние — словарь, сериализуемый в JSON. Обработчики обязаны сохранять
+изменения присваиванием store[user_id] = state: SQLiteStateStore хранит
+копию и каждый раз отдаёт новую, изменение полученного словаря на месте
+не сохраняется.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, MutableMapping
+
+from database import Database
+
+# Сколько секунд хранится состояние после последнего шага
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_SIZE = 1000
+
+# Состояния диалогов по ID пользователя
+StateStore = MutableMapping[int, Dict[str, Any]]
+
+
+class MemoryStateStore(MutableMapping):
+    """
+    Состояния в памяти: LRU на max_size записей с TTL
+
+    Пример:
+        states = MemoryStateStore(max_size=1000, ttl=3600)
+        states[user_id] = {'step': 'waiting_name'}
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._states: 'OrderedDict[int, tuple]' = OrderedDict()
+
+    def __getitem__(self, user_id: int) -> Dict[str, Any]:
+        expires_at, state = self._states[user_id]
+        if expires_at <= self.clock():
+            del self._states[user_id]
+            raise KeyError(user_id)
+        self._states.move_to_end(user_id)
+        return state
+
+    def __setitem__(self, user_id: int, state: Dict[str, Any]):
+        self.put(user_id, state, self.clock() + self.ttl)
+
+    def put(self, user_id: int, state: Any, expires_at: float):
+        """Запись состояния с заданным временем истечения"""
+        self._states[user_id] = (expires_at, state)
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_size:
+            self._states.popitem(last=False)
+
+    def __delitem__(self, user_id: int):
+        del self._states[user_id]
+
+    def __iter__(self) -> Iterator[int]:
+        now = self.clock()
+        return iter([user_id for user_id, (expires_at, _) in self._states.items() if expires_at > now])
+
+    def __len__(self) -> int:
+        return len(list(iter(self)))
+
+    def sweep(self) -> int:
+        """Удаление истёкших состояний, возвращает их количество"""
+        now = self.clock()
+        expired = [user_id for user_id, (expires_at, _) in self._states.items() if expires_at <= now]
+        for user_id in expired:
+            del self._states[user_id]
+        return len(expired)
+
+    def close(self):
+        pass
+
+
+class SQLiteStateStore(MutableMapping):
+    """
+    Состояния в памяти с копией в таблице SQLite, переживают перезапуск бота
+
+    Чтение идёт из памяти (MemoryStateStore с JSON-строками), запись
+    в таблицу — в отдельном потоке по порядку, поэтому шаги диалога не
+    обращаются к sqlite в цикле событий. При создании загружаются
+    непросроченные состояния. Записи старше ttl не возвращаются и
+    удаляются sweep, который также оставляет в таблице не больше max_size
+    последних записей.
+
+    Пример:
+        states = SQLiteStateStore(Database("volleybot.db"))
+        scheduler.add_job(states.sweep, 'interval', minutes=10)
+    """
+
+    def __init__(self, database: Database, tablename: str = 'conversation_states',
+                 ttl: float = DEFAULT_TTL, max_size: int = DEFAULT_MAX_SIZE,
+                 clock: Callable[[], float] = time.time):
+        self.database = database
+        self.tablename = tablename
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        # sweep вызывается планировщиком из другого потока
+        self._lock = threading.Lock()
+        self._cache = MemoryStateStore(max_size, ttl, clock)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='volleybot-states')
+        with self.conn:
+            self.conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.tablename} (
+                    user_id INTEGER PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            self.conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_{self.tablename}_expires_at '
+                f'ON {self.tablename} (expires_at)'
+            )
+        rows = self.conn.execute(
+            f'SELECT user_id, state, expires_at FROM {self.tablename} WHERE expires_at > ? '
+            f'ORDER BY expires_at DESC LIMIT ?',
+            (self.clock(), self.max_size)
+        ).fetchall()
+        for row in reversed(rows):
+            self._cache.put(row['user_id'], row['state'], row['expires_at'])
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self.database.conn
+
+    def _write(self, sql: str, params: tuple):
+        def run():
+            with self.conn:
+                return self.conn.execute(sql, params).rowcount
+        return self._executor.submit(run)
+
+    def __getitem__(self, user_id: int) -> Dict[str, Any]:
+        with self._lock:
+            data = self._cache[user_id]
+        return json.loads(data)
+
+    def __setitem__(self, user_id: int, state: Dict[str, Any]):
+        data = json.dumps(state, ensure_ascii=False)
+        expires_at = self.clock() + self.ttl
+        with self._lock:
+            self._cache.put(user_id, data, expires_at)
+        self._write(
+            f'INSERT OR REPLACE INTO {self.tablename} (user_id, state, expires_at) VALUES (?, ?, ?)',
+            (user_id, data, expires_at)
+        )
+
+    def __delitem__(self, user_id: int):
+        with self._lock:
+            del self._cache[user_id]
+        self._write(f'DELETE FROM {self.tablename} WHERE user_id = ?', (user_id,))
+
+    def __contains__(self, user_id: object) -> bool:
+        with self._lock:
+            return user_id in self._cache
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            return iter(list(self._cache))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def sweep(self) -> int:
+        """
+        Удаление истёкших и лишних (сверх max_size) состояний
+
+        Returns:
+            Сколько записей удалено из таблицы
+        """
+        now = self.clock()
+        with self._lock:
+            self._cache.sweep()
+
+        def run():
+            with self.conn:
+                removed = self.conn.execute(
+                    f'DELETE FROM {self.tablename} WHERE expires_at <= ?', (now,)
+                ).rowcount
+                removed += self.conn.execute(f'''
+                    DELETE FROM {self.tablename} WHERE user_id NOT IN (
+                        SELECT user_id FROM {self.tablename} ORDER BY expires_at DESC LIMIT ?
+                    )
+                ''', (self.max_size,)).rowcount
+            return removed
+        return self._executor.submit(run).result()
+
+    def close(self):
+        """Дожидается записи изменений и закрывает соединение"""
+        self._executor.shutdown(wait=True)
+        self.database.close()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} (path={self.database.db_path})>'
@@ -54,6 +54,33 @@ def db_with_admin():
         os.remove(db_path)
 
 
+@pytest.fixture
+def calendar_db(monkeypatch):
+    """Фикстура для Database со схемой календаря (применяются миграции)"""
+    import migrate_active_polls
+    import migrate_active_polls_unique
+    import migrate_calendar
+    import migrate_fix_unique_constraint
+    import migrate_invite_codes
+    import migrate_poll_time
+    import migrate_training_capacity
+    from database import Database
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    database = Database(db_path)
+    database.create_tables()
+    migrations = (migrate_calendar, migrate_fix_unique_constraint, migrate_invite_codes,
+                  migrate_training_capacity, migrate_poll_time, migrate_active_polls,
+                  migrate_active_polls_unique)
+    for migration in migrations:
+        monkeypatch.setattr(migration, "DB_PATH", db_path)
+        migration.migrate()
+    yield database
+    database.close()
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+
 @pytest.fixture
 def sample_schedule():
     """Пример расписания для тестов"""
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля admin_registry.py
+"""
+
+import pytest
+
+from admin_registry import AdminRegistry, AsyncAdminRegistry
+from database import Database
+
+
+@pytest.fixture
+def admins(db):
+    registry = AdminRegistry(Database(db.db_path))
+    yield registry
+    registry.close()
+
+
+class TestAdminRegistry:
+    """Тесты AdminRegistry"""
+
+    def test_empty(self, admins):
+        assert 1 not in admins
+        assert len(admins) == 0
+
+    def test_sees_changes_from_other_connection(self, admins, db):
+        db.add_admin_id(100)
+        assert 100 in admins
+        assert admins.admin_ids == frozenset({100})
+
+        db.remove_admin_id(100)
+        assert 100 not in admins
+
+    def test_rereads_only_after_change(self, admins, db, monkeypatch):
+        db.set_admin_ids([1, 2])
+        assert list(admins) == [1, 2]
+
+        def fail():
+            raise AssertionError("список не должен перечитываться")
+
+        monkeypatch.setattr(admins.database, "get_admin_ids", fail)
+        for _ in range(3):
+            assert 2 in admins
+
+    def test_sees_users_admin_flag_changes(self, calendar_db):
+        admins = AdminRegistry(Database(calendar_db.db_path))
+        try:
+            calendar_db.add_user(telegram_id=100, first_name="Админ")
+            calendar_db.update_user_admin_status(100, True)
+            assert 100 in admins
+        finally:
+            admins.close()
+
+
+class FakeClock:
+    """Часы, которые сдвигаются вручную"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingDatabase:
+    """AsyncDatabase поверх тестовой БД, считает чтения списка"""
+
+    def __init__(self, db):
+        self.db = db
+        self.reads = 0
+
+    async def get_admin_ids(self):
+        self.reads += 1
+        return self.db.get_admin_ids()
+
+
+class TestAsyncAdminRegistry:
+    """Тесты AsyncAdminRegistry"""
+
+    async def test_refresh_is_rate_limited(self, db):
+        clock = FakeClock()
+        adb = CountingDatabase(db)
+        admins = AsyncAdminRegistry(adb, refresh_interval=1, clock=clock)
+
+        db.add_admin_id(100)
+        await admins.refresh()
+        assert 100 in admins
+
+        db.remove_admin_id(100)
+        await admins.refresh()
+        assert 100 in admins
+        assert adb.reads == 1
+
+        clock.now += 1
+        await admins.refresh()
+        assert 100 not in admins
+        assert adb.reads == 2
+
+    async def test_invalidate_forces_reload(self, db):
+        admins = AsyncAdminRegistry(CountingDatabase(db), refresh_interval=60)
+        await admins.refresh()
+
+        db.set_admin_ids([2, 1])
+        admins.invalidate()
+        await admins.refresh()
+        assert list(admins) == [1, 2]
+        assert len(admins) == 2
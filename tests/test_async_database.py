@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля async_database.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from async_database import AsyncDatabase, PooledAsyncDatabase
+from db_pool import DatabasePool
+
+
+@pytest.fixture
+def adb(db):
+    """Асинхронный фасад поверх тестовой БД"""
+    async_db = AsyncDatabase(db)
+    yield async_db
+    async_db._executor.shutdown(wait=True)
+
+
+class TestAsyncDatabase:
+    """Тесты AsyncDatabase"""
+
+    async def test_same_method_surface(self, adb, sample_schedule):
+        await adb.add_poll_schedule(sample_schedule)
+        schedules = await adb.get_poll_schedules()
+        assert schedules[0]["id"] == sample_schedule["id"]
+
+    async def test_kwargs_and_defaults(self, adb):
+        assert await adb.get_setting("missing", default=42) == 42
+
+    async def test_runs_on_dedicated_thread(self, adb):
+        def current_thread(database):
+            return threading.current_thread().name
+
+        names = await asyncio.gather(*[adb.run(current_thread) for _ in range(5)])
+        assert len(set(names)) == 1
+        assert names[0].startswith("volleybot-db")
+        assert names[0] != threading.current_thread().name
+
+    async def test_wrapper_cached(self, adb):
+        assert adb.get_admin_ids is adb.get_admin_ids
+
+    def test_unknown_attribute(self, adb):
+        with pytest.raises(AttributeError):
+            adb.no_such_method
+        with pytest.raises(AttributeError):
+            adb._connect
+
+
+class TestPooledAsyncDatabase:
+    """Тесты PooledAsyncDatabase"""
+
+    @pytest.fixture
+    def pooled(self, tmp_path):
+        pool = DatabasePool(str(tmp_path / "pooled.db"), max_readers=2)
+        pool.writer.create_tables()
+        yield PooledAsyncDatabase(pool)
+        pool.close()
+
+    async def test_routes_reads_and_writes(self, pooled):
+        calls = []
+        original_read, original_write = pooled.pool.run_read, pooled.pool.run_write
+
+        async def run_read(func, *args, **kwargs):
+            calls.append(("read", func.__name__))
+            return await original_read(func, *args, **kwargs)
+
+        async def run_write(func, *args, **kwargs):
+            calls.append(("write", func.__name__))
+            return await original_write(func, *args, **kwargs)
+
+        pooled.pool.run_read, pooled.pool.run_write = run_read, run_write
+
+        await pooled.add_admin_id(7)
+        assert await pooled.get_admin_ids() == [7]
+        assert await pooled.is_initialized() is True
+
+        assert ("write", "add_admin_id") in calls
+        assert ("read", "get_admin_ids") in calls
+        assert ("read", "is_initialized") in calls
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля callback_router.py
+"""
+
+import pytest
+
+from callback_router import CallbackRouter
+
+
+class FakeClock:
+    """Часы, которые сдвигаются вручную"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def router(clock):
+    router = CallbackRouter(clock=clock)
+    router.calls = []
+
+    @router.callback("menu")
+    async def on_menu(value):
+        router.calls.append(("menu", value))
+        clock.now += 0.002
+
+    @router.prefix("day:")
+    async def on_day(value):
+        router.calls.append(("day", value))
+
+    @router.prefix("day:special:")
+    async def on_special_day(value):
+        router.calls.append(("special", value))
+
+    @router.callback("broken")
+    async def on_broken(value):
+        clock.now += 0.001
+        raise RuntimeError("сломалось")
+
+    return router
+
+
+class TestResolve:
+    """Тесты поиска обработчика"""
+
+    def test_exact(self, router):
+        assert router.resolve("menu").name == "menu"
+
+    def test_prefix(self, router):
+        assert router.resolve("day:monday").name == "day:"
+
+    def test_longest_prefix(self, router):
+        assert router.resolve("day:special:1").name == "day:special:"
+        assert router.resolve("day:spec").name == "day:"
+
+    def test_exact_is_not_prefix(self, router):
+        assert router.resolve("menu:1") is None
+        assert router.resolve("men") is None
+
+    def test_unknown(self, router):
+        assert router.resolve("other") is None
+        assert router.resolve("") is None
+
+    def test_duplicate_registration(self, router):
+        with pytest.raises(ValueError):
+            router.callback("menu")(lambda: None)
+        with pytest.raises(ValueError):
+            router.prefix("day:")(lambda: None)
+
+    def test_empty_prefix(self, router):
+        with pytest.raises(ValueError):
+            router.prefix("")
+
+
+class TestDispatch:
+    """Тесты вызова обработчиков и счётчиков"""
+
+    async def test_calls_handler(self, router):
+        assert await router.dispatch("day:friday", 7) is True
+        assert router.calls == [("day", 7)]
+
+    async def test_unknown_is_counted(self, router):
+        assert await router.dispatch("other", 1) is False
+        assert router.unknown == 1
+        assert router.stats() == {}
+
+    async def test_latency_stats(self, router):
+        await router.dispatch("menu", 1)
+        await router.dispatch("menu", 2)
+
+        stats = router.stats()
+        assert list(stats) == ["menu"]
+        assert stats["menu"]["calls"] == 2
+        assert stats["menu"]["errors"] == 0
+        assert stats["menu"]["avg_ms"] == pytest.approx(2.0)
+        assert stats["menu"]["max_ms"] == pytest.approx(2.0)
+
+    async def test_error_is_counted_and_raised(self, router):
+        with pytest.raises(RuntimeError):
+            await router.dispatch("broken", 1)
+
+        assert router.stats()["broken"]["errors"] == 1
+        assert router.stats()["broken"]["total_ms"] == pytest.approx(1.0)
+
+    async def test_prefix_stats_by_route(self, router):
+        await router.dispatch("day:monday", 1)
+        await router.dispatch("day:friday", 2)
+        assert router.stats()["day:"]["calls"] == 2
@@ -3,8 +3,12 @@
 Тесты для модуля database.py
 """
 
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from database import Database
+from database import Database, TRAINING_CAPACITY, get_connection_profile
 
 
 class TestDatabaseInit:
@@ -31,6 +35,50 @@ class TestDatabaseInit:
         assert conn_before is not None
 
 
+class TestConnectionProfile:
+    """Тесты профиля подключения"""
+
+    @staticmethod
+    def _pragma(database, name):
+        return database.conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def test_default_profile_uses_wal(self, db):
+        assert db.profile['name'] == 'default'
+        assert self._pragma(db, 'journal_mode') == 'wal'
+        assert self._pragma(db, 'synchronous') == 1  # NORMAL
+        assert self._pragma(db, 'busy_timeout') == 5000
+        assert self._pragma(db, 'temp_store') == 2  # MEMORY
+
+    def test_profile_from_env(self, monkeypatch):
+        monkeypatch.setenv('VOLLEYBOT_DB_PROFILE', 'legacy')
+        profile = get_connection_profile()
+        assert profile['name'] == 'legacy'
+        assert profile['journal_mode'] == 'DELETE'
+
+    def test_pragma_override_from_env(self, monkeypatch):
+        monkeypatch.setenv('VOLLEYBOT_DB_BUSY_TIMEOUT', '12000')
+        monkeypatch.setenv('VOLLEYBOT_DB_SYNCHRONOUS', 'full')
+        profile = get_connection_profile('default')
+        assert profile['busy_timeout'] == 12000
+        assert profile['synchronous'] == 'FULL'
+
+    def test_invalid_override_ignored(self, monkeypatch):
+        monkeypatch.setenv('VOLLEYBOT_DB_JOURNAL_MODE', 'WAL; DROP TABLE users')
+        monkeypatch.setenv('VOLLEYBOT_DB_CACHE_SIZE', 'big')
+        profile = get_connection_profile('default')
+        assert profile['journal_mode'] == 'WAL'
+        assert profile['cache_size'] == -16000
+
+    def test_unknown_profile_falls_back(self):
+        assert get_connection_profile('nope')['name'] == 'default'
+
+    def test_legacy_profile_applied(self, tmp_path):
+        database = Database(str(tmp_path / "legacy.db"), profile='legacy')
+        database.create_tables()
+        assert self._pragma(database, 'journal_mode') == 'delete'
+        database.close()
+
+
 class TestSettings:
     """Тесты методов для работы с настройками"""
 
@@ -51,6 +99,58 @@ class TestSettings:
         assert db.get_setting("string_key") == "simple_string"
 
 
+class TestSettingsCache:
+    """Тесты кэша настроек"""
+
+    @staticmethod
+    def _trace_selects(database):
+        statements = []
+        database.conn.set_trace_callback(
+            lambda sql: statements.append(sql) if 'FROM settings' in sql else None
+        )
+        return statements
+
+    def test_repeated_reads_use_cache(self, db):
+        db.set_setting("key", {"a": 1})
+        statements = self._trace_selects(db)
+
+        for _ in range(3):
+            assert db.get_setting("key") == {"a": 1}
+            assert db.get_setting("missing", "default") == "default"
+
+        # set_setting уже положил key в кэш, missing читается один раз
+        assert len(statements) == 1
+
+    def test_returns_copies(self, db):
+        db.set_setting("admins", [1, 2])
+        db.get_setting("admins").append(3)
+        template = db.get_default_template()
+        template["name"] = "Изменено"
+
+        assert db.get_setting("admins") == [1, 2]
+        assert db.get_default_template()["name"] != "Изменено"
+
+    def test_write_through(self, db):
+        assert db.get_admin_ids() == []
+        db.add_admin_id(5)
+        assert db.get_admin_ids() == [5]
+
+    def test_sees_changes_from_other_connection(self, tmp_path):
+        db_path = str(tmp_path / "settings.db")
+        first = Database(db_path)
+        first.create_tables()
+        second = Database(db_path)
+        try:
+            first.update_template_field("name", "Старое")
+            assert second.get_default_template()["name"] == "Старое"
+
+            first.update_template_field("name", "Новое")
+            assert second.get_default_template()["name"] == "Новое"
+        finally:
+            first.close()
+            second.close()
+
+
 class TestAdminIds:
     """Тесты методов для работы с администраторами"""
 
@@ -80,6 +180,44 @@ class TestAdminIds:
         db.set_admin_ids([100, 200, 300])
         assert db.get_admin_ids() == [100, 200, 300]
 
+    def test_remove_admin_id(self, db):
+        db.set_admin_ids([100, 200])
+        db.remove_admin_id(100)
+        db.remove_admin_id(999)
+        assert db.get_admin_ids() == [200]
+
+    def test_users_is_admin_follows_setting(self, calendar_db):
+        calendar_db.add_user(telegram_id=100, first_name="Админ")
+        calendar_db.add_user(telegram_id=200, first_name="Игрок")
+
+        calendar_db.add_admin_id(100)
+        assert calendar_db.get_user_by_telegram_id(100)["is_admin"] is True
+        assert calendar_db.get_user_by_telegram_id(200)["is_admin"] is False
+
+        calendar_db.set_admin_ids([200])
+        assert calendar_db.get_user_by_telegram_id(100)["is_admin"] is False
+        assert calendar_db.get_user_by_telegram_id(200)["is_admin"] is True
+
+    def test_user_admin_status_updates_setting(self, calendar_db):
+        calendar_db.add_user(telegram_id=100, first_name="Админ")
+
+        assert calendar_db.update_user_admin_status(100, True) is True
+        assert calendar_db.get_admin_ids() == [100]
+        calendar_db.set_user_admin(100, False)
+        assert calendar_db.get_admin_ids() == []
+
+    def test_new_user_gets_admin_flag_from_setting(self, calendar_db):
+        calendar_db.add_admin_id(100)
+        assert calendar_db.add_user(telegram_id=100, first_name="Админ")["is_admin"] is True
+        calendar_db.add_user(telegram_id=200, first_name="Новый админ", is_admin=True)
+        assert calendar_db.get_admin_ids() == [100, 200]
+
+    def test_settings_generation(self, db):
+        generation = db.get_settings_generation()
+        assert db.get_settings_generation() == generation
+        db.add_admin_id(1)
+        assert db.get_settings_generation() != generation
+
 
 class TestDefaultTemplate:
     """Тесты методов для работы с шаблоном опроса"""
@@ -217,6 +355,102 @@ class TestActivePolls:
         polls = db.get_active_polls()
         assert len(polls) == 3
 
+    def test_get_schedule_poll(self, db):
+        db.add_active_poll("poll-1", "-1001234567890", 123, schedule_id="s1", training_date="2026-02-15")
+
+        poll = db.get_schedule_poll("s1", "2026-02-15")
+        assert poll["id"] == "poll-1"
+        assert db.get_schedule_poll("s1", "2026-02-22") is None
+        assert db.get_schedule_poll("s2", "2026-02-15") is None
+
+    def test_schedule_poll_after_migration(self, calendar_db):
+        calendar_db.add_active_poll("poll-1", "-100", 1, schedule_id="s1", training_date="2026-02-15")
+        assert calendar_db.get_schedule_poll("s1", "2026-02-15")["message_id"] == 1
+        with pytest.raises(sqlite3.IntegrityError):
+            calendar_db.add_active_poll("poll-2", "-100", 2, schedule_id="s1", training_date="2026-02-15")
+
+    def test_claim_schedule_poll_once(self, db):
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100", 7) is True
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100", 7) is False
+        assert db.claim_schedule_poll("s1", "2026-02-22", "-100", 7) is True
+
+        poll = db.get_schedule_poll("s1", "2026-02-15")
+        assert poll["message_id"] is None
+        assert poll["message_thread_id"] == 7
+
+    def test_complete_schedule_poll(self, db):
+        db.claim_schedule_poll("s1", "2026-02-15", "-100")
+        db.complete_schedule_poll("s1", "2026-02-15", "tg-poll-1", 55)
+
+        poll = db.get_active_poll("tg-poll-1")
+        assert poll["message_id"] == 55
+        assert poll["schedule_id"] == "s1"
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100") is False
+
+    def test_claim_after_failed_send(self, db):
+        db.claim_schedule_poll("s1", "2026-02-15", "-100")
+        job_id = db.add_outbound_job("-100", "sendPoll", {}, None, 0)
+        db.set_schedule_poll_job("s1", "2026-02-15", job_id)
+
+        # Пока задача в очереди, опрос считается занятым
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100") is False
+
+        db.fail_outbound_job(job_id, "Chat not found")
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100") is True
+        assert db.get_schedule_poll("s1", "2026-02-15")["outbound_job_id"] is None
+
+    def test_claim_without_job_expires(self, db):
+        db.claim_schedule_poll("s1", "2026-02-15", "-100")
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100") is False
+
+        # Бот остановился, не успев поставить sendPoll в очередь
+        db.conn.execute("UPDATE active_polls SET created_at = datetime('now', '-1 hour')")
+        db.conn.commit()
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100") is True
+        assert db.claim_schedule_poll("s1", "2026-02-15", "-100") is False
+
+    def test_complete_poll_job(self, db):
+        db.claim_schedule_poll("s1", "2026-02-15", "-100")
+        job_id = db.add_outbound_job("-100", "sendPoll", {}, None, 0)
+        db.set_schedule_poll_job("s1", "2026-02-15", job_id)
+
+        assert db.complete_poll_job(job_id, {"message_id": 55, "poll": {"id": "tg-poll-1"}}) is True
+        assert db.complete_poll_job(job_id, {"message_id": 56, "poll": {"id": "tg-poll-2"}}) is False
+        assert db.get_active_poll("tg-poll-1")["schedule_id"] == "s1"
+
+    def test_pending_poll_completed_by_job(self, db):
+        job_id = db.add_outbound_job("-100", "sendPoll", {}, None, 0)
+        db.add_pending_poll(job_id, "-100", 7, template_id="default",
+                            training_date="2026-02-15", training_time="18:00")
+
+        db.complete_poll_job(job_id, {"message_id": 55, "poll": {"id": "tg-poll-1"}})
+        poll = db.get_active_poll("tg-poll-1")
+        assert (poll["message_id"], poll["message_thread_id"], poll["training_time"]) == (55, 7, "18:00")
+
+    def test_reconcile_pending_polls(self, db):
+        db.claim_schedule_poll("s1", "2026-02-15", "-100")
+        done = db.add_outbound_job("-100", "sendPoll", {}, None, 0)
+        db.set_schedule_poll_job("s1", "2026-02-15", done)
+        pending = db.add_outbound_job("-200", "sendPoll", {}, None, 0)
+        db.add_pending_poll(pending, "-200")
+
+        db.complete_outbound_job(done, {"message_id": 55, "poll": {"id": "tg-poll-1"}})
+
+        assert db.reconcile_pending_polls() == 1
+        assert db.get_active_poll("tg-poll-1")["message_id"] == 55
+        assert db.get_active_poll(f"pending:job:{pending}")["message_id"] is None
+
+    def test_concurrent_claims(self, db):
+        barrier = threading.Barrier(20)
+
+        def claim():
+            barrier.wait()
+            return db.claim_schedule_poll("s1", "2026-02-15", "-100")
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(lambda _: claim(), range(20)))
+        assert results.count(True) == 1
+
 
 class TestIsInitialized:
     """Тесты метода is_initialized"""
@@ -242,3 +476,492 @@ class TestDatabaseWithFixtures:
         schedule = db.get_poll_schedule(sample_schedule["id"])
         assert schedule["training_day"] == sample_schedule["training_day"]
         assert schedule["poll_day"] == sample_schedule["poll_day"]
+
+
+class TestRegistrationsForPeriod:
+    """Тесты пакетного получения записей за период"""
+
+    def test_empty_period(self, calendar_db):
+        assert calendar_db.get_registrations_for_period("2025-03-01", "2025-04-01") == {}
+
+    def test_groups_by_slot(self, calendar_db):
+        calendar_db.register_for_training("r1", "2025-03-02", "18:00", "-100", None, 1)
+        calendar_db.register_for_training("r2", "2025-03-02", "18:00", "-100", None, 2)
+        calendar_db.register_for_training("r3", "2025-03-09", "18:00", "-100", None, 1)
+        calendar_db.register_for_training("r4", "2025-03-02", "10:00", "-200", None, 3)
+
+        result = calendar_db.get_registrations_for_period("2025-03-01", "2025-04-01")
+
+        assert set(result.keys()) == {
+            ("2025-03-02", "18:00", "-100"),
+            ("2025-03-09", "18:00", "-100"),
+            ("2025-03-02", "10:00", "-200"),
+        }
+        slot = result[("2025-03-02", "18:00", "-100")]
+        assert [r["user_telegram_id"] for r in slot] == [1, 2]
+
+    def test_period_is_half_open(self, calendar_db):
+        calendar_db.register_for_training("r1", "2025-03-31", "18:00", "-100", None, 1)
+        calendar_db.register_for_training("r2", "2025-04-01", "18:00", "-100", None, 1)
+
+        result = calendar_db.get_registrations_for_period("2025-03-01", "2025-04-01")
+
+        assert list(result.keys()) == [("2025-03-31", "18:00", "-100")]
+
+    def test_matches_per_slot_query(self, calendar_db):
+        calendar_db.add_user(telegram_id=1, first_name="Иван")
+        calendar_db.register_for_training("r1", "2025-03-02", "18:00", "-100", None, 1)
+
+        batched = calendar_db.get_registrations_for_period("2025-03-01", "2025-04-01")
+        single = calendar_db.get_training_registrations("2025-03-02", "18:00", "-100")
+
+        assert batched[("2025-03-02", "18:00", "-100")] == single
+        assert single[0]["first_name"] == "Иван"
+
+
+class TestIndexes:
+    """Тесты управления индексами"""
+
+    @staticmethod
+    def _index_names(database):
+        cursor = database.conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+        return {row['name'] for row in cursor.fetchall()}
+
+    def test_skips_missing_tables(self, db):
+        assert db.ensure_indexes() == ['idx_poll_schedules_chat_time', 'idx_outbound_jobs_pending',
+                                       'idx_refresh_tokens_family', 'idx_refresh_tokens_expires']
+
+    def test_skips_missing_columns(self, db, monkeypatch):
+        monkeypatch.setattr(Database, "INDEXES", (('idx_test', 'active_polls', ('missing_column',)),))
+        assert db.ensure_indexes() == []
+
+    def test_creates_all_indexes(self, calendar_db):
+        expected = {name for name, _, _ in Database.INDEXES}
+        assert set(calendar_db.ensure_indexes()) == expected
+        assert self._index_names(calendar_db) == expected
+
+    def test_ensure_indexes_idempotent(self, calendar_db):
+        first = calendar_db.ensure_indexes()
+        assert calendar_db.ensure_indexes() == first
+
+    def test_explain_skips_missing_tables(self, db):
+        # Без миграций календаря есть только poll_schedules и training_slots
+        assert set(db.explain_hot_queries()) == {'schedule_capacity', 'training_slot_counts'}
+
+    def test_hot_queries_use_indexes(self, calendar_db):
+        calendar_db.ensure_indexes()
+        report = calendar_db.explain_hot_queries()
+        assert 'idx_training_registrations_slot' in ' '.join(report['waitlist_promotion'])
+        assert 'idx_training_registrations_user' in ' '.join(report['get_user_trainings'])
+        assert report['training_slot_counts'][0].startswith('SEARCH training_slots')
+        assert not any(d.startswith('SCAN tr') for d in report['get_user_trainings'])
+
+
+class TestOneTimeTrainings:
+    """Тесты выборки разовых тренировок по диапазону дат"""
+
+    @staticmethod
+    def _add(database, training_date):
+        training_id = f"{training_date}_18:00_-100"
+        database.add_one_time_training(training_id, training_date, "18:00", "-100", None, "Тренировка")
+
+    def test_between_is_half_open(self, calendar_db):
+        for training_date in ("2025-02-28", "2025-03-01", "2025-03-31", "2025-04-01"):
+            self._add(calendar_db, training_date)
+
+        trainings = calendar_db.get_one_time_trainings_between("2025-03-01", "2025-04-01")
+
+        assert [t["training_date"] for t in trainings] == ["2025-03-01", "2025-03-31"]
+
+    def test_month_wrapper(self, calendar_db):
+        self._add(calendar_db, "2025-12-31")
+        self._add(calendar_db, "2026-01-01")
+
+        assert [t["training_date"] for t in calendar_db.get_one_time_trainings(2025, 12)] == ["2025-12-31"]
+        assert [t["training_date"] for t in calendar_db.get_one_time_trainings(2026, 1)] == ["2026-01-01"]
+
+    def test_range_uses_index(self, calendar_db):
+        calendar_db.ensure_indexes()
+        plan = calendar_db.explain_hot_queries()['get_one_time_trainings_between']
+        assert any(d.startswith('SEARCH') and 'idx_one_time_trainings_slot' in d for d in plan)
+
+
+class TestRegistration:
+    """Тесты записи на тренировку и лимита мест"""
+
+    SLOT = ("2025-03-02", "18:00", "-100")
+
+    def _register(self, database, user_id):
+        training_date, training_time, chat_id = self.SLOT
+        return database.register_for_training(
+            f"r{user_id}", training_date, training_time, chat_id, None, user_id
+        )
+
+    def test_waitlist_after_capacity(self, calendar_db):
+        statuses = [self._register(calendar_db, user_id)["status"] for user_id in range(TRAINING_CAPACITY + 2)]
+        assert statuses == ["registered"] * TRAINING_CAPACITY + ["waitlist"] * 2
+
+    def test_repeat_registration_keeps_status(self, calendar_db):
+        for user_id in range(TRAINING_CAPACITY + 1):
+            self._register(calendar_db, user_id)
+
+        assert self._register(calendar_db, 0)["status"] == "registered"
+        assert self._register(calendar_db, TRAINING_CAPACITY)["status"] == "waitlist"
+        assert len(calendar_db.get_training_registrations(*self.SLOT)) == TRAINING_CAPACITY + 1
+
+    def test_concurrent_registrations_respect_capacity(self, calendar_db, monkeypatch):
+        monkeypatch.setenv("VOLLEYBOT_DB_BUSY_TIMEOUT", "30000")
+        workers = 200
+        barrier = threading.Barrier(workers)
+        results = {}
+
+        def worker(user_id):
+            # Своё соединение на поток, как у отдельных процессов бота и веб-API
+            database = Database(calendar_db.db_path)
+            try:
+                barrier.wait()
+                results[user_id] = self._register(database, user_id)
+            finally:
+                database.close()
+
+        threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(result["success"] for result in results.values())
+        registered = [u for u, r in results.items() if r["status"] == "registered"]
+        assert len(registered) == TRAINING_CAPACITY
+
+        # Места достались первым по порядку вставки, остальные — в очереди
+        rows = calendar_db.conn.execute(
+            "SELECT status FROM training_registrations ORDER BY rowid"
+        ).fetchall()
+        assert [row["status"] for row in rows] == (
+            ["registered"] * TRAINING_CAPACITY + ["waitlist"] * (workers - TRAINING_CAPACITY)
+        )
+
+    def _fill(self, database, count):
+        for user_id in range(count):
+            self._register(database, user_id)
+
+    def _statuses(self, database):
+        return {r["user_telegram_id"]: r["status"] for r in database.get_training_registrations(*self.SLOT)}
+
+    def test_unregister_promotes_first_waitlisted(self, calendar_db):
+        self._fill(calendar_db, TRAINING_CAPACITY + 2)
+
+        result = calendar_db.unregister_from_training(*self.SLOT, 0)
+
+        assert result == {"success": True, "removed_status": "registered",
+                          "promoted_user_telegram_id": TRAINING_CAPACITY}
+        statuses = self._statuses(calendar_db)
+        assert 0 not in statuses
+        assert statuses[TRAINING_CAPACITY] == "registered"
+        assert statuses[TRAINING_CAPACITY + 1] == "waitlist"
+
+    def test_removing_waitlisted_does_not_promote(self, calendar_db):
+        self._fill(calendar_db, TRAINING_CAPACITY + 2)
+
+        result = calendar_db.remove_and_promote(*self.SLOT, TRAINING_CAPACITY)
+
+        assert result["removed_status"] == "waitlist"
+        assert result["promoted_user_telegram_id"] is None
+        assert self._statuses(calendar_db)[TRAINING_CAPACITY + 1] == "waitlist"
+
+    def test_unregister_missing_registration(self, calendar_db):
+        result = calendar_db.unregister_from_training(*self.SLOT, 42)
+        assert result["success"] is True
+        assert result["removed_status"] is None
+
+    def test_admin_remove_missing_registration(self, calendar_db):
+        result = calendar_db.admin_remove_user_from_training(*self.SLOT, 42)
+        assert result == {"success": False, "error": "Запись не найдена"}
+
+    def test_admin_remove_promotes(self, calendar_db):
+        self._fill(calendar_db, TRAINING_CAPACITY + 1)
+
+        result = calendar_db.admin_remove_user_from_training(*self.SLOT, 3)
+
+        assert result["removed_status"] == "registered"
+        assert result["promoted_user_telegram_id"] == TRAINING_CAPACITY
+
+
+class TestTrainingCapacity:
+    """Тесты вместимости тренировок и счётчиков training_slots"""
+
+    # 2025-03-02 — воскресенье
+    SLOT = ("2025-03-02", "18:00", "-100")
+
+    def _fill(self, database, count, slot=SLOT):
+        training_date, training_time, chat_id = slot
+        return [
+            database.register_for_training(f"r{user_id}", training_date, training_time, chat_id, None, user_id)["status"]
+            for user_id in range(count)
+        ]
+
+    def _add_schedule(self, database, capacity, training_day="sunday"):
+        database.add_poll_schedule({
+            "id": f"s-{training_day}", "chat_id": "-100", "training_day": training_day,
+            "poll_day": "friday", "training_time": "18:00", "capacity": capacity,
+        })
+
+    def test_default_capacity(self, calendar_db):
+        assert calendar_db.get_default_template()["capacity"] == TRAINING_CAPACITY
+        assert calendar_db.get_training_slot(*self.SLOT)["capacity"] == TRAINING_CAPACITY
+
+    def test_template_capacity(self, calendar_db):
+        calendar_db.update_template_field("capacity", 3)
+        assert self._fill(calendar_db, 4) == ["registered"] * 3 + ["waitlist"]
+
+    def test_schedule_capacity(self, calendar_db):
+        self._add_schedule(calendar_db, 2)
+        self._add_schedule(calendar_db, 5, training_day="saturday")
+        assert self._fill(calendar_db, 3) == ["registered", "registered", "waitlist"]
+
+    def test_one_time_capacity_overrides_schedule(self, calendar_db):
+        self._add_schedule(calendar_db, 2)
+        calendar_db.add_one_time_training("2025-03-02_18:00_-100", *self.SLOT, None, "Пляж", capacity=1)
+        assert self._fill(calendar_db, 2) == ["registered", "waitlist"]
+
+    def test_create_tables_restores_slot_counts(self, calendar_db):
+        self._fill(calendar_db, TRAINING_CAPACITY + 1)
+        calendar_db.conn.execute("DROP TABLE training_slots")
+        calendar_db.conn.commit()
+
+        calendar_db.create_tables()
+        slot = calendar_db.get_training_slot(*self.SLOT)
+        assert (slot["registered_count"], slot["waitlist_count"]) == (TRAINING_CAPACITY, 1)
+
+    def test_invalid_capacity_ignored(self, calendar_db):
+        calendar_db.update_template_field("capacity", 2)
+        self._add_schedule(calendar_db, 0)
+        calendar_db.add_one_time_training("2025-03-02_18:00_-100", *self.SLOT, None, "Пляж", capacity=-1)
+        assert calendar_db.get_training_slot(*self.SLOT)["capacity"] == 2
+
+    def test_counters_follow_registrations(self, calendar_db):
+        calendar_db.update_template_field("capacity", 2)
+        self._fill(calendar_db, 4)
+        assert calendar_db.get_training_slot(*self.SLOT) == {
+            "capacity": 2, "registered_count": 2, "waitlist_count": 2}
+
+        calendar_db.unregister_from_training(*self.SLOT, 0)
+        assert calendar_db.get_training_slot(*self.SLOT)["registered_count"] == 2
+        assert calendar_db.get_training_slot(*self.SLOT)["waitlist_count"] == 1
+
+        calendar_db.unregister_from_training(*self.SLOT, 3)
+        assert calendar_db.get_training_slot(*self.SLOT)["waitlist_count"] == 0
+
+    def test_one_time_training_removal_clears_counters(self, calendar_db):
+        training_id = "2025-03-02_18:00_-100"
+        calendar_db.add_one_time_training(training_id, *self.SLOT, None, "Тренировка")
+        self._fill(calendar_db, 2)
+
+        calendar_db.remove_one_time_training(training_id)
+
+        assert calendar_db.get_training_slot(*self.SLOT)["registered_count"] == 0
+
+    def test_migration_backfills_counters(self, calendar_db):
+        import migrate_training_capacity
+
+        self._fill(calendar_db, TRAINING_CAPACITY + 1)
+        calendar_db.conn.execute("DELETE FROM training_slots")
+        calendar_db.conn.commit()
+
+        migrate_training_capacity.migrate()
+
+        slot = calendar_db.get_training_slot(*self.SLOT)
+        assert slot["registered_count"] == TRAINING_CAPACITY
+        assert slot["waitlist_count"] == 1
+
+
+class TestPollAnswers:
+    """Тесты применения голосов в опросах"""
+
+    SLOT = ("2025-03-02", "18:00", "-100")
+
+    def _add_poll(self, database, poll_id="poll-1", training_date="2025-03-02"):
+        database.add_active_poll(poll_id, "-100", 1, message_thread_id=7,
+                                 training_date=training_date, training_time="18:00")
+
+    @staticmethod
+    def _vote(poll_id, user_id, register=True):
+        return {"poll_id": poll_id, "user_telegram_id": user_id, "register": register}
+
+    def test_votes_register_with_capacity(self, calendar_db):
+        calendar_db.update_template_field("capacity", 2)
+        self._add_poll(calendar_db)
+
+        result = calendar_db.apply_poll_answers([self._vote("poll-1", user_id) for user_id in range(3)])
+
+        assert result["success"] is True
+        assert [r["status"] for r in result["results"]] == ["registered", "registered", "waitlist"]
+        registrations = calendar_db.get_training_registrations(*self.SLOT)
+        assert {r["topic_id"] for r in registrations} == {7}
+        assert calendar_db.get_training_slot(*self.SLOT)["registered_count"] == 2
+
+    def test_retracted_vote_promotes_waitlist(self, calendar_db):
+        calendar_db.update_template_field("capacity", 1)
+        self._add_poll(calendar_db)
+        calendar_db.apply_poll_answers([self._vote("poll-1", 1), self._vote("poll-1", 2)])
+
+        result = calendar_db.apply_poll_answers([self._vote("poll-1", 1, register=False)])
+
+        assert result["results"][0]["action"] == "unregister"
+        assert result["results"][0]["status"] == "registered"
+        assert result["results"][0]["promoted_user_telegram_id"] == 2
+
+    def test_unknown_poll_is_skipped(self, calendar_db):
+        self._add_poll(calendar_db)
+        calendar_db.add_active_poll("legacy", "-100", 2)
+
+        result = calendar_db.apply_poll_answers([
+            self._vote("unknown", 1), self._vote("legacy", 1), self._vote("poll-1", 1),
+        ])
+
+        assert [r["action"] for r in result["results"]] == [None, None, "register"]
+        assert len(calendar_db.get_training_registrations(*self.SLOT)) == 1
+
+    def test_failed_answer_is_rolled_back_alone(self, calendar_db, monkeypatch):
+        self._add_poll(calendar_db)
+        original = Database._register
+
+        def failing_register(self, cursor, training_id, *args):
+            result = original(self, cursor, training_id, *args)
+            if args[-1] == 2:
+                raise sqlite3.OperationalError("disk I/O error")
+            return result
+
+        monkeypatch.setattr(Database, "_register", failing_register)
+        result = calendar_db.apply_poll_answers([
+            self._vote("poll-1", 1), self._vote("poll-1", 2), self._vote("poll-1", 3),
+        ])
+
+        assert result["success"] is True
+        assert [r["error"] for r in result["results"]] == [None, "disk I/O error", None]
+        assert result["results"][1]["status"] is None
+        registrations = calendar_db.get_training_registrations(*self.SLOT)
+        assert [r["user_telegram_id"] for r in registrations] == [1, 3]
+        assert calendar_db.get_training_slot(*self.SLOT)["registered_count"] == 2
+
+    def test_voter_is_saved_to_users(self, calendar_db):
+        self._add_poll(calendar_db)
+        vote = dict(self._vote("poll-1", 5), first_name="Иван", last_name="Петров", username="ivan")
+
+        calendar_db.apply_poll_answers([vote])
+        calendar_db.apply_poll_answers([dict(vote, first_name="Ваня")])
+
+        user = calendar_db.get_user_by_telegram_id(5)
+        assert (user["first_name"], user["username"], user["is_active"]) == ("Ваня", "ivan", False)
+        registration = calendar_db.get_training_registrations(*self.SLOT)[0]
+        assert registration["id"] == "2025-03-02_18:00_-100_5"
+
+
+class TestOutboundJobs:
+    """Тесты таблицы очереди исходящих запросов"""
+
+    def test_due_jobs_are_chat_heads(self, db):
+        first = db.add_outbound_job("-1", "sendPoll", {"q": 1}, next_attempt_at=0)
+        db.add_outbound_job("-1", "pinChatMessage", {}, depends_on=first, next_attempt_at=0)
+        other = db.add_outbound_job("-2", "sendMessage", {"text": "привет"}, next_attempt_at=0)
+
+        due = db.get_due_outbound_jobs(now=1)
+
+        assert [job["id"] for job in due] == [first, other]
+        assert due[1]["payload"] == {"text": "привет"}
+
+    def test_retry_postpones_whole_chat(self, db):
+        first = db.add_outbound_job("-1", "sendPoll", {}, next_attempt_at=0)
+        db.add_outbound_job("-1", "pinChatMessage", {}, next_attempt_at=0)
+
+        db.retry_outbound_job(first, next_attempt_at=100, error="timeout")
+
+        assert db.get_due_outbound_jobs(now=1) == []
+        assert db.get_next_outbound_attempt() == 0
+        assert db.get_outbound_job(first)["attempts"] == 1
+
+    def test_complete_unblocks_next(self, db):
+        first = db.add_outbound_job("-1", "sendPoll", {}, next_attempt_at=0)
+        second = db.add_outbound_job("-1", "pinChatMessage", {}, next_attempt_at=0)
+
+        db.complete_outbound_job(first, {"message_id": 7})
+
+        assert db.get_outbound_job(first)["result"] == {"message_id": 7}
+        assert [job["id"] for job in db.get_due_outbound_jobs(now=1)] == [second]
+
+    def test_fail_cascades_to_dependents(self, db):
+        first = db.add_outbound_job("-1", "sendPoll", {}, next_attempt_at=0)
+        second = db.add_outbound_job("-1", "pinChatMessage", {}, depends_on=first, next_attempt_at=0)
+        third = db.add_outbound_job("-1", "sendMessage", {}, next_attempt_at=0)
+
+        assert db.fail_outbound_job(first, "Bad Request") == [first, second]
+        assert db.get_outbound_job(second)["status"] == "failed"
+        assert [job["id"] for job in db.get_due_outbound_jobs(now=1)] == [third]
+
+
+class TestRefreshTokens:
+    """Тесты ротации и отзыва refresh-токенов"""
+
+    def test_rotate_issues_successor(self, db):
+        assert db.add_refresh_token("a", "fam", 1, expires_at=100)
+
+        result = db.rotate_refresh_token("a", "b", expires_at=200, now=10)
+
+        assert result == {"success": True, "jti": "b", "family_id": "fam", "telegram_id": 1}
+        assert db.rotate_refresh_token("b", "c", expires_at=300, now=20)["success"]
+        assert db.is_refresh_family_revoked("fam") is False
+
+    def test_reuse_revokes_family(self, db):
+        db.add_refresh_token("a", "fam", 1, expires_at=100)
+        db.rotate_refresh_token("a", "b", expires_at=200, now=10)
+
+        assert db.rotate_refresh_token("a", "x", expires_at=200, now=30)["error"] == "reused"
+        assert db.rotate_refresh_token("b", "c", expires_at=300, now=40)["error"] == "revoked"
+        assert db.is_refresh_family_revoked("fam") is True
+
+    def test_concurrent_refresh_gets_same_successor(self, db):
+        db.add_refresh_token("a", "fam", 1, expires_at=100)
+        barrier = threading.Barrier(2)
+
+        def rotate(new_jti):
+            barrier.wait()
+            return db.rotate_refresh_token("a", new_jti, expires_at=200, now=10)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(rotate, ["b", "c"]))
+
+        assert all(result["success"] for result in results)
+        assert results[0]["jti"] == results[1]["jti"]
+        assert db.is_refresh_family_revoked("fam") is False
+
+    def test_repeat_after_successor_used_is_conflict(self, db):
+        db.add_refresh_token("a", "fam", 1, expires_at=100)
+        db.rotate_refresh_token("a", "b", expires_at=200, now=10)
+        db.rotate_refresh_token("b", "c", expires_at=300, now=12)
+
+        assert db.rotate_refresh_token("a", "x", expires_at=200, now=13)["error"] == "conflict"
+        assert db.is_refresh_family_revoked("fam") is False
+
+    def test_unknown_and_expired(self, db):
+        db.add_refresh_token("a", "fam", 1, expires_at=100)
+
+        assert db.rotate_refresh_token("missing", "b", expires_at=200, now=10)["error"] == "unknown"
+        assert db.rotate_refresh_token("a", "b", expires_at=200, now=100)["error"] == "expired"
+        assert db.is_refresh_family_revoked("other") is True
+
+    def test_revoke_family(self, db):
+        db.add_refresh_token("a", "fam", 1, expires_at=100)
+        db.add_refresh_token("b", "other", 1, expires_at=100)
+
+        assert db.revoke_refresh_family("fam") == 1
+        assert db.is_refresh_family_revoked("fam") is True
+        assert db.is_refresh_family_revoked("other") is False
+
+    def test_purge_expired(self, db):
+        db.add_refresh_token("a", "fam", 1, expires_at=100)
+        db.add_refresh_token("b", "fam", 1, expires_at=200)
+
+        assert db.purge_expired_refresh_tokens(now=150) == 1
+        assert db.rotate_refresh_token("a", "c", expires_at=300, now=160)["error"] == "unknown"
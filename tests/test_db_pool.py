@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля db_pool.py
+"""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from database import Database
+from db_pool import DatabasePool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """Пул поверх временной БД"""
+    database_pool = DatabasePool(str(tmp_path / "pool.db"), max_readers=3)
+    database_pool.writer.create_tables()
+    yield database_pool
+    database_pool.close()
+
+
+class TestDatabasePool:
+    """Тесты пула соединений"""
+
+    async def test_read_sees_committed_write(self, pool):
+        await pool.run_write(Database.set_setting, "key", {"value": 1})
+        assert await pool.run_read(Database.get_setting, "key") == {"value": 1}
+
+    async def test_kwargs_passed(self, pool):
+        assert await pool.run_read(Database.get_setting, "missing", default="fallback") == "fallback"
+
+    async def test_reader_connection_per_thread(self, pool):
+        def connection_info(database):
+            return threading.get_ident(), id(database.conn), database is pool.writer
+
+        results = await asyncio.gather(*[pool.run_read(connection_info) for _ in range(30)])
+
+        connections_by_thread = {}
+        for thread_id, connection_id, is_writer in results:
+            assert not is_writer
+            connections_by_thread.setdefault(thread_id, set()).add(connection_id)
+        assert len(connections_by_thread) <= pool.max_readers
+        assert all(len(connections) == 1 for connections in connections_by_thread.values())
+
+    async def test_writes_serialized_on_writer(self, pool):
+        def add_schedule(database, index):
+            assert database is pool.writer
+            database.add_poll_schedule({
+                "id": f"schedule-{index}", "chat_id": "-100",
+                "training_day": "monday", "poll_day": "sunday", "training_time": "18:00"
+            })
+
+        await asyncio.gather(*[pool.run_write(add_schedule, i) for i in range(20)])
+
+        assert len(await pool.run_read(Database.get_poll_schedules)) == 20
+
+    async def test_slow_query_does_not_block_loop(self, pool):
+        def slow_read(database):
+            threading.Event().wait(0.2)
+            return database.get_admin_ids()
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        await asyncio.gather(pool.run_read(slow_read), ticker())
+        assert ticks == 5
+
+    async def test_unopenable_reader_is_not_kept(self, pool, monkeypatch):
+        monkeypatch.setattr(Database, "_connect", lambda self: None)
+
+        for _ in range(5):
+            with pytest.raises(sqlite3.OperationalError):
+                await pool.run_read(Database.get_admin_ids)
+        assert pool._readers == []
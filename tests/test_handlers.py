@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля handlers.py
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, TypeHandler
+
+import keyboards
+from handlers import (
+    button_handler,
+    get_allowed_updates,
+    router,
+    _on_create_poll,
+    _on_edit_schedule,
+    _on_poll_day,
+    _on_poll_day_selection,
+    _on_settings_menu,
+)
+
+
+def resolve_callback(data):
+    route = router.resolve(data)
+    return route.handler if route else None
+
+
+def all_keyboard_callbacks():
+    """callback_data всех кнопок из keyboards.py"""
+    markups = [
+        keyboards.get_main_menu(), keyboards.get_back_keyboard(),
+        keyboards.get_training_day_selection_keyboard(), keyboards.get_poll_day_selection_keyboard(),
+        keyboards.get_creation_type_keyboard(), keyboards.get_create_with_defaults_keyboard(),
+        keyboards.get_settings_menu_keyboard(), keyboards.get_edit_template_keyboard(),
+        keyboards.get_edit_schedule_keyboard("s1"), keyboards.get_schedule_edit_training_day_keyboard("s1"),
+        keyboards.get_schedule_edit_poll_day_keyboard("s1"),
+        keyboards.get_polls_list_keyboard([{"id": "s1", "name": "Пятница", "enabled": True}]),
+        keyboards.get_template_confirmation_keyboard(),
+    ]
+    return sorted({button.callback_data for markup in markups
+                   for row in markup.inline_keyboard for button in row})
+
+
+class TestResolveCallback:
+    """Тесты регистрации обработчиков inline-кнопок"""
+
+    def test_exact_match(self):
+        assert resolve_callback("settings_menu") is _on_settings_menu
+
+    def test_prefix_match(self):
+        assert resolve_callback("edit_schedule:s1") is _on_edit_schedule
+        assert resolve_callback("create_poll:tpl:-100") is _on_create_poll
+
+    def test_longest_prefix_wins(self):
+        assert resolve_callback("poll_day:monday") is _on_poll_day
+        assert resolve_callback("poll_day_selection:monday") is _on_poll_day_selection
+
+    def test_prefix_needs_separator(self):
+        assert resolve_callback("edit_schedule") is None
+        assert resolve_callback("create_poll_menu:x") is None
+
+    def test_unknown(self):
+        assert resolve_callback("no_such_button") is None
+        assert resolve_callback("") is None
+
+    @pytest.mark.parametrize("data", all_keyboard_callbacks())
+    def test_every_keyboard_button_has_handler(self, data):
+        assert resolve_callback(data) is not None
+
+
+class TestButtonHandler:
+    """Тесты button_handler"""
+
+    @staticmethod
+    def make_update(data, user_id=1):
+        calls = []
+
+        async def answer(**kwargs):
+            calls.append(("answer", kwargs))
+
+        async def edit_message_text(**kwargs):
+            calls.append(("edit", kwargs))
+
+        query = SimpleNamespace(data=data, answer=answer, edit_message_text=edit_message_text)
+        update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=user_id))
+        context = SimpleNamespace(bot_data={"volley_bot": SimpleNamespace(admins=frozenset({1}))})
+        return update, context, calls
+
+    async def test_dispatches_to_handler(self):
+        update, context, calls = self.make_update("settings_menu")
+        await button_handler(update, context)
+        assert calls[-1][0] == "edit"
+        assert calls[-1][1]["text"] == "Меню настроек:"
+        assert router.stats()["settings_menu"]["calls"] >= 1
+
+    async def test_unknown_button_is_ignored(self):
+        update, context, calls = self.make_update("no_such_button")
+        await button_handler(update, context)
+        assert calls == [("answer", {})]
+
+    async def test_non_admin_is_rejected(self, monkeypatch):
+        update, context, calls = self.make_update("settings_menu", user_id=2)
+
+        async def fail(*args):
+            raise AssertionError("обработчик не должен вызываться")
+
+        monkeypatch.setattr(router.resolve("settings_menu"), "handler", fail)
+        await button_handler(update, context)
+        assert calls[-1][1]["show_alert"] is True
+
+
+class TestGetAllowedUpdates:
+    """Тесты get_allowed_updates"""
+
+    @staticmethod
+    async def noop(update, context):
+        pass
+
+    def test_only_registered_update_types(self):
+        application = Application.builder().token("123:TEST").build()
+        application.add_handler(CommandHandler("start", self.noop))
+        application.add_handler(CallbackQueryHandler(self.noop))
+
+        assert get_allowed_updates(application) == [Update.CALLBACK_QUERY, Update.MESSAGE]
+
+    def test_unknown_handler_gets_all_types(self):
+        application = Application.builder().token("123:TEST").build()
+        application.add_handler(CommandHandler("start", self.noop))
+        application.add_handler(TypeHandler(Update, self.noop), group=1)
+
+        assert set(get_allowed_updates(application)) == set(Update.ALL_TYPES)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля job_store.py
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from database import Database
+from job_store import SQLiteJobStore
+from poll_scheduler import run_scheduled_poll
+
+
+def make_scheduler(db_path):
+    scheduler = AsyncIOScheduler(timezone="UTC", jobstores={"default": SQLiteJobStore(Database(db_path))})
+    scheduler.start(paused=True)
+    return scheduler
+
+
+class TestSQLiteJobStore:
+    """Тесты SQLiteJobStore"""
+
+    async def test_jobs_survive_restart(self, db):
+        run_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        scheduler = make_scheduler(db.db_path)
+        scheduler.add_job(run_scheduled_poll, "date", run_date=run_at, args=("s1",), id="job-1")
+        scheduler.shutdown(wait=False)
+
+        scheduler = make_scheduler(db.db_path)
+        try:
+            job = scheduler.get_job("job-1")
+            assert job.func is run_scheduled_poll
+            assert job.args == ("s1",)
+            assert job.next_run_time == run_at
+        finally:
+            scheduler.shutdown(wait=False)
+
+    async def test_due_jobs_and_next_run_time(self, db):
+        now = datetime.now(timezone.utc)
+        scheduler = make_scheduler(db.db_path)
+        try:
+            for job_id, delta in (("late", 2), ("early", 1)):
+                scheduler.add_job(run_scheduled_poll, "date", run_date=now + timedelta(hours=delta),
+                                  args=(job_id,), id=job_id)
+            store = scheduler._lookup_jobstore("default")
+
+            assert store.get_next_run_time() == now + timedelta(hours=1)
+            assert [job.id for job in store.get_due_jobs(now + timedelta(minutes=90))] == ["early"]
+            assert [job.id for job in store.get_all_jobs()] == ["early", "late"]
+        finally:
+            scheduler.shutdown(wait=False)
+
+    async def test_paused_jobs_are_last(self, db):
+        now = datetime.now(timezone.utc)
+        scheduler = make_scheduler(db.db_path)
+        try:
+            scheduler.add_job(run_scheduled_poll, "date", run_date=now + timedelta(hours=1), args=("a",), id="a")
+            scheduler.add_job(run_scheduled_poll, "date", run_date=now + timedelta(hours=2), args=("b",), id="b")
+            scheduler.pause_job("a")
+            assert [job.id for job in scheduler.get_jobs()] == ["b", "a"]
+        finally:
+            scheduler.shutdown(wait=False)
+
+    async def test_conflicting_id(self, db):
+        scheduler = make_scheduler(db.db_path)
+        try:
+            scheduler.add_job(run_scheduled_poll, "interval", hours=1, args=("s1",), id="job-1")
+            with pytest.raises(ConflictingIdError):
+                scheduler.add_job(run_scheduled_poll, "interval", hours=1, args=("s1",), id="job-1")
+        finally:
+            scheduler.shutdown(wait=False)
+
+    async def test_remove(self, db):
+        scheduler = make_scheduler(db.db_path)
+        try:
+            scheduler.add_job(run_scheduled_poll, "interval", hours=1, args=("s1",), id="job-1")
+            scheduler.remove_job("job-1")
+            assert scheduler.get_jobs() == []
+            with pytest.raises(JobLookupError):
+                scheduler.remove_job("job-1")
+        finally:
+            scheduler.shutdown(wait=False)
+
+    async def test_broken_job_is_removed(self, db):
+        scheduler = make_scheduler(db.db_path)
+        try:
+            scheduler.add_job(run_scheduled_poll, "interval", hours=1, args=("s1",), id="job-1")
+            db.conn.execute("UPDATE apscheduler_jobs SET job_state = x'00'")
+            db.conn.commit()
+
+            assert scheduler.get_jobs() == []
+            assert db.conn.execute("SELECT COUNT(*) FROM apscheduler_jobs").fetchone()[0] == 0
+        finally:
+            scheduler.shutdown(wait=False)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля outbound_queue.py
+"""
+
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from async_database import AsyncDatabase
+from outbound_queue import OutboundQueue, telegram_error
+
+
+class FakeApi:
+    """Bot API: отвечает по очереди заготовленными ответами и запоминает вызовы"""
+
+    def __init__(self, responses=None):
+        self.calls = []
+        self.responses = list(responses or [])
+
+    async def __call__(self, method, payload):
+        self.calls.append((method, payload))
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return {"message_id": len(self.calls)}
+
+
+@pytest.fixture
+def adb(db):
+    """Асинхронный фасад поверх тестовой БД"""
+    async_db = AsyncDatabase(db)
+    yield async_db
+    async_db._executor.shutdown(wait=True)
+
+
+def make_queue(adb, api, **kwargs):
+    kwargs.setdefault("base_delay", 0.01)
+    kwargs.setdefault("idle_interval", 0.01)
+    return OutboundQueue(adb, api, **kwargs)
+
+
+class TestTelegramError:
+    """Тесты преобразования ответов Bot API в исключения"""
+
+    def test_retry_after(self):
+        error = telegram_error({"ok": False, "error_code": 429, "parameters": {"retry_after": 15}})
+        assert isinstance(error, RetryAfter)
+        assert error.retry_after == 15
+
+    def test_chat_migrated(self):
+        error = telegram_error({"ok": False, "error_code": 400, "parameters": {"migrate_to_chat_id": -100}})
+        assert isinstance(error, ChatMigrated)
+
+    @pytest.mark.parametrize("code, error_type", [(400, BadRequest), (403, Forbidden), (502, NetworkError)])
+    def test_codes(self, code, error_type):
+        assert isinstance(telegram_error({"ok": False, "error_code": code, "description": "x"}), error_type)
+
+
+class TestRetryDelay:
+    """Тесты выбора задержки перед повтором"""
+
+    def test_retry_after_is_honored(self, adb):
+        queue = make_queue(adb, FakeApi(), max_attempts=8)
+        assert queue.retry_delay(RetryAfter(7), attempts=5) == 7
+
+    def test_retry_after_counts_against_max_attempts(self, adb):
+        queue = make_queue(adb, FakeApi(), max_attempts=3)
+        assert queue.retry_delay(RetryAfter(7), attempts=3) is None
+
+    def test_permanent_errors_are_not_retried(self, adb):
+        queue = make_queue(adb, FakeApi())
+        assert queue.retry_delay(BadRequest("Chat not found"), attempts=1) is None
+        assert queue.retry_delay(Forbidden("Bot was blocked"), attempts=1) is None
+
+    def test_exponential_backoff_with_jitter(self, adb):
+        queue = make_queue(adb, FakeApi(), base_delay=1, max_delay=10, max_attempts=10)
+        for attempts, upper in [(1, 1), (2, 2), (3, 4), (4, 8), (5, 10), (9, 10)]:
+            delay = queue.retry_delay(TimedOut(), attempts)
+            assert upper / 2 <= delay <= upper
+
+    def test_gives_up_after_max_attempts(self, adb):
+        queue = make_queue(adb, FakeApi(), max_attempts=3)
+        assert queue.retry_delay(NetworkError("boom"), attempts=2) is not None
+        assert queue.retry_delay(NetworkError("boom"), attempts=3) is None
+
+
+class TestOutboundQueue:
+    """Тесты обработки очереди"""
+
+    async def test_submit_returns_result(self, adb):
+        api = FakeApi([{"message_id": 42}])
+        queue = make_queue(adb, api)
+        queue.start()
+        try:
+            result = await queue.submit("-1", "sendPoll", {"chat_id": "-1"}, timeout=2)
+        finally:
+            await queue.stop()
+
+        assert result == {"message_id": 42}
+        assert api.calls == [("sendPoll", {"chat_id": "-1"})]
+
+    async def test_completion_hook_runs_without_waiter(self, adb):
+        completed = asyncio.Queue()
+
+        async def hook(job, result):
+            await completed.put((job["id"], result))
+
+        queue = make_queue(adb, FakeApi([{"message_id": 42}]))
+        queue.add_completion_hook(hook)
+        queue.start()
+        try:
+            job_id = await queue.enqueue("-1", "sendPoll", {"chat_id": "-1"})
+            assert await asyncio.wait_for(completed.get(), 2) == (job_id, {"message_id": 42})
+        finally:
+            await queue.stop()
+
+    async def test_retries_transient_errors(self, adb):
+        api = FakeApi([TimedOut(), NetworkError("502"), {"message_id": 1}])
+        queue = make_queue(adb, api)
+        queue.start()
+        try:
+            job_id = await queue.enqueue("-1", "sendMessage", {"text": "x"})
+            assert await queue.wait_for(job_id, timeout=2) == {"message_id": 1}
+        finally:
+            await queue.stop()
+
+        job = await adb.get_outbound_job(job_id)
+        assert job["status"] == "done"
+        assert job["attempts"] == 3
+
+    async def test_pin_waits_for_poll_and_uses_its_message_id(self, adb):
+        api = FakeApi([TimedOut(), {"message_id": 99}, True])
+        queue = make_queue(adb, api)
+        queue.start()
+        try:
+            poll_job = await queue.enqueue("-1", "sendPoll", {"chat_id": "-1"})
+            pin_job = await queue.enqueue("-1", "pinChatMessage", {"chat_id": "-1"}, depends_on=poll_job)
+            assert await queue.wait_for(pin_job, timeout=2) is True
+        finally:
+            await queue.stop()
+
+        assert [method for method, _ in api.calls] == ["sendPoll", "sendPoll", "pinChatMessage"]
+        assert api.calls[-1][1] == {"chat_id": "-1", "message_id": 99}
+
+    async def test_permanent_failure_fails_dependents(self, adb):
+        api = FakeApi([BadRequest("Chat not found")])
+        queue = make_queue(adb, api)
+        queue.start()
+        try:
+            poll_job = await queue.enqueue("-1", "sendPoll", {})
+            pin_job = await queue.enqueue("-1", "pinChatMessage", {}, depends_on=poll_job)
+            assert await queue.wait_for(pin_job, timeout=2) is None
+        finally:
+            await queue.stop()
+
+        assert len(api.calls) == 1
+        assert (await adb.get_outbound_job(poll_job))["status"] == "failed"
+        assert (await adb.get_outbound_job(pin_job))["status"] == "failed"
+
+    async def test_retry_after_postpones_job(self, adb):
+        api = FakeApi([RetryAfter(60)])
+        queue = make_queue(adb, api)
+        queue.start()
+        try:
+            job_id = await queue.enqueue("-1", "sendPoll", {})
+            assert await queue.wait_for(job_id, timeout=0.2) is None
+        finally:
+            await queue.stop()
+
+        job = await adb.get_outbound_job(job_id)
+        assert job["status"] == "pending"
+        assert job["next_attempt_at"] - queue.clock() > 55
+        assert len(api.calls) == 1
+
+    async def test_resumes_pending_jobs_after_restart(self, adb):
+        first = make_queue(adb, FakeApi())
+        job_id = await first.enqueue("-1", "sendMessage", {"text": "после перезапуска"})
+
+        api = FakeApi()
+        second = make_queue(adb, api)
+        second.start()
+        try:
+            assert await second.wait_for(job_id, timeout=2) == {"message_id": 1}
+        finally:
+            await second.stop()
+
+        assert api.calls == [("sendMessage", {"text": "после перезапуска"})]
+
+    async def test_chats_are_processed_concurrently(self, adb):
+        started = asyncio.Event()
+        calls = []
+
+        async def api(method, payload):
+            calls.append(payload["chat_id"])
+            if payload["chat_id"] == "-1":
+                await started.wait()
+            else:
+                started.set()
+            return True
+
+        queue = make_queue(adb, api)
+        queue.start()
+        try:
+            slow = await queue.enqueue("-1", "sendMessage", {"chat_id": "-1"})
+            fast = await queue.enqueue("-2", "sendMessage", {"chat_id": "-2"})
+            assert await queue.wait_for(fast, timeout=2) is True
+            assert await queue.wait_for(slow, timeout=2) is True
+        finally:
+            await queue.stop()
+
+        assert sorted(calls) == ["-1", "-2"]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля poll_answers.py
+"""
+
+import asyncio
+
+import pytest
+
+from async_database import AsyncDatabase
+from poll_answers import PollAnswerBatcher
+
+SLOT = ("2025-03-02", "18:00", "-100")
+
+
+@pytest.fixture
+def adb(calendar_db):
+    """Асинхронный фасад поверх БД с опросом на тренировку SLOT"""
+    calendar_db.add_active_poll("poll-1", "-100", 1, training_date=SLOT[0], training_time=SLOT[1])
+    async_db = AsyncDatabase(calendar_db)
+    yield async_db
+    async_db._executor.shutdown(wait=True)
+
+
+class CountingDatabase:
+    """Обёртка AsyncDatabase, которая считает пачки голосов"""
+
+    def __init__(self, adb):
+        self.adb = adb
+        self.batches = []
+
+    async def apply_poll_answers(self, answers):
+        self.batches.append(answers)
+        return await self.adb.apply_poll_answers(answers)
+
+
+class TestPollAnswerBatcher:
+    """Тесты PollAnswerBatcher"""
+
+    async def test_votes_are_applied_in_one_batch(self, adb):
+        db = CountingDatabase(adb)
+        batcher = PollAnswerBatcher(db, flush_interval=0.05)
+
+        for user_id in range(1, 51):
+            await batcher.submit("poll-1", user_id, [0])
+        await asyncio.sleep(0.2)
+
+        assert len(db.batches) == 1
+        assert len(await adb.get_training_registrations(*SLOT)) == 50
+
+    async def test_full_batch_is_applied_immediately(self, adb):
+        db = CountingDatabase(adb)
+        batcher = PollAnswerBatcher(db, flush_interval=60, max_batch=10)
+
+        for user_id in range(1, 26):
+            await batcher.submit("poll-1", user_id, [0])
+
+        assert [len(batch) for batch in db.batches] == [10, 10]
+        await batcher.stop()
+        assert [len(batch) for batch in db.batches] == [10, 10, 5]
+
+    async def test_last_vote_wins(self, adb):
+        batcher = PollAnswerBatcher(adb, flush_interval=60)
+
+        await batcher.submit("poll-1", 1, [0])
+        await batcher.submit("poll-1", 2, [0])
+        await batcher.submit("poll-1", 1, [1])
+        results = await batcher.flush()
+
+        assert [(r["user_telegram_id"], r["action"]) for r in results] == [(2, "register"), (1, "unregister")]
+        registrations = await adb.get_training_registrations(*SLOT)
+        assert [r["user_telegram_id"] for r in registrations] == [2]
+
+    async def test_retracted_vote_unregisters(self, adb):
+        batcher = PollAnswerBatcher(adb, flush_interval=60)
+        await batcher.submit("poll-1", 1, [0])
+        await batcher.flush()
+
+        await batcher.submit("poll-1", 1, [])
+        await batcher.flush()
+
+        assert await adb.get_training_registrations(*SLOT) == []
+
+    async def test_stop_flushes_pending_votes(self, adb):
+        batcher = PollAnswerBatcher(adb, flush_interval=60)
+        await batcher.submit("poll-1", 1, [0])
+
+        await batcher.stop()
+
+        assert len(await adb.get_training_registrations(*SLOT)) == 1
+        assert await batcher.flush() == []
+
+    async def test_failed_batch_is_retried(self, adb):
+        class FlakyDatabase(CountingDatabase):
+            async def apply_poll_answers(self, answers):
+                self.batches.append(answers)
+                if len(self.batches) == 1:
+                    return {"success": False, "error": "database is locked"}
+                return await self.adb.apply_poll_answers(answers)
+
+        db = FlakyDatabase(adb)
+        batcher = PollAnswerBatcher(db, flush_interval=0.05)
+        await batcher.submit("poll-1", 1, [0])
+        await batcher.flush()
+        await batcher.submit("poll-1", 2, [0])
+        await asyncio.sleep(0.2)
+
+        assert [len(batch) for batch in db.batches] == [1, 2]
+        assert len(await adb.get_training_registrations(*SLOT)) == 2
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля poll_scheduler.py
+"""
+
+from datetime import datetime
+
+import pytest
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from async_database import AsyncDatabase
+from database import Database
+from job_store import SQLiteJobStore
+from poll_scheduler import PollScheduler, parse_poll_time, run_scheduled_poll, schedule_job_id
+
+
+@pytest.fixture
+def adb(db):
+    """Асинхронный фасад поверх тестовой БД"""
+    async_db = AsyncDatabase(db)
+    yield async_db
+    async_db._executor.shutdown(wait=True)
+
+
+@pytest.fixture
+async def poll_scheduler(adb):
+    """PollScheduler поверх остановленного на паузе планировщика"""
+    calls = []
+
+    async def run_schedule(schedule_id, poll_date=None):
+        calls.append(schedule_id)
+
+    scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
+    scheduler.start(paused=True)
+    poll_scheduler = PollScheduler(scheduler, adb, run_schedule)
+    poll_scheduler.calls = calls
+    yield poll_scheduler
+    scheduler.shutdown(wait=False)
+
+
+def trigger_fields(job):
+    return {field.name: str(field) for field in job.trigger.fields}
+
+
+class TestParsePollTime:
+    """Тесты parse_poll_time"""
+
+    @pytest.mark.parametrize("value, expected", [
+        ("12:00", (12, 0)), ("9:05", (9, 5)), (" 23:59 ", (23, 59)),
+    ])
+    def test_valid(self, value, expected):
+        assert parse_poll_time(value) == expected
+
+    @pytest.mark.parametrize("value", ["24:00", "12:60", "12", "полдень", "", None])
+    def test_invalid(self, value):
+        assert parse_poll_time(value) is None
+
+
+class TestPollScheduler:
+    """Тесты PollScheduler"""
+
+    async def test_job_per_schedule(self, poll_scheduler, adb, sample_schedule):
+        await adb.add_poll_schedule({**sample_schedule, "poll_time": "09:30"})
+        await adb.add_poll_schedule({**sample_schedule, "id": "s2", "poll_day": "monday"})
+
+        await poll_scheduler.sync_all()
+
+        job = poll_scheduler.scheduler.get_job(schedule_job_id(sample_schedule["id"]))
+        assert trigger_fields(job)["day_of_week"] == "fri"
+        assert trigger_fields(job)["hour"] == "9"
+        assert trigger_fields(job)["minute"] == "30"
+        assert job.args == (sample_schedule["id"],)
+
+        other = poll_scheduler.scheduler.get_job(schedule_job_id("s2"))
+        assert trigger_fields(other)["day_of_week"] == "mon"
+        assert trigger_fields(other)["hour"] == "12"
+
+    async def test_reschedule_and_disable(self, poll_scheduler, sample_schedule):
+        poll_scheduler.sync_schedule(sample_schedule)
+        poll_scheduler.sync_schedule({**sample_schedule, "poll_day": "sunday", "poll_time": "18:15"})
+
+        job = poll_scheduler.scheduler.get_job(schedule_job_id(sample_schedule["id"]))
+        assert trigger_fields(job)["day_of_week"] == "sun"
+        assert trigger_fields(job)["minute"] == "15"
+
+        poll_scheduler.sync_schedule({**sample_schedule, "enabled": False})
+        assert poll_scheduler.scheduler.get_job(schedule_job_id(sample_schedule["id"])) is None
+
+    async def test_invalid_schedule_has_no_job(self, poll_scheduler, sample_schedule):
+        poll_scheduler.sync_schedule({**sample_schedule, "poll_time": "25:00"})
+        assert poll_scheduler.scheduler.get_jobs() == []
+
+    async def test_unchanged_schedule_keeps_job(self, poll_scheduler, sample_schedule):
+        poll_scheduler.sync_schedule(sample_schedule)
+        job = poll_scheduler.scheduler.get_job(schedule_job_id(sample_schedule["id"]))
+        poll_scheduler.sync_schedule(dict(sample_schedule))
+        assert poll_scheduler.scheduler.get_job(job.id).next_run_time == job.next_run_time
+
+    async def test_detects_external_changes(self, poll_scheduler, adb, sample_schedule):
+        await adb.add_poll_schedule(sample_schedule)
+        await poll_scheduler.sync_all()
+
+        # Изменения в обход бота, как из веб-интерфейса
+        await adb.add_poll_schedule({**sample_schedule, "id": "web"})
+        await adb.remove_poll_schedule(sample_schedule["id"])
+        await poll_scheduler.check_for_changes()
+
+        job_ids = {job.id for job in poll_scheduler.scheduler.get_jobs()}
+        assert job_ids == {schedule_job_id("web")}
+
+    async def test_detects_external_edit(self, poll_scheduler, adb, sample_schedule):
+        await adb.add_poll_schedule(sample_schedule)
+        await poll_scheduler.sync_all()
+
+        await adb.update_poll_schedule(sample_schedule["id"], {"poll_time": "07:45"})
+        await poll_scheduler.check_for_changes()
+
+        job = poll_scheduler.scheduler.get_job(schedule_job_id(sample_schedule["id"]))
+        assert trigger_fields(job)["hour"] == "7"
+
+    async def test_check_without_changes_does_not_resync(self, poll_scheduler, adb, sample_schedule, monkeypatch):
+        await adb.add_poll_schedule(sample_schedule)
+        await poll_scheduler.sync_all()
+
+        async def fail():
+            raise AssertionError("sync_all не должен вызываться")
+
+        monkeypatch.setattr(poll_scheduler, "sync_all", fail)
+        await poll_scheduler.check_for_changes()
+
+    async def test_job_runs_schedule(self, poll_scheduler, sample_schedule):
+        poll_scheduler.sync_schedule(sample_schedule)
+        job = poll_scheduler.scheduler.get_job(schedule_job_id(sample_schedule["id"]))
+        assert job.func is run_scheduled_poll
+        assert job.coalesce is True
+        await job.func(*job.args)
+        assert poll_scheduler.calls == [sample_schedule["id"]]
+
+
+class TestCatchUp:
+    """Тесты публикации опросов, пропущенных во время простоя"""
+
+    @pytest.fixture
+    async def persistent_scheduler(self, db):
+        """PollScheduler с задачами в SQLiteJobStore тестовой БД"""
+        calls = []
+
+        async def run_schedule(schedule_id, poll_date=None):
+            calls.append((schedule_id, poll_date))
+
+        scheduler = AsyncIOScheduler(
+            timezone="Europe/Moscow", jobstores={"polls": SQLiteJobStore(Database(db.db_path))}
+        )
+        scheduler.start(paused=True)
+        async_db = AsyncDatabase(db)
+        poll_scheduler = PollScheduler(scheduler, async_db, run_schedule, jobstore="polls")
+        poll_scheduler.calls = calls
+        yield poll_scheduler
+        scheduler.shutdown(wait=False)
+        async_db._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _stop_at(poll_scheduler, sample_schedule, last_run):
+        """Задача, сохранённая перед остановкой бота: следующий запуск last_run"""
+        poll_scheduler.sync_schedule(sample_schedule)
+        job_id = schedule_job_id(sample_schedule["id"])
+        poll_scheduler.scheduler.modify_job(job_id, next_run_time=last_run)
+
+    @staticmethod
+    def _moscow(poll_scheduler, *args):
+        return poll_scheduler.scheduler.timezone.localize(datetime(*args))
+
+    async def test_job_is_stored_in_database(self, persistent_scheduler, db, sample_schedule):
+        persistent_scheduler.sync_schedule(sample_schedule)
+        rows = db.conn.execute("SELECT id FROM apscheduler_jobs").fetchall()
+        assert [row["id"] for row in rows] == [schedule_job_id(sample_schedule["id"])]
+
+    async def test_missed_run_is_published(self, persistent_scheduler, sample_schedule):
+        # Пятница 13.02.2026 12:00, бот поднялся в субботу утром
+        last_run = self._moscow(persistent_scheduler, 2026, 2, 13, 12, 0)
+        self._stop_at(persistent_scheduler, sample_schedule, last_run)
+
+        await persistent_scheduler.catch_up(self._moscow(persistent_scheduler, 2026, 2, 14, 9, 0))
+
+        assert persistent_scheduler.calls == [(sample_schedule["id"], last_run)]
+
+    async def test_latest_of_several_missed_runs(self, persistent_scheduler, sample_schedule):
+        self._stop_at(persistent_scheduler, sample_schedule, self._moscow(persistent_scheduler, 2026, 2, 6, 12, 0))
+
+        missed = persistent_scheduler.missed_runs(self._moscow(persistent_scheduler, 2026, 2, 14, 9, 0))
+
+        assert missed == [(sample_schedule["id"], self._moscow(persistent_scheduler, 2026, 2, 13, 12, 0))]
+
+    async def test_recent_run_is_left_to_scheduler(self, persistent_scheduler, sample_schedule):
+        # Перезапуск в 12:00:30 — запуск выполнит APScheduler в пределах misfire_grace_time
+        self._stop_at(persistent_scheduler, sample_schedule, self._moscow(persistent_scheduler, 2026, 2, 13, 12, 0))
+
+        await persistent_scheduler.catch_up(self._moscow(persistent_scheduler, 2026, 2, 13, 12, 0, 30))
+
+        assert persistent_scheduler.calls == []
+
+    async def test_future_run_is_not_missed(self, persistent_scheduler, sample_schedule):
+        self._stop_at(persistent_scheduler, sample_schedule, self._moscow(persistent_scheduler, 2026, 2, 20, 12, 0))
+        assert persistent_scheduler.missed_runs(self._moscow(persistent_scheduler, 2026, 2, 14, 9, 0)) == []
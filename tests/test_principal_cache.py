@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля principal_cache.py
+"""
+
+import pytest
+
+from principal_cache import PrincipalCache
+
+
+class FakeClock:
+    """Часы, которые сдвигаются вручную"""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def principals(clock):
+    return PrincipalCache(ttl=30, max_size=2, clock=clock)
+
+
+class TestTokens:
+    """Тесты кэша разобранных токенов"""
+
+    def test_hit_until_ttl(self, principals, clock):
+        payload = {"sub": "1", "exp": clock.now + 1800}
+        principals.put_token("token", payload)
+        assert principals.get_token("token") == payload
+
+        clock.now += 31
+        assert principals.get_token("token") is None
+
+    def test_not_longer_than_exp(self, principals, clock):
+        principals.put_token("token", {"sub": "1", "exp": clock.now + 5})
+        clock.now += 6
+        assert principals.get_token("token") is None
+
+    def test_unknown_token(self, principals):
+        assert principals.get_token("other") is None
+
+
+class TestUsers:
+    """Тесты кэша пользователей"""
+
+    def test_hit_and_expiry(self, principals, clock):
+        principals.put_user(1, {"telegram_id": 1, "is_active": True})
+        assert principals.get_user(1)["is_active"] is True
+
+        clock.now += 31
+        assert principals.get_user(1) is None
+
+    def test_invalidate(self, principals):
+        principals.put_user(1, {"telegram_id": 1, "is_active": True})
+        principals.invalidate(1)
+        principals.invalidate(2)
+        assert principals.get_user(1) is None
+
+    def test_returns_copies(self, principals):
+        principals.put_user(1, {"telegram_id": 1, "is_admin": False})
+        principals.get_user(1)["is_admin"] = True
+        assert principals.get_user(1)["is_admin"] is False
+
+    def test_least_recently_used_is_evicted(self, principals):
+        principals.put_user(1, {"telegram_id": 1})
+        principals.put_user(2, {"telegram_id": 2})
+        principals.get_user(1)
+        principals.put_user(3, {"telegram_id": 3})
+
+        assert principals.get_user(2) is None
+        assert principals.get_user(1) is not None
+        assert principals.get_user(3) is not None
+
+
+class TestFamilies:
+    """Тесты кэша отзыва семейств refresh-токенов"""
+
+    def test_unknown_until_put(self, principals, clock):
+        assert principals.is_family_revoked("fam") is None
+        principals.put_family("fam", False)
+        assert principals.is_family_revoked("fam") is False
+
+        clock.now += 31
+        assert principals.is_family_revoked("fam") is None
+
+    def test_revoke_overrides_cached_state(self, principals):
+        principals.put_family("fam", False)
+        principals.revoke_family("fam")
+        assert principals.is_family_revoked("fam") is True
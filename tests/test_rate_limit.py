@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля rate_limit.py
+"""
+
+import asyncio
+
+import pytest
+from rate_limit import TokenBucket, TelegramRateLimiter, fan_out, format_fan_out_summary
+
+
+class FakeClock:
+    """Часы, которые двигаются только через sleep"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket:
+    """Тесты TokenBucket"""
+
+    def test_first_token_is_free(self):
+        bucket = TokenBucket(rate=1, clock=FakeClock())
+        assert bucket.reserve() == 0
+
+    def test_reservations_queue_up(self):
+        bucket = TokenBucket(rate=2, clock=FakeClock())
+        assert [bucket.reserve() for _ in range(3)] == [0, 0.5, 1.0]
+
+    def test_refill_is_capped(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+        bucket.reserve()
+        clock.now = 100
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 1.0]
+
+
+class TestTelegramRateLimiter:
+    """Тесты TelegramRateLimiter"""
+
+    @staticmethod
+    def _limiter(clock):
+        return TelegramRateLimiter(clock=clock, sleep=clock.sleep)
+
+    def test_is_group(self):
+        assert TelegramRateLimiter.is_group("-1001234567890")
+        assert TelegramRateLimiter.is_group(-100)
+        assert not TelegramRateLimiter.is_group(118295767)
+
+    async def test_private_chat_one_per_second(self):
+        clock = FakeClock()
+        limiter = self._limiter(clock)
+        for _ in range(3):
+            await limiter.acquire(118295767)
+        assert clock.now == pytest.approx(2.0)
+
+    async def test_group_twenty_per_minute(self):
+        clock = FakeClock()
+        limiter = self._limiter(clock)
+        for _ in range(20):
+            await limiter.acquire("-100")
+        # Подряд, ждали только общего лимита 30 сообщений в секунду
+        assert clock.now == pytest.approx(19 / 30)
+
+        for _ in range(20):
+            await limiter.acquire("-100")
+        assert clock.now == pytest.approx(60.0, abs=1)
+
+    async def test_poll_and_pin_are_not_delayed(self):
+        clock = FakeClock()
+        limiter = self._limiter(clock)
+        await limiter.acquire("-100")  # sendPoll
+        await limiter.acquire("-100")  # pinChatMessage
+        assert clock.now == pytest.approx(1 / 30)
+
+    async def test_chats_do_not_block_each_other(self):
+        clock = FakeClock()
+        limiter = self._limiter(clock)
+        for chat_id in range(1, 11):
+            await limiter.acquire(chat_id)
+        # Ждали только общего лимита 30 сообщений в секунду
+        assert clock.now == pytest.approx(9 / 30)
+
+    async def test_idle_chats_are_swept(self):
+        clock = FakeClock()
+        limiter = self._limiter(clock)
+        await limiter.acquire(1)
+        await limiter.acquire("-100")
+        await limiter.acquire("-100")
+
+        # Лимит личного чата уже восстановлен, группы — ещё нет
+        clock.now += 1
+        assert limiter.sweep() == 1
+        assert list(limiter._chat_buckets) == ["-100"]
+
+    async def test_sweep_runs_on_acquire(self):
+        clock = FakeClock()
+        limiter = self._limiter(clock)
+        for chat_id in range(1, 6):
+            await limiter.acquire(chat_id)
+
+        clock.now = 100
+        await limiter.acquire(6)
+        assert list(limiter._chat_buckets) == ["6"]
+
+
+class TestFanOut:
+    """Тесты fan_out"""
+
+    async def test_runs_concurrently(self):
+        started = []
+
+        async def worker(item):
+            started.append(item)
+            await asyncio.sleep(0.05)
+            return True
+
+        results = await asyncio.wait_for(fan_out(range(10), worker, key=str), timeout=0.3)
+
+        assert [r["key"] for r in results] == [str(i) for i in range(10)]
+        assert all(r["success"] for r in results)
+        assert len(started) == 10
+
+    async def test_bounded_concurrency(self):
+        running = 0
+        peak = 0
+
+        async def worker(item):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return True
+
+        await fan_out(range(10), worker, key=str, max_concurrency=3)
+        assert peak == 3
+
+    async def test_failures_are_reported(self):
+        async def worker(item):
+            if item == 1:
+                raise RuntimeError("boom")
+            return item != 2
+
+        results = await fan_out([0, 1, 2], worker, key=str)
+
+        assert [r["success"] for r in results] == [True, False, False]
+        assert results[1]["error"] == "boom"
+        assert results[2]["error"] is None
+
+    def test_summary(self):
+        results = [
+            {"key": "a", "success": True, "latency": 0.12, "error": None},
+            {"key": "b", "success": False, "latency": 0.5, "error": "boom"},
+        ]
+        summary = format_fan_out_summary(results, "Опросы")
+        assert summary.splitlines() == [
+            "Опросы: 1/2 успешно",
+            "  ✓ a: 120 мс",
+            "  ✗ b: 500 мс (boom)",
+        ]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля state_store.py
+"""
+
+import pytest
+
+from database import Database
+from state_store import MemoryStateStore, SQLiteStateStore
+
+
+class FakeClock:
+    """Часы, которые сдвигаются вручную"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def sqlite_store(db, clock):
+    store = SQLiteStateStore(Database(db.db_path), ttl=60, max_size=3, clock=clock)
+    yield store
+    store.close()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, clock):
+    if request.param == "memory":
+        return MemoryStateStore(max_size=3, ttl=60, clock=clock)
+    return request.getfixturevalue("sqlite_store")
+
+
+class TestStateStore:
+    """Общее поведение обоих хранилищ"""
+
+    def test_set_get_delete(self, store):
+        store[1] = {"step": "waiting_name", "thread_id": None}
+        assert 1 in store
+        assert store[1] == {"step": "waiting_name", "thread_id": None}
+
+        del store[1]
+        assert 1 not in store
+        with pytest.raises(KeyError):
+            del store[1]
+
+    def test_state_expires(self, store, clock):
+        store[1] = {"step": "waiting_name"}
+        clock.now += 61
+        assert 1 not in store
+        assert store.get(1) is None
+        assert len(store) == 0
+
+    def test_each_step_extends_ttl(self, store, clock):
+        store[1] = {"step": "waiting_training_day"}
+        clock.now += 50
+        store[1] = {"step": "waiting_creation_type"}
+        clock.now += 50
+        assert store[1]["step"] == "waiting_creation_type"
+
+    def test_sweep_removes_expired(self, store, clock):
+        store[1] = {"step": "a"}
+        clock.now += 30
+        store[2] = {"step": "b"}
+        clock.now += 31
+
+        assert store.sweep() == 1
+        assert list(store) == [2]
+
+
+class TestMemoryStateStore:
+    """Тесты MemoryStateStore"""
+
+    def test_least_recently_used_is_evicted(self, clock):
+        store = MemoryStateStore(max_size=2, ttl=60, clock=clock)
+        store[1] = {"step": "a"}
+        store[2] = {"step": "b"}
+        store[1]
+        store[3] = {"step": "c"}
+
+        assert sorted(store) == [1, 3]
+
+
+class TestSQLiteStateStore:
+    """Тесты SQLiteStateStore"""
+
+    def test_state_survives_restart(self, db, clock):
+        store = SQLiteStateStore(Database(db.db_path), clock=clock)
+        store[42] = {"step": "waiting_poll_day", "chat_id": "-100", "training_day": "Пятница"}
+        store.close()
+
+        store = SQLiteStateStore(Database(db.db_path), clock=clock)
+        try:
+            assert store[42]["training_day"] == "Пятница"
+        finally:
+            store.close()
+
+    def test_sweep_keeps_max_size(self, sqlite_store, clock):
+        for user_id in range(5):
+            sqlite_store[user_id] = {"step": "a"}
+            clock.now += 1
+
+        assert sqlite_store.sweep() == 2
+        assert sorted(sqlite_store) == [2, 3, 4]
+
+    def test_nested_changes_need_assignment(self, sqlite_store):
+        sqlite_store[1] = {"step": "a"}
+        sqlite_store[1]["step"] = "b"
+        assert sqlite_store[1]["step"] == "a"
+
+    def test_steps_do_not_query_sqlite(self, sqlite_store, monkeypatch):
+        sqlite_store[1] = {"step": "a"}
+        sqlite_store._executor.submit(lambda: None).result()
+
+        def no_connection(self):
+            raise AssertionError("sqlite в потоке обработчика")
+
+        monkeypatch.setattr(SQLiteStateStore, "conn", property(no_connection))
+        assert 1 in sqlite_store
+        assert sqlite_store[1] == {"step": "a"}
+        assert sqlite_store.get(2) is None
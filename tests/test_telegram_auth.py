@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля web/telegram_auth.py
+"""
+
+import hashlib
+import hmac
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "web"))
+
+from telegram_auth import TelegramAuth  # noqa: E402
+
+BOT_TOKEN = "123456789:AAbbCCddEEffGGhhIIjjKKllMMnnOOppQQr"
+
+
+def sign(secret_key: bytes, data: dict) -> str:
+    data_string = "\n".join(f"{key}={data[key]}" for key in sorted(data) if data[key] is not None)
+    return hmac.new(secret_key, data_string.encode(), hashlib.sha256).hexdigest()
+
+
+@pytest.fixture
+def auth():
+    return TelegramAuth(BOT_TOKEN)
+
+
+@pytest.fixture
+def login_data():
+    data = {"id": 1, "first_name": "Иван", "last_name": None, "username": "ivan", "auth_date": int(time.time())}
+    data["hash"] = sign(hashlib.sha256(BOT_TOKEN.encode()).digest(), data)
+    return data
+
+
+@pytest.fixture
+def init_data():
+    data = {
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": '{"id":1,"first_name":"Иван","username":"ivan"}',
+        "auth_date": str(int(time.time())),
+    }
+    webapp_key = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    data["hash"] = sign(webapp_key, data)
+    return urllib.parse.urlencode(data)
+
+
+class TestValidate:
+    """Тесты проверки данных Login Widget"""
+
+    def test_valid(self, auth, login_data):
+        assert auth.validate(login_data) is True
+
+    def test_does_not_modify_data(self, auth, login_data):
+        copy = dict(login_data)
+        auth.validate(login_data)
+        assert login_data == copy
+
+    def test_tampered(self, auth, login_data):
+        assert auth.validate({**login_data, "id": 2}) is False
+
+    def test_missing_hash(self, auth, login_data):
+        del login_data["hash"]
+        assert auth.validate(login_data) is False
+
+    def test_other_token(self, login_data):
+        assert TelegramAuth("987:other").validate(login_data) is False
+
+    def test_repeated_validations(self, auth, login_data):
+        assert all(auth.validate(login_data) for _ in range(3))
+
+
+class TestValidateInitData:
+    """Тесты проверки initData WebApp"""
+
+    def test_valid(self, auth, init_data):
+        assert auth.validate_init_data(init_data) is True
+        assert auth.parse_init_data(init_data)["query_id"] == "AAHdF6IQAAAAAN0XohDhrOrc"
+
+    def test_tampered(self, auth, init_data):
+        assert auth.validate_init_data(init_data.replace("ivan", "petr")) is False
+
+    def test_login_widget_key_is_not_accepted(self, auth):
+        data = {"auth_date": "1", "query_id": "q"}
+        data["hash"] = sign(hashlib.sha256(BOT_TOKEN.encode()).digest(), data)
+        assert auth.validate_init_data(urllib.parse.urlencode(data)) is False
+
+    @pytest.mark.parametrize("init_data", ["", "auth_date=1", "not a query string"])
+    def test_malformed(self, auth, init_data):
+        assert auth.validate_init_data(init_data) is False
@@ -9,8 +9,10 @@ from utils import (
     get_weekday_russian,
     get_day_of_week_number,
     get_next_occurrence,
+    get_next_training_date,
     get_next_sunday,
-    format_date_with_weekday
+    format_date_with_weekday,
+    month_bounds
 )
 
 
@@ -103,6 +105,20 @@ class TestGetNextSunday:
         assert result_date.weekday() == 6
 
 
+class TestGetNextTrainingDate:
+    """Тесты для get_next_training_date"""
+
+    def test_later_this_week(self):
+        # 2026-02-13 — пятница
+        assert get_next_training_date("sunday", datetime(2026, 2, 13, 12, 0)) == datetime(2026, 2, 15, 12, 0)
+
+    def test_same_day_is_next_week(self):
+        assert get_next_training_date("friday", datetime(2026, 2, 13)) == datetime(2026, 2, 20)
+
+    def test_invalid_day(self):
+        assert get_next_training_date("invalid", datetime(2026, 2, 13)) is None
+
+
 class TestFormatDateWithWeekday:
     """Тесты функции format_date_with_weekday"""
 
@@ -157,3 +173,13 @@ class TestGetNextOccurrence:
     async def test_invalid_time_format(self):
         with pytest.raises(ValueError):
             await get_next_occurrence("monday", "invalid")
+
+
+class TestMonthBounds:
+    """Тесты функции month_bounds"""
+
+    def test_regular_month(self):
+        assert month_bounds(2025, 3) == ("2025-03-01", "2025-04-01")
+
+    def test_december_rolls_over_year(self):
+        assert month_bounds(2025, 12) == ("2025-12-01", "2026-01-01")
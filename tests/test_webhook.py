@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля webhook.py
+"""
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from telegram.ext import Application
+
+from webhook import SECRET_TOKEN_HEADER, create_webhook_app, create_webhook_router, set_webhook
+
+SECRET = "test-secret"
+
+UPDATE = {
+    "update_id": 1001,
+    "poll_answer": {
+        "poll_id": "poll-1",
+        "user": {"id": 42, "is_bot": False, "first_name": "Иван"},
+        "option_ids": [0],
+    },
+}
+
+
+@pytest.fixture
+def application():
+    """Приложение PTB без сети: обновления только попадают в update_queue"""
+    return Application.builder().token("123456:TEST").updater(None).build()
+
+
+def client_for(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+
+class TestWebhookApp:
+    """Тесты приёма обновлений"""
+
+    async def test_update_is_queued(self, application):
+        async with client_for(create_webhook_app(application, SECRET)) as client:
+            response = await client.post("/telegram/webhook", json=UPDATE, headers={SECRET_TOKEN_HEADER: SECRET})
+
+        assert response.status_code == 200
+        update = application.update_queue.get_nowait()
+        assert update.update_id == 1001
+        assert update.poll_answer.user.id == 42
+
+    @pytest.mark.parametrize("headers", [{}, {SECRET_TOKEN_HEADER: "wrong"}, {SECRET_TOKEN_HEADER: "секрет".encode()}])
+    async def test_wrong_secret_is_rejected(self, application, headers):
+        async with client_for(create_webhook_app(application, SECRET)) as client:
+            response = await client.post("/telegram/webhook", json=UPDATE, headers=headers)
+
+        assert response.status_code == 403
+        assert application.update_queue.empty()
+
+    async def test_invalid_body(self, application):
+        async with client_for(create_webhook_app(application, SECRET)) as client:
+            response = await client.post("/telegram/webhook", content=b"not json",
+                                         headers={SECRET_TOKEN_HEADER: SECRET})
+        assert response.status_code == 400
+
+    async def test_router_mounts_in_existing_app(self, application):
+        app = FastAPI()
+
+        @app.get("/health")
+        async def health():
+            return {"ok": True}
+
+        app.include_router(create_webhook_router(application, SECRET, path="/hook/abc"))
+        async with client_for(app) as client:
+            assert (await client.get("/health")).json() == {"ok": True}
+            response = await client.post("/hook/abc", json=UPDATE, headers={SECRET_TOKEN_HEADER: SECRET})
+
+        assert response.status_code == 200
+        assert application.update_queue.qsize() == 1
+
+
+class TestSetWebhook:
+    """Тесты регистрации webhook на локальном поддельном сервере Bot API"""
+
+    @pytest.fixture
+    def fake_telegram(self):
+        app = FastAPI()
+        app.state.calls = []
+
+        @app.post("/bot{token}/{method}")
+        async def bot_api(token: str, method: str, request: Request):
+            app.state.calls.append((method, await request.json()))
+            return {"ok": True, "result": True}
+
+        return app
+
+    async def test_set_webhook(self, fake_telegram):
+        async with client_for(fake_telegram) as client:
+            async def api_call(method, data):
+                response = await client.post(f"/bot123456:TEST/{method}", json=data)
+                return response.json()["result"]
+
+            result = await set_webhook(api_call, "https://example.com/telegram/webhook", SECRET,
+                                       allowed_updates=["message", "poll_answer"])
+
+        assert result is True
+        assert fake_telegram.state.calls == [("setWebhook", {
+            "url": "https://example.com/telegram/webhook",
+            "secret_token": SECRET,
+            "max_connections": 40,
+            "allowed_updates": ["message", "poll_answer"],
+        })]
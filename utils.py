@@ -4,7 +4,7 @@
 """
 
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 
 def get_weekday_russian(date: datetime) -> str:
@@ -21,6 +21,13 @@ def get_weekday_russian(date: datetime) -> str:
     return weekdays.get(date.weekday(), '')
 
 
+def month_bounds(year: int, month: int) -> Tuple[str, str]:
+    """Полуоткрытый диапазон дат месяца [первое число, первое число следующего) в формате YYYY-MM-DD"""
+    month_start = f"{year}-{month:02d}-01"
+    month_end = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+    return month_start, month_end
+
+
 def get_day_of_week_number(day_of_week: str) -> int:
     """Преобразование названия дня недели в число (0-6, где 0 - понедельник)"""
     days_map = {
@@ -30,6 +37,22 @@ def get_day_of_week_number(day_of_week: str) -> int:
     return days_map.get(day_of_week.lower(), -1)
 
 
+def get_next_training_date(training_day: str, from_date: datetime) -> Optional[datetime]:
+    """
+    Дата ближайшей тренировки после from_date (не включая этот же день)
+
+    Returns:
+        datetime с временем from_date или None, если день недели неверный
+    """
+    target_day = get_day_of_week_number(training_day)
+    if target_day == -1:
+        return None
+    days_ahead = target_day - from_date.weekday()
+    if days_ahead <= 0:
+        days_ahead += 7
+    return from_date + timedelta(days=days_ahead)
+
+
 async def get_next_occurrence(day_of_week: str, time_str: str) -> datetime:
     """
     Вычисление следующего occurrence события
@@ -5,8 +5,10 @@ FastAPI приложение для авторизации через Telegram L
 Использует access + refresh токены в HttpOnly cookie
 """
 
+import asyncio
 import os
 import sys
+import time
 import uuid
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
@@ -24,8 +26,14 @@ from pydantic import BaseModel, Field
 import jwt
 import logging
 
-from database import Database
+from admin_registry import AsyncAdminRegistry
+from async_database import PooledAsyncDatabase
+from database import TRAINING_CAPACITY
+from poll_scheduler import DEFAULT_POLL_TIME, parse_poll_time
+from principal_cache import PrincipalCache
+from db_pool import DatabasePool
 from telegram_auth import TelegramAuth
+from utils import month_bounds
 
 # Настройка логирования
 logging.basicConfig(
@@ -54,12 +62,20 @@ JWT_SECRET = os.getenv("JWT_SECRET", "volleybot_jwt_secret_key_change_in_prod")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Access token живёт 30 минут
 REFRESH_TOKEN_EXPIRE_DAYS = 7     # Refresh token живёт 7 дней
+REFRESH_TOKEN_SWEEP_INTERVAL = 3600  # Секунд между удалениями истёкших refresh-токенов
 DB_PATH = os.getenv("VOLLEYBOT_DB_PATH", str(Path(__file__).parent.parent / "volleybot.db"))
+DB_READERS = int(os.getenv("VOLLEYBOT_DB_READERS", 4))  # Потоков/соединений для чтения
+PRINCIPAL_CACHE_TTL = 30          # Секунд, которые токен и пользователь хранятся в кэше
 
 # Инициализация
 telegram_auth = TelegramAuth(BOT_TOKEN)
-db = Database(DB_PATH)
-db.create_tables()  # Создаём таблицы если не существуют
+db_pool = DatabasePool(DB_PATH, max_readers=DB_READERS)
+db_pool.writer.create_tables()  # Создаём таблицы если не существуют
+db = PooledAsyncDatabase(db_pool)
+# Права администратора: те же данные, что у бота, перечитываются через пул не чаще раза в секунду
+admins = AsyncAdminRegistry(db)
+# Проверенные токены и пользователи, чтобы не ходить в БД на каждый запрос
+principals = PrincipalCache(ttl=PRINCIPAL_CACHE_TTL)
 security = HTTPBearer(auto_error=False)
 
 
@@ -121,10 +137,10 @@ def create_refresh_token(data: dict, expires_delta: timedelta) -> str:
     import uuid
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + expires_delta
+    to_encode.setdefault("jti", str(uuid.uuid4()))  # Уникальный ID токена, по нему ищется запись в БД
     to_encode.update({
         "exp": expire,
         "type": "refresh",
-        "jti": str(uuid.uuid4())  # Уникальный ID токена (соль)
     })
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
@@ -179,6 +195,17 @@ def set_auth_cookies(response: Response, access_token: str, refresh_token: str)
     return response
 
 
+async def issue_refresh_token(token_data: dict) -> str:
+    """Новый refresh-токен семейства token_data["fam"], сохранённый в БД"""
+    jti = str(uuid.uuid4())
+    expires_at = time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+    await db.add_refresh_token(jti, token_data["fam"], int(token_data["sub"]), expires_at)
+    return create_refresh_token(
+        data={**token_data, "jti": jti},
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+
 def clear_auth_cookies(response: Response) -> Response:
     """Удаление cookie с токенами"""
     response.delete_cookie(key="access_token", path="/api")
@@ -196,7 +223,10 @@ async def get_current_user_from_access_cookie(request: Request) -> dict:
             detail="Access token не найден",
         )
     
-    payload = decode_token(access_token, "access")
+    payload = principals.get_token(access_token)
+    if payload is None:
+        payload = decode_token(access_token, "access")
+        principals.put_token(access_token, payload)
     telegram_id = payload.get("sub")
     
     if not telegram_id:
@@ -204,15 +234,39 @@ async def get_current_user_from_access_cookie(request: Request) -> dict:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Невалидный токен",
         )
+
+    # Сессия (семейство refresh-токенов) не отозвана: из кэша, при промахе — из БД
+    family_id = payload.get("fam")
+    if family_id:
+        revoked = principals.is_family_revoked(family_id)
+        if revoked is None:
+            revoked = await db.is_refresh_family_revoked(family_id)
+            principals.put_family(family_id, revoked)
+        if revoked:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Сессия завершена",
+            )
     
-    # Получаем пользователя из БД
-    user = db.get_user_by_telegram_id(int(telegram_id))
-    if not user:
+    # Пользователь из кэша, при промахе — из БД
+    user = principals.get_user(int(telegram_id))
+    if user is None:
+        user = await db.get_user_by_telegram_id(int(telegram_id))
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_UNAUTHORIZED,
+                detail="Пользователь не найден",
+            )
+        principals.put_user(int(telegram_id), user)
+
+    if not user.get('is_active', True):
         raise HTTPException(
-            status_code=status.HTTP_404_UNAUTHORIZED,
-            detail="Пользователь не найден",
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Ваш аккаунт деактивирован",
         )
-    
+
+    # Для require_admin в обработчике
+    await admins.refresh()
     return user
 
 
@@ -228,7 +282,7 @@ def require_auth(user: dict) -> dict:
 
 def require_admin(user: dict) -> dict:
     """Проверка что пользователь является администратором"""
-    if not user.get("is_admin"):
+    if user.get("telegram_id") not in admins:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Требуется права администратора",
@@ -265,12 +319,12 @@ async def auth_telegram(user_data: TelegramUserData, response: Response):
     telegram_id = user_data.id
 
     # 3. Проверяем, существует ли пользователь в БД
-    existing_user = db.get_user_by_telegram_id(telegram_id)
+    existing_user = await db.get_user_by_telegram_id(telegram_id)
 
     # Если пользователя нет в БД — проверяем, является ли он администратором
+    await admins.refresh()
+    is_admin = telegram_id in admins
     if not existing_user:
-        admin_ids = db.get_admin_ids()
-        is_admin = telegram_id in admin_ids
 
         # Если не администратор — запрещаем вход
         if not is_admin:
@@ -281,7 +335,7 @@ async def auth_telegram(user_data: TelegramUserData, response: Response):
             )
 
         # Администраторов регистрируем автоматически
-        db.add_user(
+        await db.add_user(
             telegram_id=telegram_id,
             first_name=user_data.first_name,
             last_name=user_data.last_name,
@@ -291,7 +345,7 @@ async def auth_telegram(user_data: TelegramUserData, response: Response):
             is_active=True
         )
         logger.info(f"Новый администратор зарегистрирован: {user_data.username or user_data.first_name}")
-        existing_user = db.get_user_by_telegram_id(telegram_id)
+        existing_user = await db.get_user_by_telegram_id(telegram_id)
     else:
         # Проверяем, активен ли пользователь
         if not existing_user.get('is_active', True):
@@ -302,28 +356,22 @@ async def auth_telegram(user_data: TelegramUserData, response: Response):
             )
 
         # Обновляем данные пользователя из Telegram (аватар, имя, username)
-        db.update_user(
+        await db.update_user(
             telegram_id=telegram_id,
             first_name=user_data.first_name,
             last_name=user_data.last_name,
             username=user_data.username,
             photo_url=user_data.photo_url
         )
+        principals.invalidate(telegram_id)
         logger.info(f"Пользователь обновил данные: {user_data.username or user_data.first_name}")
 
-        # Обновляем статус админа, если он был изменён
-        admin_ids = db.get_admin_ids()
-        is_admin = telegram_id in admin_ids
-        if existing_user.get('is_admin') != is_admin:
-            db.set_user_admin(telegram_id, is_admin)
-            logger.info(f"Статус админа обновлён для {telegram_id}: {is_admin}")
-
-    # 4. Создаём токены
-    is_admin = existing_user.get('is_admin', False)
+    # 4. Создаём токены, каждый вход открывает новое семейство refresh-токенов
     token_data = {
         "sub": str(telegram_id),
         "username": user_data.username,
-        "is_admin": is_admin
+        "is_admin": is_admin,
+        "fam": str(uuid.uuid4())
     }
 
     access_token = create_access_token(
@@ -331,16 +379,13 @@ async def auth_telegram(user_data: TelegramUserData, response: Response):
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
-    refresh_token = create_refresh_token(
-        data=token_data,
-        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    )
+    refresh_token = await issue_refresh_token(token_data)
 
     # 5. Устанавливаем cookie
     set_auth_cookies(response, access_token, refresh_token)
 
     # 6. Возвращаем данные пользователя (без токенов)
-    user = db.get_user_by_telegram_id(telegram_id)
+    user = await db.get_user_by_telegram_id(telegram_id)
     return {
         "success": True,
         "message": "Авторизация успешна",
@@ -352,6 +397,10 @@ async def auth_telegram(user_data: TelegramUserData, response: Response):
 async def refresh_access_token(request: Request, response: Response):
     """
     Обновление access токена используя refresh token
+
+    Refresh token одноразовый: в ответ выдаётся новая пара токенов.
+    Одновременное обновление из нескольких вкладок получает тот же новый
+    токен, более поздний повтор уже обменянного токена отзывает всю сессию.
     """
     refresh_token = request.cookies.get("refresh_token")
     
@@ -364,43 +413,60 @@ async def refresh_access_token(request: Request, response: Response):
     # Проверяем refresh token
     payload = decode_token(refresh_token, "refresh")
     telegram_id = payload.get("sub")
+    family_id = payload.get("fam")
     
-    if not telegram_id:
+    if not telegram_id or not family_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Невалидный refresh token",
         )
     
     # Проверяем что пользователь всё ещё админ
-    user = db.get_user_by_telegram_id(int(telegram_id))
-    if not user or not user.get("is_admin"):
+    user = await db.get_user_by_telegram_id(int(telegram_id))
+    await admins.refresh()
+    if not user or int(telegram_id) not in admins:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Пользователь больше не является администратором",
         )
     
-    # Создаём новый access token
+    # Обмениваем refresh token на новый того же семейства
+    new_jti = str(uuid.uuid4())
+    expires_at = time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+    result = await db.rotate_refresh_token(payload.get("jti"), new_jti, expires_at)
+    if not result["success"] and result["error"] == "conflict":
+        # Другая вкладка уже обновила токены, её cookie остаются в силе
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Токен уже обновлён",
+        )
+    if not result["success"]:
+        logger.warning(f"Refresh token пользователя {telegram_id} отклонён: {result['error']}")
+        if result["error"] in ("reused", "revoked"):
+            principals.revoke_family(result["family_id"])
+        rejected = JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"detail": "Сессия завершена, войдите заново"},
+        )
+        return clear_auth_cookies(rejected)
+
+    # Создаём новую пару токенов
     token_data = {
         "sub": str(telegram_id),
         "username": user.get("username"),
-        "is_admin": True
+        "is_admin": True,
+        "fam": family_id
     }
     
     new_access_token = create_access_token(
         data=token_data,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    
-    # Устанавливаем новый access token (refresh оставляем тот же)
-    response.set_cookie(
-        key="access_token",
-        value=new_access_token,
-        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        httponly=True,
-        secure=True,
-        samesite="lax",
-        path="/api"
+    new_refresh_token = create_refresh_token(
+        data={**token_data, "jti": result["jti"]},
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     )
+    set_auth_cookies(response, new_access_token, new_refresh_token)
     
     return {"success": True, "message": "Токен обновлён"}
 
@@ -414,10 +480,20 @@ async def get_current_user_info(user: dict = Depends(get_current_user_from_acces
 
 
 @app.post("/api/auth/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
     """
-    Выход из системы (удаление cookie)
+    Выход из системы (отзыв сессии и удаление cookie)
     """
+    refresh_token = request.cookies.get("refresh_token")
+    if refresh_token:
+        try:
+            payload = jwt.decode(refresh_token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.InvalidTokenError:
+            payload = {}
+        family_id = payload.get("fam")
+        if family_id:
+            await db.revoke_refresh_family(family_id)
+            principals.revoke_family(family_id)
     clear_auth_cookies(response)
     return {"success": True, "message": "Выход выполнен"}
 
@@ -441,7 +517,7 @@ async def get_all_users(user: dict = Depends(get_current_user_from_access_cookie
     Получение списка всех пользователей (только для администраторов)
     """
     require_admin(user)
-    users = db.get_all_users()
+    users = await db.get_all_users()
     return users
 
 
@@ -458,6 +534,7 @@ class PollTemplate(BaseModel):
     enabled: bool = True
     default_chat_id: str = ""
     default_topic_id: Optional[int] = None
+    capacity: int = Field(TRAINING_CAPACITY, gt=0)
 
 
 class PollSchedule(BaseModel):
@@ -469,6 +546,10 @@ class PollSchedule(BaseModel):
     poll_day: str
     training_time: str
     enabled: bool = True
+    # None — вместимость из шаблона опроса
+    capacity: Optional[int] = Field(None, gt=0)
+    # Время отправки опроса в день poll_day
+    poll_time: str = Field(DEFAULT_POLL_TIME, pattern=r'^([01]?\d|2[0-3]):[0-5]\d$')
 
 
 @app.get("/api/admin/settings/template")
@@ -477,7 +558,7 @@ async def get_poll_template(user: dict = Depends(get_current_user_from_access_co
     Получение шаблона опроса по умолчанию
     """
     require_admin(user)
-    template = db.get_default_template()
+    template = await db.get_default_template()
     return template
 
 
@@ -487,7 +568,7 @@ async def update_poll_template(template: PollTemplate, user: dict = Depends(get_
     Обновление шаблона опроса по умолчанию
     """
     require_admin(user)
-    db.set_default_template(template.dict())
+    await db.set_default_template(template.dict())
     return {"success": True, "message": "Шаблон обновлён"}
 
 
@@ -497,7 +578,7 @@ async def get_poll_schedules(user: dict = Depends(get_current_user_from_access_c
     Получение всех расписаний опросов
     """
     require_admin(user)
-    schedules = db.get_poll_schedules()
+    schedules = await db.get_poll_schedules()
     return schedules
 
 
@@ -509,7 +590,7 @@ async def add_poll_schedule(schedule: PollSchedule, user: dict = Depends(get_cur
     require_admin(user)
     schedule_dict = schedule.dict()
     schedule_dict['id'] = str(uuid.uuid4())
-    db.add_poll_schedule(schedule_dict)
+    await db.add_poll_schedule(schedule_dict)
     return {"success": True, "message": "Расписание добавлено", "id": schedule_dict['id']}
 
 
@@ -519,7 +600,12 @@ async def update_poll_schedule(schedule_id: str, updates: dict, user: dict = Dep
     Обновление расписания опроса
     """
     require_admin(user)
-    db.update_poll_schedule(schedule_id, updates)
+    if 'poll_time' in updates and parse_poll_time(updates['poll_time']) is None:
+        raise HTTPException(status_code=400, detail="poll_time must be HH:MM")
+    capacity = updates.get('capacity')
+    if capacity is not None and (not isinstance(capacity, int) or isinstance(capacity, bool) or capacity <= 0):
+        raise HTTPException(status_code=400, detail="capacity must be a positive integer")
+    await db.update_poll_schedule(schedule_id, updates)
     return {"success": True, "message": "Расписание обновлено"}
 
 
@@ -529,7 +615,7 @@ async def remove_poll_schedule(schedule_id: str, user: dict = Depends(get_curren
     Удаление расписания опроса
     """
     require_admin(user)
-    db.remove_poll_schedule(schedule_id)
+    await db.remove_poll_schedule(schedule_id)
     return {"success": True, "message": "Расписание удалено"}
 
 
@@ -539,7 +625,7 @@ async def get_active_polls(user: dict = Depends(get_current_user_from_access_coo
     Получение всех активных опросов
     """
     require_admin(user)
-    polls = db.get_active_polls()
+    polls = await db.get_active_polls()
     return polls
 
 
@@ -549,8 +635,7 @@ async def get_admin_ids(user: dict = Depends(get_current_user_from_access_cookie
     Получение списка ID администраторов
     """
     require_admin(user)
-    admin_ids = db.get_admin_ids()
-    return {"admin_ids": admin_ids}
+    return {"admin_ids": list(admins)}
 
 
 @app.get("/api/admin/stats")
@@ -560,7 +645,7 @@ async def get_stats(user: dict = Depends(get_current_user_from_access_cookie)):
     """
     require_admin(user)
     return {
-        "admin_count": db.get_admin_count()
+        "admin_count": await db.get_admin_count()
     }
 
 
@@ -574,10 +659,10 @@ async def add_admin_id(request: Request, user: dict = Depends(get_current_user_f
     admin_id = body.get('admin_id')
     if not admin_id:
         raise HTTPException(status_code=400, detail="admin_id required")
-    db.add_admin_id(int(admin_id))
-    
-    # Обновляем поле is_admin в таблице users
-    db.update_user_admin_status(int(admin_id), True)
+    # users.is_admin обновляется в той же транзакции
+    await db.add_admin_id(int(admin_id))
+    admins.invalidate()
+    principals.invalidate(int(admin_id))
     
     return {"success": True, "message": "Администратор добавлен"}
 
@@ -588,13 +673,10 @@ async def remove_admin_id(admin_id: int, user: dict = Depends(get_current_user_f
     Удаление ID администратора
     """
     require_admin(user)
-    admin_ids = db.get_admin_ids()
-    if admin_id in admin_ids:
-        admin_ids.remove(admin_id)
-        db.set_admin_ids(admin_ids)
-    
-    # Обновляем поле is_admin в таблице users
-    db.update_user_admin_status(int(admin_id), False)
+    # users.is_admin обновляется в той же транзакции
+    await db.remove_admin_id(admin_id)
+    admins.invalidate()
+    principals.invalidate(admin_id)
     
     return {"success": True, "message": "Администратор удалён"}
 
@@ -612,10 +694,12 @@ async def get_calendar(year: int, month: int, user: dict = Depends(get_current_u
     import calendar
     
     # Получаем все расписания
-    schedules = db.get_poll_schedules()
+    schedules = await db.get_poll_schedules()
     
     # Получаем разовые тренировки на месяц
-    one_time_trainings = db.get_one_time_trainings(year, month)
+    month_start, month_end = month_bounds(year, month)
+    one_time_trainings = await db.get_one_time_trainings_between(month_start, month_end)
+    default_capacity = (await db.get_default_template()).get('capacity', TRAINING_CAPACITY)
     
     # Генерируем все даты тренировок на месяц
     trainings = {}
@@ -652,6 +736,7 @@ async def get_calendar(year: int, month: int, user: dict = Depends(get_current_u
                     'time': training_time,
                     'chat_id': chat_id,
                     'topic_id': topic_id,
+                    'capacity': schedule.get('capacity') or default_capacity,
                     'is_one_time': False,
                     'registrations': []
                 }
@@ -671,25 +756,39 @@ async def get_calendar(year: int, month: int, user: dict = Depends(get_current_u
                 'time': time,
                 'chat_id': chat_id,
                 'topic_id': topic_id,
+                'capacity': training.get('capacity') or default_capacity,
                 'is_one_time': True,
                 'name': name,
                 'registrations': []
             }
+        elif training.get('capacity'):
+            # Вместимость разовой тренировки важнее вместимости расписания
+            trainings[key]['capacity'] = training['capacity']
     
-    # Для каждой тренировки получаем записи
+    # Получаем записи на все тренировки месяца одним запросом
+    registrations_by_slot = await db.get_registrations_for_period(month_start, month_end)
+    user_telegram_id = user.get('telegram_id')
+
     for key, training in trainings.items():
-        registrations = db.get_training_registrations(
-            training['date'], training['time'], training['chat_id']
-        )
+        registrations = registrations_by_slot.get((training['date'], training['time'], training['chat_id']), [])
         training['registrations'] = registrations
-        training['registered_count'] = len([r for r in registrations if r.get('status') == 'registered'])
-        training['waitlist_count'] = len([r for r in registrations if r.get('status') == 'waitlist'])
-        
-        # Проверяем записан ли текущий пользователь
-        user_telegram_id = user.get('telegram_id')
-        user_registration = next((r for r in registrations if r.get('user_telegram_id') == user_telegram_id), None)
-        training['user_status'] = user_registration['status'] if user_registration else None
-    
+
+        # Считаем статусы и ищем текущего пользователя за один проход
+        registered_count = 0
+        waitlist_count = 0
+        user_status = None
+        for registration in registrations:
+            if registration.get('status') == 'registered':
+                registered_count += 1
+            elif registration.get('status') == 'waitlist':
+                waitlist_count += 1
+            if user_status is None and registration.get('user_telegram_id') == user_telegram_id:
+                user_status = registration['status']
+
+        training['registered_count'] = registered_count
+        training['waitlist_count'] = waitlist_count
+        training['user_status'] = user_status
+
     return {"trainings": list(trainings.values())}
 
 
@@ -713,7 +812,7 @@ async def register_for_training(request: Request, user: dict = Depends(get_curre
     # Уникальный ID для каждой записи (тренировка + пользователь)
     training_id = f"{training_date}_{training_time}_{chat_id}_{user_telegram_id}"
 
-    result = db.register_for_training(
+    result = await db.register_for_training(
         training_id, training_date, training_time, chat_id, topic_id, user_telegram_id
     )
     
@@ -740,10 +839,10 @@ async def unregister_from_training(request: Request, user: dict = Depends(get_cu
     
     user_telegram_id = user.get('telegram_id')
     
-    result = db.unregister_from_training(training_date, training_time, chat_id, user_telegram_id)
+    result = await db.unregister_from_training(training_date, training_time, chat_id, user_telegram_id)
     
     if result.get('success'):
-        return {"success": True}
+        return {"success": True, "promoted_user_telegram_id": result.get('promoted_user_telegram_id')}
     else:
         raise HTTPException(status_code=500, detail=result.get('error', 'Unregistration failed'))
 
@@ -761,12 +860,16 @@ async def admin_remove_user_from_training(
     """
     require_admin(user)
 
-    result = db.admin_remove_user_from_training(
+    result = await db.admin_remove_user_from_training(
         training_date, training_time, chat_id, user_telegram_id
     )
 
     if result.get('success'):
-        return {"success": True, "removed_status": result.get('removed_status')}
+        return {
+            "success": True,
+            "removed_status": result.get('removed_status'),
+            "promoted_user_telegram_id": result.get('promoted_user_telegram_id'),
+        }
     else:
         raise HTTPException(status_code=500, detail=result.get('error', 'Failed to remove user'))
 
@@ -779,7 +882,7 @@ async def get_my_trainings(user: dict = Depends(get_current_user_from_access_coo
     require_auth(user)
     
     user_telegram_id = user.get('telegram_id')
-    trainings = db.get_user_trainings(user_telegram_id)
+    trainings = await db.get_user_trainings(user_telegram_id)
     
     return {"trainings": trainings}
 
@@ -799,7 +902,8 @@ async def add_user(request: Request, user: dict = Depends(get_current_user_from_
     if not telegram_id:
         raise HTTPException(status_code=400, detail="telegram_id required")
     
-    result = db.add_web_user_by_telegram_id(int(telegram_id))
+    result = await db.add_web_user_by_telegram_id(int(telegram_id))
+    principals.invalidate(int(telegram_id))
     
     if result.get('success'):
         return result
@@ -814,7 +918,8 @@ async def remove_user(telegram_id: int, user: dict = Depends(get_current_user_fr
     """
     require_admin(user)
 
-    result = db.delete_web_user(telegram_id)
+    result = await db.delete_web_user(telegram_id)
+    principals.invalidate(telegram_id)
 
     if result.get('success'):
         return result
@@ -833,12 +938,13 @@ async def toggle_user_active(
     require_admin(user)
     
     # Получаем текущий статус
-    user_data = db.get_user_by_telegram_id(telegram_id)
+    user_data = await db.get_user_by_telegram_id(telegram_id)
     if not user_data:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
     new_status = not user_data.get('is_active', True)
-    result = db.toggle_user_active_status(telegram_id, new_status)
+    result = await db.toggle_user_active_status(telegram_id, new_status)
+    principals.invalidate(telegram_id)
     
     if result.get('success'):
         return {"success": True, "message": f"Пользователь {'активирован' if new_status else 'деактивирован'}"}
@@ -859,13 +965,18 @@ async def add_one_time_training(request: Request, user: dict = Depends(get_curre
     chat_id = body.get('chat_id')
     topic_id = body.get('topic_id')
     name = body.get('name', 'Тренировка')
+    capacity = body.get('capacity')
     
     if not all([training_date, training_time, chat_id]):
         raise HTTPException(status_code=400, detail="Missing required fields")
+    if capacity is not None and (not isinstance(capacity, int) or isinstance(capacity, bool) or capacity <= 0):
+        raise HTTPException(status_code=400, detail="capacity must be a positive integer")
     
     training_id = f"{training_date}_{training_time}_{chat_id}"
     
-    result = db.add_one_time_training(training_id, training_date, training_time, chat_id, topic_id, name)
+    result = await db.add_one_time_training(
+        training_id, training_date, training_time, chat_id, topic_id, name, capacity
+    )
     
     if result.get('success'):
         return result
@@ -880,7 +991,7 @@ async def remove_one_time_training(training_id: str, user: dict = Depends(get_cu
     """
     require_admin(user)
     
-    result = db.remove_one_time_training(training_id)
+    result = await db.remove_one_time_training(training_id)
     
     if result.get('success'):
         return result
@@ -895,7 +1006,7 @@ async def get_all_trainings(start_date: str, end_date: str, user: dict = Depends
     """
     require_admin(user)
     
-    trainings = db.get_all_trainings(start_date, end_date)
+    trainings = await db.get_all_trainings(start_date, end_date)
     return {"trainings": trainings}
 
 
@@ -927,7 +1038,7 @@ async def create_invite_code(
     if request.expires_in_days:
         expires_at = (datetime.now() + timedelta(days=request.expires_in_days)).isoformat()
 
-    result = db.create_invite_code(code, created_by, expires_at)
+    result = await db.create_invite_code(code, created_by, expires_at)
 
     if result.get('success'):
         return {
@@ -947,7 +1058,7 @@ async def get_invite_codes(user: dict = Depends(get_current_user_from_access_coo
     """
     require_admin(user)
 
-    codes = db.get_all_invite_codes()
+    codes = await db.get_all_invite_codes()
     return {"codes": codes}
 
 
@@ -961,7 +1072,7 @@ async def deactivate_invite_code(
     """
     require_admin(user)
 
-    result = db.deactivate_invite_code(code)
+    result = await db.deactivate_invite_code(code)
 
     if result:
         return {"success": True, "message": "Код отозван"}
@@ -974,7 +1085,7 @@ async def get_invite_code_info(code: str):
     """
     Проверка кода приглашения (публичный эндпоинт)
     """
-    invite = db.get_invite_code(code)
+    invite = await db.get_invite_code(code)
 
     if not invite:
         raise HTTPException(status_code=404, detail="Приглашение не найдено")
@@ -1013,7 +1124,7 @@ async def accept_invite_code(
     require_auth(user)
 
     # Проверяем код
-    invite = db.get_invite_code(code)
+    invite = await db.get_invite_code(code)
 
     if not invite:
         raise HTTPException(status_code=404, detail="Приглашение не найдено")
@@ -1035,7 +1146,7 @@ async def accept_invite_code(
 
     # Используем код
     telegram_id = user.get('telegram_id')
-    result = db.use_invite_code(code, telegram_id)
+    result = await db.use_invite_code(code, telegram_id)
 
     if result:
         return {"success": True, "message": "Вы успешно присоединились!"}
@@ -1043,6 +1154,33 @@ async def accept_invite_code(
         raise HTTPException(status_code=500, detail="Не удалось использовать приглашение")
 
 
+async def sweep_refresh_tokens():
+    """Периодическое удаление истёкших refresh-токенов"""
+    while True:
+        try:
+            purged = await db.purge_expired_refresh_tokens()
+            if purged:
+                logger.info(f"Удалено истёкших refresh-токенов: {purged}")
+        except Exception as e:
+            logger.error(f"Ошибка удаления истёкших refresh-токенов: {e}")
+        await asyncio.sleep(REFRESH_TOKEN_SWEEP_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_refresh_token_sweeper():
+    """Запуск очистки refresh-токенов"""
+    app.state.refresh_token_sweeper = asyncio.create_task(sweep_refresh_tokens())
+
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    """Закрытие пула соединений при остановке"""
+    sweeper = getattr(app.state, "refresh_token_sweeper", None)
+    if sweeper is not None:
+        sweeper.cancel()
+    db_pool.close()
+
+
 # ==================== Статика ====================
 
 static_path = Path("/var/www/volleyteam.ru")
@@ -1064,7 +1202,7 @@ async def health_check():
     """
     return {
         "status": "ok",
-        "database": "connected" if db.conn else "disconnected"
+        "database": "connected" if db_pool.writer.conn else "disconnected"
     }
 
 
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк проверки подписи Telegram
+
+Показывает стоимость одной проверки данных Login Widget и initData WebApp
+и сколько из неё раньше уходило на вывод секретного ключа из токена.
+
+Использование:
+    python benchmark_telegram_auth.py [число повторов]
+"""
+
+import hashlib
+import hmac
+import sys
+import time
+import timeit
+import urllib.parse
+
+from telegram_auth import TelegramAuth
+
+BOT_TOKEN = "123456789:AAbbCCddEEffGGhhIIjjKKllMMnnOOppQQr"
+DEFAULT_NUMBER = 100_000
+
+
+def signed_login_data(auth: TelegramAuth) -> dict:
+    data = {
+        "id": 123456789, "first_name": "Иван", "last_name": "Петров", "username": "ivan",
+        "photo_url": "https://t.me/i/userpic/320/ivan.jpg", "auth_date": int(time.time()),
+    }
+    data_string = "\n".join(f"{key}={data[key]}" for key in sorted(data))
+    data["hash"] = hmac.new(auth._generate_secret_key(), data_string.encode(), hashlib.sha256).hexdigest()
+    return data
+
+
+def signed_init_data(auth: TelegramAuth) -> str:
+    data = {
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": '{"id":123456789,"first_name":"Иван","username":"ivan","language_code":"ru"}',
+        "auth_date": str(int(time.time())),
+    }
+    data_string = "\n".join(f"{key}={data[key]}" for key in sorted(data))
+    data["hash"] = hmac.new(auth._generate_webapp_secret_key(), data_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(data)
+
+
+def report(name: str, seconds: float, number: int):
+    print(f"{name:<46} {seconds / number * 1e6:8.2f} мкс")
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUMBER
+    auth = TelegramAuth(BOT_TOKEN)
+    login_data = signed_login_data(auth)
+    init_data = signed_init_data(auth)
+    assert auth.validate(login_data) and auth.validate_init_data(init_data)
+
+    print(f"Повторов: {number}")
+    report("validate (Login Widget)", timeit.timeit(lambda: auth.validate(login_data), number=number), number)
+    report("validate_init_data (WebApp)", timeit.timeit(lambda: auth.validate_init_data(init_data), number=number), number)
+    report("вывод ключа (раньше — на каждый вход)", timeit.timeit(auth._generate_secret_key, number=number), number)
+    report("hmac.new с ключом (раньше — на каждый вход)",
+           timeit.timeit(lambda: hmac.new(auth._generate_secret_key(), digestmod=hashlib.sha256), number=number),
+           number)
+
+
+if __name__ == "__main__":
+    main()
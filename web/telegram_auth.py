@@ -1,11 +1,11 @@
 """
-Модуль для валидации данных Telegram Login Widget
+Модуль для валидации данных Telegram Login Widget и Telegram WebApp (initData)
 """
 
 import hmac
 import hashlib
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
 from datetime import datetime
 import urllib.parse
 
@@ -14,7 +14,10 @@ logger = logging.getLogger(__name__)
 
 class TelegramAuth:
     """
-    Класс для валидации данных от Telegram Login Widget
+    Класс для валидации данных от Telegram Login Widget и WebApp
+
+    Секретные ключи выводятся из токена один раз при создании объекта,
+    на каждую проверку остаётся только HMAC от строки данных.
     """
 
     def __init__(self, bot_token: str):
@@ -25,6 +28,10 @@ class TelegramAuth:
             bot_token: Токен вашего Telegram бота
         """
         self.bot_token = bot_token
+        # Login Widget: Secret Key = SHA256(bot_token)
+        self._login_hmac = hmac.new(self._generate_secret_key(), digestmod=hashlib.sha256)
+        # WebApp: Secret Key = HMAC_SHA256("WebAppData", bot_token)
+        self._webapp_hmac = hmac.new(self._generate_webapp_secret_key(), digestmod=hashlib.sha256)
 
     def _generate_secret_key(self) -> bytes:
         """
@@ -34,6 +41,30 @@ class TelegramAuth:
         """
         return hashlib.sha256(self.bot_token.encode('utf-8')).digest()
 
+    def _generate_webapp_secret_key(self) -> bytes:
+        """
+        Секретный ключ для initData Telegram WebApp:
+        Secret Key = HMAC_SHA256(key="WebAppData", msg=bot_token)
+        """
+        return hmac.new(b'WebAppData', self.bot_token.encode('utf-8'), hashlib.sha256).digest()
+
+    @staticmethod
+    def _check_hash(prepared_hmac: 'hmac.HMAC', data: Mapping[str, Any], received_hash: str) -> bool:
+        """
+        Сравнение hash с HMAC от data-check-string
+
+        data-check-string — пары key=value всех полей, кроме hash, через \\n
+        в порядке ключей; пустые (None) значения пропускаются. HMAC берётся
+        копией заранее подготовленного объекта с ключом.
+        """
+        data_string = "\n".join(
+            f"{key}={data[key]}" for key in sorted(data)
+            if key != 'hash' and data[key] is not None
+        )
+        computed = prepared_hmac.copy()
+        computed.update(data_string.encode('utf-8'))
+        return hmac.compare_digest(computed.hexdigest(), received_hash)
+
     def validate(self, data: Dict[str, Any]) -> bool:
         """
         Проверка валидности данных от Telegram
@@ -44,38 +75,44 @@ class TelegramAuth:
         Returns:
             True если данные валидны, иначе False
         """
-        # Копируем данные и извлекаем hash
-        data_copy = data.copy()
-        received_hash = data_copy.pop('hash', None)
-
+        received_hash = data.get('hash')
         if not received_hash:
             logger.warning("Hash отсутствует в данных")
             return False
 
-        # Сортируем и форматируем данные для проверки
-        items = []
-        for key, value in sorted(data_copy.items()):
-            if value is not None:
-                items.append(f"{key}={value}")
-
-        data_string = "\n".join(items)
-
-        # Вычисляем ожидаемый hash
-        # Secret Key = SHA256(bot_token)
-        # Hash = HMAC_SHA256(Secret Key, data_string)
-        secret_key = self._generate_secret_key()
-        computed_hash = hmac.new(
-            key=secret_key,
-            msg=data_string.encode('utf-8'),
-            digestmod=hashlib.sha256
-        ).hexdigest()
-
-        # Сравниваем hash'и
-        result = hmac.compare_digest(computed_hash, received_hash)
+        # Hash = HMAC_SHA256(SHA256(bot_token), data_string)
+        result = self._check_hash(self._login_hmac, data, str(received_hash))
         if not result:
             logger.warning(f"Неверная подпись данных")
         return result
 
+    def validate_init_data(self, init_data: str) -> bool:
+        """
+        Проверка initData от Telegram WebApp (Telegram.WebApp.initData)
+
+        Args:
+            init_data: Строка запроса в том виде, в каком её передал клиент
+
+        Returns:
+            True если подпись верна, иначе False
+        """
+        try:
+            data = dict(urllib.parse.parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+        except ValueError:
+            logger.warning("initData не разбирается как строка запроса")
+            return False
+
+        received_hash = data.get('hash')
+        if not received_hash:
+            logger.warning("Hash отсутствует в initData")
+            return False
+
+        # Hash = HMAC_SHA256(HMAC_SHA256("WebAppData", bot_token), data_string)
+        result = self._check_hash(self._webapp_hmac, data, received_hash)
+        if not result:
+            logger.warning("Неверная подпись initData")
+        return result
+
     def is_auth_date_valid(self, auth_date: int, max_age_seconds: int = 86400) -> bool:
         """
         Проверка времени авторизации
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Приём обновлений Telegram через webhook
+
+Вместо постоянного опроса getUpdates Telegram сам присылает каждое
+обновление POST-запросом. create_webhook_router — маршрут FastAPI,
+который можно подключить в существующее приложение, create_webhook_app —
+отдельное ASGI-приложение для uvicorn. Запросы без правильного
+заголовка X-Telegram-Bot-Api-Secret-Token отклоняются.
+"""
+
+import hmac
+import logging
+import secrets
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Response, status
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+DEFAULT_WEBHOOK_PATH = '/telegram/webhook'
+
+
+def generate_secret_token() -> str:
+    """Случайный секрет для setWebhook (допустимые символы: A-Z, a-z, 0-9, _ и -)"""
+    return secrets.token_urlsafe(32)
+
+
+def create_webhook_router(application: Application, secret_token: str,
+                          path: str = DEFAULT_WEBHOOK_PATH) -> APIRouter:
+    """
+    Маршрут FastAPI, который передаёт обновления в очередь application
+
+    Пример:
+        app.include_router(create_webhook_router(application, secret_token))
+    """
+    expected = secret_token.encode()
+    router = APIRouter()
+
+    @router.post(path, include_in_schema=False)
+    async def telegram_webhook(request: Request):
+        received = request.headers.get(SECRET_TOKEN_HEADER, '').encode()
+        if not hmac.compare_digest(received, expected):
+            logger.warning(f"Webhook: запрос с неверным секретом от {request.client.host if request.client else '?'}")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid secret token")
+
+        try:
+            data = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON")
+
+        update = Update.de_json(data, application.bot)
+        if update is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid update")
+
+        # Отвечаем сразу, обработка идёт в фоне, как при getUpdates
+        await application.update_queue.put(update)
+        return Response(status_code=status.HTTP_200_OK)
+
+    return router
+
+
+def create_webhook_app(application: Application, secret_token: str,
+                       path: str = DEFAULT_WEBHOOK_PATH) -> FastAPI:
+    """Отдельное ASGI-приложение только с маршрутом webhook"""
+    app = FastAPI(title="VolleyBot webhook", docs_url=None, redoc_url=None, openapi_url=None)
+    app.include_router(create_webhook_router(application, secret_token, path))
+    return app
+
+
+async def set_webhook(api_call: Callable[[str, Dict[str, Any]], Awaitable[Any]], url: str,
+                      secret_token: str, allowed_updates: Optional[List[str]] = None,
+                      max_connections: int = 40) -> Any:
+    """
+    Регистрация webhook в Bot API
+
+    Args:
+        api_call: Вызов метода Bot API, например VolleyBot._api_call
+        url: Публичный HTTPS-адрес, на который Telegram будет присылать обновления
+    """
+    data = {'url': url, 'secret_token': secret_token, 'max_connections': max_connections}
+    if allowed_updates is not None:
+        data['allowed_updates'] = allowed_updates
+    result = await api_call('setWebhook', data)
+    logger.info(f"Webhook установлен: {url}")
+    return result